@@ -0,0 +1,124 @@
+"""
+HTTP 답변 서버(answer_server.py)의 동기 클라이언트입니다.
+
+app.py는 ANSWER_API_URL이 지정되면 검색/답변을 직접 실행하지 않고 이 클라이언트로 서버에 요청합니다.
+Slack 봇 같은 다른 클라이언트도 같은 방식으로 사용할 수 있습니다.
+
+    client = AnswerAPIClient("http://localhost:8080")
+    result = client.answer("설치 방법을 알려주세요", on_token=lambda token: print(token, end=""))
+    print(result["source_documents"])
+"""
+
+import json
+import os
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import httpx
+from langchain_core.documents import Document
+from langchain_core.messages import BaseMessage
+
+ANSWER_API_URL = os.getenv("ANSWER_API_URL", "")
+ANSWER_API_TOKEN = os.getenv("ANSWER_API_TOKEN", "")
+ANSWER_API_TIMEOUT_SECONDS = float(os.getenv("ANSWER_API_TIMEOUT_SECONDS", "120"))
+
+# LangChain 메시지 type → API role
+MESSAGE_ROLES = {"human": "user", "ai": "assistant", "system": "system"}
+
+
+class AnswerAPIError(Exception):
+    """서버가 오류를 반환했거나(503 과부하 포함) 스트림이 오류 이벤트로 끝난 경우."""
+
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def serialize_chat_history(chat_history: Optional[List[Any]]) -> List[Dict[str, str]]:
+    """LangChain 메시지(또는 role/content dict) 목록을 API 형식으로 변환합니다."""
+    messages = []
+    for message in chat_history or []:
+        if isinstance(message, BaseMessage):
+            messages.append({"role": MESSAGE_ROLES.get(message.type, "user"), "content": str(message.content)})
+        else:
+            messages.append({"role": message["role"], "content": message["content"]})
+    return messages
+
+
+def deserialize_sources(sources: List[Dict[str, Any]]) -> List[Document]:
+    return [Document(page_content=source.get("content", ""), metadata=source.get("metadata") or {}) for source in sources]
+
+
+def iter_sse_events(lines: Iterator[str]) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """text/event-stream 응답 줄에서 (event, data) 쌍을 읽습니다."""
+    event, data = "message", []
+    for line in lines:
+        if not line:
+            if data:
+                yield event, json.loads("\n".join(data))
+            event, data = "message", []
+        elif line.startswith("event:"):
+            event = line[len("event:"):].strip()
+        elif line.startswith("data:"):
+            data.append(line[len("data:"):].strip())
+    if data:
+        yield event, json.loads("\n".join(data))
+
+
+class AnswerAPIClient:
+    """answer_server.py의 /v1/* 엔드포인트를 호출하는 클라이언트 (연결 풀 공유, 스레드 안전)."""
+
+    def __init__(self, base_url: str = ANSWER_API_URL, token: str = ANSWER_API_TOKEN, timeout: float = ANSWER_API_TIMEOUT_SECONDS):
+        headers = {"Authorization": f"Bearer {token}"} if token else {}
+        self._client = httpx.Client(base_url=base_url.rstrip("/"), headers=headers, timeout=timeout)
+
+    def _check(self, response: httpx.Response) -> None:
+        if response.status_code < 400:
+            return
+        response.read()
+        try:
+            message = response.json().get("error", response.text)
+        except ValueError:
+            message = response.text
+        if response.status_code == 503:
+            message = f"답변 서버가 혼잡합니다. 잠시 후 다시 시도해주세요. ({message})"
+        raise AnswerAPIError(message, response.status_code)
+
+    def list_sections(self) -> List[str]:
+        response = self._client.get("/v1/sections")
+        self._check(response)
+        return response.json()["sections"]
+
+    def answer(
+        self,
+        question: str,
+        chat_history: Optional[List[Any]] = None,
+        section: Optional[str] = None,
+        retrieval_mode: Optional[str] = None,
+        on_token: Optional[Callable[[str], None]] = None,
+    ) -> Dict[str, Any]:
+        """
+        스트리밍 엔드포인트로 질문하고, 답변 토큰이 올 때마다 on_token을 호출합니다.
+
+        Returns:
+            ChatEngine.answer와 같은 형식 (source_documents는 Document 목록) + prompt_tokens, turn_id
+        """
+        payload = {
+            "question": question,
+            "chat_history": serialize_chat_history(chat_history),
+            "section": section,
+            "retrieval_mode": retrieval_mode,
+        }
+        with self._client.stream("POST", "/v1/answer/stream", json=payload) as response:
+            self._check(response)
+            for event, data in iter_sse_events(response.iter_lines()):
+                if event == "token" and on_token is not None:
+                    on_token(data["text"])
+                elif event == "error":
+                    raise AnswerAPIError(data.get("error", "답변 생성 실패"))
+                elif event == "done":
+                    data["source_documents"] = deserialize_sources(data.pop("sources", []))
+                    return data
+        raise AnswerAPIError("답변 스트림이 완료 이벤트 없이 끝났습니다.")
+
+    def close(self) -> None:
+        self._client.close()
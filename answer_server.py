@@ -0,0 +1,356 @@
+#!/usr/bin/env python
+"""
+app.py와 같은 검색 → 답변 엔진(qa_engine.ChatEngine)을 HTTP로 제공하는 비동기 서버입니다 (aiohttp).
+
+Slack 봇, 사내 위젯, 그리고 ANSWER_API_URL을 지정한 Streamlit 앱이 이 서버의 클라이언트가 됩니다.
+
+엔드포인트:
+- POST /v1/answer/stream: 답변 토큰을 SSE(text/event-stream)로 전송
+    event: token  data: {"text": "..."}     (답변 토큰, 캐시 적중이면 답변 전체가 한 번에)
+    event: done   data: {"answer", "sources", "generated_question", "cache_hit", "prompt_tokens", "turn_id", ...}
+    event: error  data: {"error": "..."}
+- POST /v1/answer: 같은 결과를 JSON 한 번으로 반환
+    요청 본문: {"question": "...", "chat_history": [{"role": "user|assistant|system", "content": "..."}],
+               "section": null, "retrieval_mode": null}
+- GET /v1/sections: 검색 범위로 선택할 수 있는 문서 섹션 목록
+- GET /healthz: 작업자 사용 현황
+- GET /metrics: Prometheus 형식 지표 (telemetry.py)
+
+동시성과 과부하 제어:
+- 답변은 ANSWER_SERVER_WORKERS개의 작업자 스레드에서 실행합니다 (LLM/검색 대기는 I/O이므로 스레드 하나가 요청 하나를 처리).
+- 작업자를 기다리는 요청이 ANSWER_SERVER_MAX_PENDING개를 넘거나 ANSWER_SERVER_QUEUE_TIMEOUT초 안에 작업자를 얻지 못하면
+  503(Retry-After)으로 바로 거절하므로, 요청이 몰려도 대기열과 지연 시간이 끝없이 늘어나지 않습니다.
+- 스트리밍 중 클라이언트 연결이 끊기면 다음 토큰에서 답변 생성을 중단하고 작업자를 반납합니다.
+- OpenAI 호출 수는 openai_clients.py의 OPENAI_MAX_CONCURRENCY로 프로세스 전체에서 한 번 더 제한됩니다.
+
+사용 예:
+    python answer_server.py --port 8080
+    curl -N -X POST localhost:8080/v1/answer/stream -H 'Content-Type: application/json' -d '{"question": "설치 방법을 알려주세요"}'
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from aiohttp import web
+from dotenv import load_dotenv
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+
+# 아래 모듈들이 읽는 환경 변수도 .env에서 가져오도록 먼저 로드
+load_dotenv()
+
+from conversation_memory import PromptTokenCounter
+from ingest_pipeline import count_tokens
+from telemetry import StageTimingHandler, record_tokens, registry, start_turn
+
+ANSWER_SERVER_HOST = os.getenv("ANSWER_SERVER_HOST", "0.0.0.0")
+ANSWER_SERVER_PORT = int(os.getenv("ANSWER_SERVER_PORT", "8080"))
+# 동시에 답변을 생성하는 작업자 수
+ANSWER_SERVER_WORKERS = int(os.getenv("ANSWER_SERVER_WORKERS", "32"))
+# 작업자를 기다릴 수 있는 최대 요청 수 (넘으면 503)
+ANSWER_SERVER_MAX_PENDING = int(os.getenv("ANSWER_SERVER_MAX_PENDING", "64"))
+# 작업자를 기다리는 최대 시간 (초, 넘으면 503)
+ANSWER_SERVER_QUEUE_TIMEOUT = float(os.getenv("ANSWER_SERVER_QUEUE_TIMEOUT", "10"))
+# 지정하면 Authorization: Bearer <token> 헤더가 있어야 /v1/* 호출 가능
+ANSWER_API_TOKEN = os.getenv("ANSWER_API_TOKEN", "")
+# 질문 재구성 프롬프트가 너무 커지지 않도록 최근 메시지만 사용
+ANSWER_MAX_HISTORY_MESSAGES = int(os.getenv("ANSWER_MAX_HISTORY_MESSAGES", "20"))
+ANSWER_MAX_QUESTION_CHARS = int(os.getenv("ANSWER_MAX_QUESTION_CHARS", "2000"))
+
+MESSAGE_TYPES = {"user": HumanMessage, "assistant": AIMessage, "system": SystemMessage}
+
+ENGINE_KEY = web.AppKey("engine", Any)
+POOL_KEY = web.AppKey("pool", Any)
+
+
+class AnswerCancelled(Exception):
+    """클라이언트 연결이 끊겨 답변 생성을 중단함."""
+
+
+class AnswerWorkerPool:
+    """
+    답변 작업자 스레드 풀과 입장 제어.
+
+    slot()으로 작업자를 얻은 요청만 실행하고, 대기 중인 요청이 max_pending개를 넘거나
+    queue_timeout초 안에 작업자를 얻지 못하면 503으로 거절합니다. 이벤트 루프 안에서 만들어야 합니다.
+    """
+
+    def __init__(self, workers: int = ANSWER_SERVER_WORKERS, max_pending: int = ANSWER_SERVER_MAX_PENDING, queue_timeout: float = ANSWER_SERVER_QUEUE_TIMEOUT):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.queue_timeout = queue_timeout
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="answer-worker")
+        self._semaphore = asyncio.Semaphore(workers)
+        self.active = 0
+        self.waiting = 0
+        self.rejected = 0
+
+    def _reject(self, reason: str) -> web.HTTPServiceUnavailable:
+        self.rejected += 1
+        return web.HTTPServiceUnavailable(
+            text=json.dumps({"error": reason}, ensure_ascii=False),
+            content_type="application/json",
+            headers={"Retry-After": "1"},
+        )
+
+    @contextlib.asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        if self.waiting >= self.max_pending:
+            raise self._reject("too many pending requests")
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            raise self._reject("timed out waiting for a worker")
+        finally:
+            self.waiting -= 1
+        self.active += 1
+        try:
+            yield
+        finally:
+            self.active -= 1
+            self._semaphore.release()
+
+    async def run(self, fn: Any, *args: Any) -> Any:
+        """작업자 스레드에서 실행합니다. 기다리는 쪽이 취소되어도 작업이 끝날 때까지 작업자를 반납하지 않습니다."""
+        future = asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+        try:
+            return await asyncio.shield(future)
+        except asyncio.CancelledError:
+            with contextlib.suppress(BaseException):
+                await future
+            raise
+
+    def stats(self) -> Dict[str, int]:
+        return {"workers": self.workers, "active": self.active, "waiting": self.waiting, "rejected": self.rejected}
+
+
+class QueueStreamHandler(BaseCallbackHandler):
+    """작업자 스레드의 답변 토큰을 이벤트 루프의 asyncio.Queue로 전달하는 콜백."""
+
+    raise_error = True  # AnswerCancelled로 체인 실행을 중단
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, queue: asyncio.Queue, cancelled: threading.Event):
+        self.loop = loop
+        self.queue = queue
+        self.cancelled = cancelled
+
+    def on_llm_new_token(self, token: str, **kwargs: Any) -> None:
+        if self.cancelled.is_set():
+            raise AnswerCancelled()
+        self.loop.call_soon_threadsafe(self.queue.put_nowait, token)
+
+
+def parse_answer_request(payload: Any) -> Dict[str, Any]:
+    """요청 본문을 검사하여 ChatEngine.answer 인자로 변환합니다 (잘못된 요청은 400)."""
+    def bad_request(message: str) -> web.HTTPBadRequest:
+        return web.HTTPBadRequest(text=json.dumps({"error": message}, ensure_ascii=False), content_type="application/json")
+
+    if not isinstance(payload, dict):
+        raise bad_request("request body must be a JSON object")
+    question = payload.get("question")
+    if not isinstance(question, str) or not question.strip():
+        raise bad_request("question is required")
+    if len(question) > ANSWER_MAX_QUESTION_CHARS:
+        raise bad_request(f"question is longer than {ANSWER_MAX_QUESTION_CHARS} characters")
+
+    chat_history = []
+    for message in (payload.get("chat_history") or [])[-ANSWER_MAX_HISTORY_MESSAGES:]:
+        if not isinstance(message, dict) or message.get("role") not in MESSAGE_TYPES or not isinstance(message.get("content"), str):
+            raise bad_request("chat_history items must be {role: user|assistant|system, content: string}")
+        chat_history.append(MESSAGE_TYPES[message["role"]](content=message["content"]))
+
+    section = payload.get("section") or None
+    retrieval_mode = payload.get("retrieval_mode") or None
+    if not isinstance(section, (str, type(None))) or not isinstance(retrieval_mode, (str, type(None))):
+        raise bad_request("section and retrieval_mode must be strings")
+    return {"question": question.strip(), "chat_history": chat_history, "section": section, "retrieval_mode": retrieval_mode}
+
+
+def run_answer(engine: Any, request: Dict[str, Any], callbacks: Optional[List[Any]] = None) -> Dict[str, Any]:
+    """작업자 스레드에서 답변하고, 턴 계측과 함께 JSON으로 보낼 수 있는 결과를 반환합니다."""
+    token_counter = PromptTokenCounter()
+    with start_turn(api=True, section=request["section"] or "", retrieval_mode=request["retrieval_mode"] or engine.retrieval_mode) as trace:
+        result = engine.answer(
+            request["question"],
+            request["chat_history"],
+            section=request["section"],
+            retrieval_mode=request["retrieval_mode"],
+            callbacks=(callbacks or []) + [token_counter, StageTimingHandler(trace)],
+        )
+        trace.attrs["cache_hit"] = result.get("cache_hit", False)
+        if result.get("retrieval_strategy"):
+            trace.attrs["retrieval_strategy"] = result["retrieval_strategy"]
+        for label, tokens in token_counter.prompt_tokens.items():
+            record_tokens(f"prompt_{label}", tokens)
+        record_tokens("completion_answer", count_tokens(result.get("answer") or ""))
+
+    return {
+        "answer": result.get("answer") or "",
+        "sources": [{"content": doc.page_content, "metadata": doc.metadata} for doc in result.get("source_documents", [])],
+        "generated_question": result.get("generated_question"),
+        "cache_hit": result.get("cache_hit", False),
+        "retrieval_strategy": result.get("retrieval_strategy"),
+        "prompt_tokens": token_counter.prompt_tokens,
+        "turn_id": trace.turn_id,
+        "total_ms": trace.total_ms,
+    }
+
+
+def dumps(data: Any) -> str:
+    return json.dumps(data, ensure_ascii=False, default=str)
+
+
+async def send_event(response: web.StreamResponse, event: str, data: Dict[str, Any]) -> None:
+    await response.write(f"event: {event}\ndata: {dumps(data)}\n\n".encode("utf-8"))
+
+
+async def read_answer_request(request: web.Request) -> Dict[str, Any]:
+    try:
+        payload = await request.json()
+    except ValueError:
+        raise web.HTTPBadRequest(text=dumps({"error": "invalid JSON"}), content_type="application/json")
+    return parse_answer_request(payload)
+
+
+async def handle_answer(request: web.Request) -> web.Response:
+    answer_request = await read_answer_request(request)
+    pool = request.app[POOL_KEY]
+    async with pool.slot():
+        result = await pool.run(run_answer, request.app[ENGINE_KEY], answer_request)
+    return web.json_response(result, dumps=dumps)
+
+
+async def handle_answer_stream(request: web.Request) -> web.StreamResponse:
+    answer_request = await read_answer_request(request)
+    pool = request.app[POOL_KEY]
+    # 작업자를 얻은 뒤에 응답 헤더를 보내므로 과부하이면 스트림 대신 503을 받음
+    async with pool.slot():
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream", "Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+        await response.prepare(request)
+
+        loop = asyncio.get_running_loop()
+        tokens: asyncio.Queue = asyncio.Queue()
+        cancelled = threading.Event()
+        handler = QueueStreamHandler(loop, tokens, cancelled)
+        task = asyncio.ensure_future(pool.run(run_answer, request.app[ENGINE_KEY], answer_request, [handler]))
+        streamed = False
+        try:
+            while True:
+                token_task = asyncio.ensure_future(tokens.get())
+                done, _ = await asyncio.wait({token_task, task}, return_when=asyncio.FIRST_COMPLETED)
+                if token_task in done:
+                    streamed = True
+                    await send_event(response, "token", {"text": token_task.result()})
+                    continue
+                token_task.cancel()
+                while not tokens.empty():
+                    streamed = True
+                    await send_event(response, "token", {"text": tokens.get_nowait()})
+                break
+
+            try:
+                result = task.result()
+            except Exception as e:
+                await send_event(response, "error", {"error": str(e)})
+                return response
+            if not streamed and result["answer"]:
+                # 캐시 적중 등 스트리밍 없이 만든 답변은 한 번에 전송
+                await send_event(response, "token", {"text": result["answer"]})
+            await send_event(response, "done", result)
+            await response.write_eof()
+        except (ConnectionResetError, asyncio.CancelledError) as e:
+            # 클라이언트 연결이 끊김: 다음 토큰에서 체인을 중단하고 작업이 끝난 뒤 작업자를 반납
+            cancelled.set()
+            with contextlib.suppress(BaseException):
+                await task
+            if isinstance(e, asyncio.CancelledError):
+                raise
+    return response
+
+
+async def handle_sections(request: web.Request) -> web.Response:
+    sections = await asyncio.get_running_loop().run_in_executor(None, request.app[ENGINE_KEY].list_sections)
+    return web.json_response({"sections": sections})
+
+
+async def handle_health(request: web.Request) -> web.Response:
+    return web.json_response({"status": "ok", **request.app[POOL_KEY].stats()})
+
+
+async def handle_metrics(request: web.Request) -> web.Response:
+    return web.Response(text=registry.render(), content_type="text/plain")
+
+
+@web.middleware
+async def auth_middleware(request: web.Request, handler: Any) -> web.StreamResponse:
+    if ANSWER_API_TOKEN and request.path.startswith("/v1/") and request.headers.get("Authorization") != f"Bearer {ANSWER_API_TOKEN}":
+        raise web.HTTPUnauthorized(text=dumps({"error": "unauthorized"}), content_type="application/json")
+    return await handler(request)
+
+
+def create_app(engine: Any, workers: int = ANSWER_SERVER_WORKERS, max_pending: int = ANSWER_SERVER_MAX_PENDING, queue_timeout: float = ANSWER_SERVER_QUEUE_TIMEOUT) -> web.Application:
+    """engine(qa_engine.ChatEngine)으로 답하는 aiohttp 앱을 만듭니다."""
+    app = web.Application(middlewares=[auth_middleware])
+    app[ENGINE_KEY] = engine
+
+    async def on_startup(app: web.Application) -> None:
+        app[POOL_KEY] = AnswerWorkerPool(workers, max_pending, queue_timeout)
+
+    async def on_cleanup(app: web.Application) -> None:
+        app[POOL_KEY].executor.shutdown(wait=False)
+
+    app.on_startup.append(on_startup)
+    app.on_cleanup.append(on_cleanup)
+    app.router.add_post("/v1/answer", handle_answer)
+    app.router.add_post("/v1/answer/stream", handle_answer_stream)
+    app.router.add_get("/v1/sections", handle_sections)
+    app.router.add_get("/healthz", handle_health)
+    app.router.add_get("/metrics", handle_metrics)
+    return app
+
+
+def create_engine_from_env() -> Any:
+    """app.py와 같은 환경 변수로 답변 엔진을 만듭니다 (Supabase가 없어도 VECTOR_STORE_BACKEND=local이면 동작)."""
+    from supabase.client import create_client
+
+    from app_state import get_corpus_version
+    from embedding_cache import create_cached_embeddings
+    from qa_engine import ChatEngine, create_search_client
+    from reranker import RERANK_ENABLED, load_cross_encoder
+    from semantic_cache import SemanticAnswerCache
+
+    openai_api_key = os.getenv("OPENAI_API_KEY")
+    supabase_url, supabase_key = os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_ANON_KEY")
+    supabase_client = create_client(supabase_url, supabase_key) if supabase_url and supabase_key else None
+    return ChatEngine(
+        create_search_client(supabase_client),
+        create_cached_embeddings(openai_api_key),
+        openai_api_key,
+        cross_encoder=load_cross_encoder() if RERANK_ENABLED else None,
+        semantic_cache=SemanticAnswerCache(),
+        corpus_version_loader=(lambda: get_corpus_version(supabase_client)) if supabase_client is not None else None,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="검색 → 답변 HTTP/SSE 서버")
+    parser.add_argument("--host", default=ANSWER_SERVER_HOST)
+    parser.add_argument("--port", type=int, default=ANSWER_SERVER_PORT)
+    parser.add_argument("--workers", type=int, default=ANSWER_SERVER_WORKERS, help="동시에 답변을 생성하는 작업자 수")
+    parser.add_argument("--max-pending", type=int, default=ANSWER_SERVER_MAX_PENDING, help="작업자를 기다릴 수 있는 최대 요청 수")
+    args = parser.parse_args()
+
+    engine = create_engine_from_env()
+    print(f"답변 서버: http://{args.host}:{args.port} (작업자 {args.workers}, 대기 최대 {args.max_pending})")
+    web.run_app(create_app(engine, args.workers, args.max_pending), host=args.host, port=args.port, print=None)
+
+
+if __name__ == "__main__":
+    main()
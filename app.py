@@ -1,20 +1,34 @@
+import time
+
 import streamlit as st
 
+# 이번 실행의 시작 시각 (프로세스의 첫 화면까지 걸린 시간 측정)
+SCRIPT_STARTED = time.perf_counter()
+
 # 스트림릿 페이지 구성 설정 (반드시 다른 st 명령 전에 호출해야 함)
 st.set_page_config(page_title="Gitbook Q&A Chatbot", layout="wide", initial_sidebar_state="expanded")
 
 import os
-import json
 import datetime
 import random
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 
-from langchain_openai import OpenAIEmbeddings, ChatOpenAI
-from langchain_community.vectorstores.supabase import SupabaseVectorStore
-from langchain.chains import RetrievalQAWithSourcesChain
-from langchain.memory import ConversationBufferMemory
-from langchain.chains import ConversationalRetrievalChain
-from supabase.client import Client, create_client
+from langchain_core.callbacks import BaseCallbackHandler
+
+# 첫 화면에는 가벼운 모듈만 import하고, LangChain 체인/OpenAI/Supabase 클라이언트 등 무거운 모듈은
+# 처음 필요할 때 import (보통은 첫 화면 뒤 warm-up이 백그라운드에서 미리 import)
+from chat_store import ChatStore
+from conversation_memory import (
+    DEFAULT_MEMORY_MODE,
+    MEMORY_MODES,
+    PromptTokenCounter,
+    create_conversation_memory,
+    memory_token_count,
+    restore_conversation_memory,
+)
+from startup_profile import startup_profile
+from telemetry import StageTimingHandler, record_tokens, start_metrics_server, start_turn, timed
 
 # .env 파일에서 환경 변수 로드
 load_dotenv()
@@ -25,6 +39,12 @@ SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_ANON_KEY = os.getenv("SUPABASE_ANON_KEY")
 TARGET_GITBOOK_NAME = os.getenv("TARGET_GITBOOK_NAME", "해당 Gitbook")
 CHAT_HISTORY_FILE = os.getenv("CHAT_HISTORY_FILE", "chat_history.json")
+# 사이드바 검색 범위의 "전체" 옵션
+ALL_SECTIONS_LABEL = "전체 문서"
+# 한 번에 그리는 최근 메시지 수 ("이전 메시지 더 보기"를 누를 때마다 이만큼 더 표시)
+CHAT_MESSAGE_WINDOW = int(os.getenv("CHAT_MESSAGE_WINDOW", "20"))
+# 사이드바 대화 히스토리 한 페이지에 표시할 대화 수
+HISTORY_PAGE_SIZE = int(os.getenv("HISTORY_PAGE_SIZE", "15"))
 
 # 추천 질문 목록 - 실제 문서 내용에 맞게 커스터마이징 필요
 DEFAULT_SUGGESTED_QUESTIONS = [
@@ -37,181 +57,6 @@ DEFAULT_SUGGESTED_QUESTIONS = [
     "자주 묻는 질문과 답변"
 ]
 
-# 벡터 DB 기반 초기 추천 질문 생성 함수
-def generate_initial_questions(vector_store, supabase_client, llm, num_questions=4):
-    try:
-        # 벡터 DB에서 대표적인 문서 검색 (임베딩 없이 최근 추가된 문서들)
-        results = supabase_client.from_("documents").select("content, metadata").limit(5).execute()
-        
-        if not results.data or len(results.data) == 0:
-            return random.sample(DEFAULT_SUGGESTED_QUESTIONS, min(num_questions, len(DEFAULT_SUGGESTED_QUESTIONS)))
-        
-        # 검색된 문서 내용 추출
-        doc_contents = []
-        for doc in results.data:
-            content = doc.get('content', '')
-            if content and len(content) > 50:  # 충분히 의미 있는 콘텐츠만 포함
-                doc_contents.append(content[:500])  # 각 문서의 앞부분만 사용
-        
-        if not doc_contents:
-            return random.sample(DEFAULT_SUGGESTED_QUESTIONS, min(num_questions, len(DEFAULT_SUGGESTED_QUESTIONS)))
-        
-        # 문서 내용을 통합하여 LLM에 질문 생성 요청
-        combined_content = "\n\n".join(doc_contents[:3])  # 너무 길지 않게 최대 3개 문서만 사용
-        
-        prompt = f"""
-        다음은 문서 시스템에 저장된 콘텐츠의 일부입니다:
-        {combined_content}
-
-        위 문서 내용을 바탕으로, 사용자가 물어볼 만한 의미 있는 질문 {num_questions}개를 생성해주세요.
-        이 질문들은 문서 시스템이 실제로 답변할 수 있는 내용이어야 합니다.
-        짧고 명확한 질문으로 작성하세요.
-        JSON 형식 없이 질문만 줄바꿈으로 구분하여 반환하세요.
-        """
-        
-        # LLM으로 질문 생성
-        response = llm.invoke(prompt)
-        questions = response.content.strip().split('\n')
-        
-        # 빈 줄 제거하고 앞뒤 공백 제거
-        questions = [q.strip() for q in questions if q.strip()]
-        
-        # 중복 제거 및 최대 개수 제한
-        unique_questions = []
-        for q in questions:
-            if q not in unique_questions:
-                unique_questions.append(q)
-                if len(unique_questions) >= num_questions:
-                    break
-        
-        # 질문이 충분하지 않으면 기본 질문으로 보충
-        if len(unique_questions) < num_questions:
-            remaining = num_questions - len(unique_questions)
-            default_samples = random.sample(DEFAULT_SUGGESTED_QUESTIONS, min(remaining, len(DEFAULT_SUGGESTED_QUESTIONS)))
-            unique_questions.extend(default_samples)
-        
-        return unique_questions[:num_questions]
-    except Exception as e:
-        print(f"초기 추천 질문 생성 오류: {e}")
-        return random.sample(DEFAULT_SUGGESTED_QUESTIONS, min(num_questions, len(DEFAULT_SUGGESTED_QUESTIONS)))
-
-# 벡터 DB에서 임베딩 검색을 통한 고급 추천 질문 생성 함수
-def generate_advanced_initial_questions(vector_store, embeddings, supabase_client, llm, num_questions=4):
-    try:
-        # 주요 주제어 리스트 - 문서에 적합한 일반적인 키워드
-        topic_keywords = [
-            "개요", "설치", "시작하기", "기능", "사용법", "FAQ", 
-            "주요 기능", "가이드", "튜토리얼", "API"
-        ]
-        
-        # 각 주제어에 대한 임베딩 생성 후 관련 문서 검색
-        all_docs = []
-        
-        # 주제어 기반 검색
-        for keyword in topic_keywords[:5]:  # 처리 시간 단축을 위해 상위 5개만 사용
-            try:
-                # 키워드 임베딩 생성
-                query_embedding = embeddings.embed_query(keyword)
-                
-                # 쿼리 벡터와 유사한 문서 검색
-                function_params = {
-                    "query_embedding": query_embedding,
-                    "match_threshold": 0.5,
-                    "match_count": 2  # 각 키워드당 최대 2개 문서
-                }
-                
-                results = supabase_client.rpc(
-                    "match_documents", function_params
-                ).execute()
-                
-                # 결과 추가
-                if results.data:
-                    for doc in results.data:
-                        if doc.get('content') and len(doc.get('content')) > 100:
-                            all_docs.append(doc)
-            except Exception as e:
-                print(f"키워드 '{keyword}' 검색 오류: {e}")
-                continue
-        
-        # 추가 검색: 최신 문서도 포함
-        try:
-            recent_docs = supabase_client.from_("documents").select("content, metadata").order("id", desc=True).limit(3).execute()
-            if recent_docs.data:
-                all_docs.extend(recent_docs.data)
-        except Exception as e:
-            print(f"최신 문서 검색 오류: {e}")
-        
-        # 문서가 없으면 기본 검색 방법 사용
-        if not all_docs:
-            return generate_initial_questions(vector_store, supabase_client, llm, num_questions)
-        
-        # 중복 제거 및 내용 추출
-        unique_contents = []
-        seen_contents = set()
-        
-        for doc in all_docs:
-            content = doc.get('content', '')
-            # 같은 내용이 이미 있는지 확인 (단순화를 위해 앞부분만 체크)
-            content_start = content[:100] if len(content) > 100 else content
-            
-            if content and content_start not in seen_contents:
-                seen_contents.add(content_start)
-                # 긴 문서는 앞부분만 사용
-                if len(content) > 800:
-                    content = content[:800] + "..."
-                unique_contents.append(content)
-        
-        # 최적의 결과를 위해 문서 3~5개만 사용
-        selected_contents = unique_contents[:5]
-        
-        if not selected_contents:
-            return generate_initial_questions(vector_store, supabase_client, llm, num_questions)
-        
-        # 문서 내용 통합
-        combined_content = "\n\n---\n\n".join(selected_contents)
-        
-        # LLM 프롬프트 작성
-        prompt = f"""
-        다음은 문서 시스템에 저장된 실제 콘텐츠의 일부입니다:
-        
-        {combined_content}
-
-        위 문서 내용을 정확히 바탕으로, 다음 조건을 충족하는 질문 {num_questions}개를 생성해주세요:
-        1. 시스템이 위 문서 내용을 기반으로 확실히 답변할 수 있는 질문만 생성하세요.
-        2. 질문은 구체적이고 명확해야 합니다.
-        3. 질문은 문서 내용에 포함된 주요 개념, 기능, 방법 등을 다루어야 합니다.
-        4. 다양한 주제를 다루도록 질문을 분산시키세요.
-        
-        JSON 형식 없이 질문만 줄바꿈으로 구분하여 반환하세요.
-        """
-        
-        # LLM으로 질문 생성
-        response = llm.invoke(prompt)
-        questions = response.content.strip().split('\n')
-        
-        # 빈 줄 제거하고 앞뒤 공백 제거
-        questions = [q.strip() for q in questions if q.strip()]
-        
-        # 중복 제거 및 최대 개수 제한
-        unique_questions = []
-        for q in questions:
-            if q not in unique_questions:
-                unique_questions.append(q)
-                if len(unique_questions) >= num_questions:
-                    break
-        
-        # 질문이 충분하지 않으면 기본 질문으로 보충
-        if len(unique_questions) < num_questions:
-            remaining = num_questions - len(unique_questions)
-            default_samples = random.sample(DEFAULT_SUGGESTED_QUESTIONS, min(remaining, len(DEFAULT_SUGGESTED_QUESTIONS)))
-            unique_questions.extend(default_samples)
-        
-        return unique_questions[:num_questions]
-    except Exception as e:
-        print(f"고급 초기 추천 질문 생성 오류: {e}")
-        # 오류 발생 시 기본 방식으로 폴백
-        return generate_initial_questions(vector_store, supabase_client, llm, num_questions)
-
 # 문맥별 추천 질문 생성 함수
 def generate_context_questions(last_answer, llm):
     try:
@@ -228,7 +73,8 @@ def generate_context_questions(last_answer, llm):
         """
         
         # LLM으로 질문 생성
-        response = llm.invoke(prompt)
+        with timed("followup_questions"):
+            response = llm.invoke(prompt)
         questions = response.content.strip().split('\n')
         
         # 빈 줄 제거하고 앞뒤 공백 제거
@@ -240,45 +86,6 @@ def generate_context_questions(last_answer, llm):
         print(f"추천 질문 생성 오류: {e}")
         return []
 
-# 채팅 내역 저장 함수
-def save_chat_history():
-    chat_data = {
-        "chat_history": st.session_state.chat_history,
-    }
-    
-    # 각 대화 내역도 저장
-    for chat_name, chat_id in st.session_state.chat_history:
-        chat_key = f"chat_{chat_id}"
-        if chat_key in st.session_state:
-            chat_data[chat_key] = st.session_state[chat_key]
-    
-    try:
-        with open(CHAT_HISTORY_FILE, 'w', encoding='utf-8') as f:
-            json.dump(chat_data, f, ensure_ascii=False, indent=2)
-    except Exception as e:
-        st.warning(f"채팅 내역 저장 중 오류 발생: {e}")
-
-# 채팅 내역 불러오기 함수
-def load_chat_history():
-    try:
-        if os.path.exists(CHAT_HISTORY_FILE):
-            with open(CHAT_HISTORY_FILE, 'r', encoding='utf-8') as f:
-                chat_data = json.load(f)
-                
-            # 채팅 히스토리 목록 불러오기
-            if "chat_history" in chat_data:
-                st.session_state.chat_history = chat_data["chat_history"]
-            
-            # 각 대화 내역 불러오기
-            for key, value in chat_data.items():
-                if key.startswith("chat_") and key != "chat_history":
-                    st.session_state[key] = value
-    except Exception as e:
-        st.warning(f"채팅 내역 불러오기 중 오류 발생: {e}")
-        # 오류 발생 시 초기화
-        if "chat_history" not in st.session_state:
-            st.session_state.chat_history = []
-
 # 환경 변수 유효성 검사
 if not OPENAI_API_KEY or not SUPABASE_URL or not SUPABASE_ANON_KEY:
     missing_vars = []
@@ -293,243 +100,343 @@ if not OPENAI_API_KEY or not SUPABASE_URL or not SUPABASE_ANON_KEY:
     st.info("create_env.py 스크립트로 생성된 .env 파일을 편집하여 필요한 값을 채워주세요.")
     st.stop()
 
-# Supabase 클라이언트 초기화 (한 번만 실행되도록 캐싱)
-@st.cache_resource
+# 공유 클라이언트는 모두 처음 필요할 때 만들고 한 번만 실행되도록 캐싱 (보통은 warm-up이 미리 만들어 둠)
+# warm-up 스레드에서도 호출하므로 화면에 그리는 st 명령(스피너, 오류 표시)을 쓰지 않고, 실패하면 예외를 그대로 전달 (다음 호출에서 다시 시도)
+
+# Supabase 클라이언트 초기화
+@st.cache_resource(show_spinner=False)
 def init_supabase_client():
-    try:
-        return create_client(SUPABASE_URL, SUPABASE_ANON_KEY)
-    except Exception as e:
-        st.error(f"Supabase 클라이언트 초기화 실패: {e}")
-        return None
+    from supabase.client import create_client
 
-# ChatOpenAI 모델 초기화 (한 번만 실행되도록 캐싱)
-@st.cache_resource
+    return create_client(SUPABASE_URL, SUPABASE_ANON_KEY)
+
+# ChatOpenAI 모델 초기화 (모든 LLM이 공유 연결 풀/재시도/동시 실행 제한 사용)
+# 대화 요약과 추천 질문 생성은 빠른 모델로 보냄 (model_router.py의 route 설정)
+@st.cache_resource(show_spinner=False)
 def init_chat_model():
-    return ChatOpenAI(
-        temperature=0.1, 
-        model_name='gpt-3.5-turbo', 
-        openai_api_key=OPENAI_API_KEY
-    )
+    from model_router import create_routed_chat_model
 
-supabase_client = init_supabase_client()
-if not supabase_client:
-    st.stop()
+    return create_routed_chat_model("memory_summary", OPENAI_API_KEY)
 
-# LLM 모델 초기화
-llm = init_chat_model()
+@st.cache_resource(show_spinner=False)
+def init_followup_model():
+    from model_router import create_routed_chat_model
 
-# 채팅 히스토리 로드 (앱 시작 시)
-if "chat_history" not in st.session_state:
-    st.session_state.chat_history = []
-    load_chat_history()
-
-# 대화 메모리 초기화 (세션 상태 사용)
-if "memory" not in st.session_state:
-    st.session_state.memory = ConversationBufferMemory(
-        memory_key="chat_history",
-        return_messages=True,
-        output_key="answer"
-    )
+    return create_routed_chat_model("followup_questions", OPENAI_API_KEY)
 
-# Langchain 구성 요소 초기화 (한 번만 실행되도록 캐싱)
+# 대화 저장소 초기화 (모든 세션이 공유, 이전 chat_history.json은 처음 한 번만 가져옴)
 @st.cache_resource
-def init_langchain_components(_supabase_client, _memory): 
+def init_chat_store():
+    store = ChatStore()
     try:
-        embeddings = OpenAIEmbeddings(openai_api_key=OPENAI_API_KEY)
-        
-        # Supabase Vector Store 초기화
-        vector_store = SupabaseVectorStore(
-            client=_supabase_client,
-            embedding=embeddings,
-            table_name="documents",
-            query_name="match_documents"
-        )
-        
-        llm = ChatOpenAI(
-            temperature=0.1, 
-            model_name='gpt-3.5-turbo', 
-            openai_api_key=OPENAI_API_KEY
-        )
-        
-        # 검색기 설정
-        retriever = vector_store.as_retriever(
-            search_type="similarity",
-            search_kwargs={
-                'k': 5, 
-                'score_threshold': 0.5, 
-                'filter': {} 
-            } 
-        )
-        
-        # ConversationalRetrievalChain 사용 (대화 기억 기능 포함)
-        qa_chain = ConversationalRetrievalChain.from_llm(
-            llm=llm,
-            retriever=retriever,
-            memory=_memory,
-            return_source_documents=True,
-            return_generated_question=True,
-        )
-            
-        return qa_chain, vector_store, llm, embeddings
+        imported = store.migrate_json_file(CHAT_HISTORY_FILE)
+        if imported:
+            print(f"{CHAT_HISTORY_FILE}에서 대화 {imported}개를 가져왔습니다.")
     except Exception as e:
-        st.error(f"Langchain 구성 요소 초기화 실패: {e}")
-        return None, None, None, None
+        print(f"이전 채팅 내역 가져오기 실패: {e}")
+    return store
 
-qa_result = init_langchain_components(supabase_client, st.session_state.memory)
-if not qa_result or qa_result[0] is None:
-    st.stop()
+chat_store = init_chat_store()
 
-qa_chain, vector_store, qa_llm, embeddings = qa_result
+# 대화 목록 로드 (앱 시작 시 제목만 읽고, 메시지는 대화를 열 때 불러옴)
+if "chat_history" not in st.session_state:
+    try:
+        st.session_state.chat_history = chat_store.list_conversations()
+    except Exception as e:
+        st.warning(f"채팅 내역 불러오기 중 오류 발생: {e}")
+        st.session_state.chat_history = []
 
 # 채팅 기록 초기화
 if "messages" not in st.session_state:
     st.session_state.messages = [{"role": "assistant", "content": "안녕하세요! Gitbook 문서에 대해 무엇이든 물어보세요."}]
 
-# --- 간단한 보완 옵션: 벡터 DB 없이도 작동할 수 있도록 기본 질문 사용 --- #
-def get_default_questions(num_questions=4):
-    """벡터 DB 접근에 실패한 경우 기본 질문 반환"""
-    return random.sample(DEFAULT_SUGGESTED_QUESTIONS, min(num_questions, len(DEFAULT_SUGGESTED_QUESTIONS)))
+# 대화 기억 방식 (사이드바에서 바꾸면 다음에 메모리를 쓸 때 현재 대화로 다시 구성)
+if st.session_state.get("memory_mode") not in MEMORY_MODES:
+    st.session_state.memory_mode = DEFAULT_MEMORY_MODE if DEFAULT_MEMORY_MODE in MEMORY_MODES else "buffer"
+
+# 대화 메모리 (세션 상태 사용, 요약용 LLM 클라이언트가 필요하므로 첫 화면이 아니라 처음 쓸 때 현재 대화로 구성)
+def get_conversation_memory():
+    if "memory" not in st.session_state or st.session_state.get("memory_mode_applied") != st.session_state.memory_mode:
+        st.session_state.memory = create_conversation_memory(st.session_state.memory_mode, init_chat_model())
+        restore_conversation_memory(st.session_state.memory, st.session_state.messages)
+        st.session_state.memory_mode_applied = st.session_state.memory_mode
+    return st.session_state.memory
+
+# 답변 서버(answer_server.py)를 지정하면 이 앱은 서버의 클라이언트로 동작 (검색/답변은 서버에서 실행)
+@st.cache_resource(show_spinner=False)
+def init_answer_api_client():
+    from answer_client import ANSWER_API_TOKEN, ANSWER_API_URL, AnswerAPIClient
+
+    return AnswerAPIClient(ANSWER_API_URL, ANSWER_API_TOKEN) if ANSWER_API_URL else None
+
+# 검색 RPC를 처리할 클라이언트 (VECTOR_STORE_BACKEND=local이면 로컬 인덱스 스냅샷, 아니면 Supabase)
+@st.cache_resource(show_spinner=False)
+def init_search_client():
+    from qa_engine import create_search_client
+
+    return create_search_client(init_supabase_client())
+
+# 재정렬 모델 (RERANK_MODEL 지정 시 CrossEncoder, 없으면 None → 어휘 점수로 재정렬)
+@st.cache_resource(show_spinner=False)
+def init_cross_encoder():
+    from reranker import RERANK_ENABLED, load_cross_encoder
+
+    return load_cross_encoder() if RERANK_ENABLED else None
+
+# 의미 기반 답변 캐시 (모든 세션이 공유, 반복 질문은 LLM/검색 없이 바로 답변)
+@st.cache_resource(show_spinner=False)
+def init_semantic_cache():
+    from semantic_cache import SemanticAnswerCache
+
+    return SemanticAnswerCache()
+
+# 모든 세션이 공유하는 답변 엔진 (임베딩, 벡터 스토어, LLM 클라이언트, 검색 범위별 QA 체인, 답변 캐시) - 프로세스당 한 번만 생성
+# QA 체인에는 메모리가 없으므로 대화 기록은 답변할 때 세션별로 전달
+@st.cache_resource(show_spinner=False)
+def init_chat_engine():
+    from app_state import get_corpus_version
+    from embedding_cache import create_cached_embeddings
+    from qa_engine import ChatEngine
+
+    supabase_client = init_supabase_client()
+    return ChatEngine(
+        init_search_client(),
+        # 디스크 임베딩 캐시 사용 (같은 질문/키워드는 API 호출 없이 재사용)
+        create_cached_embeddings(OPENAI_API_KEY),
+        OPENAI_API_KEY,
+        cross_encoder=init_cross_encoder(),
+        semantic_cache=init_semantic_cache(),
+        # 수집 시 갱신되는 문서 버전이 바뀌면 답변 캐시를 비움
+        corpus_version_loader=lambda: get_corpus_version(supabase_client)
+    )
 
-# 대체 질문 생성 함수 - 수정된 버전
-def generate_alternative_questions(supabase_client, llm, num_questions=4):
-    """데이터베이스 직접 쿼리를 통한 추천 질문 생성"""
+# 답변할 때 사용할 엔진 (API 모드면 None) - 초기화에 실패하면 오류를 표시하고 이번 실행을 멈춤
+def get_chat_engine():
     try:
-        # 직접 데이터베이스에서 문서 샘플 가져오기
-        results = supabase_client.from_("documents").select("content").limit(5).execute()
-        
-        if not results.data or len(results.data) == 0:
-            print("문서가 없거나 데이터베이스 접근 실패")
-            return get_default_questions(num_questions)
-        
-        # 검색된 문서 내용 추출
-        doc_contents = []
-        for doc in results.data:
-            content = doc.get('content', '')
-            if content and len(content) > 50:
-                doc_contents.append(content[:500]) 
-        
-        if not doc_contents:
-            print("유효한 문서 콘텐츠 없음")
-            return get_default_questions(num_questions)
-        
-        # 문서 내용 결합
-        combined_content = "\n\n".join(doc_contents[:3])
-        
-        prompt = f"""
-        다음은 문서 시스템에 저장된 콘텐츠의 일부입니다:
-        {combined_content}
-
-        위 문서 내용을 바탕으로, 사용자가 물어볼 만한 의미 있는 질문 {num_questions}개를 생성해주세요.
-        이 질문들은 문서 시스템이 실제로 답변할 수 있는 내용이어야 합니다.
-        짧고 명확한 질문으로 작성하세요.
-        JSON 형식 없이 질문만 줄바꿈으로 구분하여 반환하세요.
-        """
-        
-        response = llm.invoke(prompt)
-        questions = response.content.strip().split('\n')
-        
-        # 빈 줄 제거하고 앞뒤 공백 제거
-        questions = [q.strip() for q in questions if q.strip()]
-        
-        # 중복 제거 및 최대 개수 제한
-        unique_questions = []
-        for q in questions:
-            if q not in unique_questions:
-                unique_questions.append(q)
-                if len(unique_questions) >= num_questions:
-                    break
-        
-        # 질문이 충분하지 않으면 기본 질문으로 보충
-        if len(unique_questions) < num_questions:
-            remaining = num_questions - len(unique_questions)
-            default_samples = get_default_questions(remaining)
-            unique_questions.extend(default_samples)
-        
-        return unique_questions[:num_questions]
+        return init_chat_engine() if init_answer_api_client() is None else None
     except Exception as e:
-        print(f"대체 추천 질문 생성 오류: {e}")
-        return get_default_questions(num_questions)
+        st.error(f"답변 엔진 초기화 실패: {e}")
+        st.info("로컬 인덱스를 사용하는 경우 먼저 `python local_vector_index.py export`로 스냅샷을 만들어주세요.")
+        st.stop()
 
-# 추천 질문 초기화 - 벡터 DB 기반으로 생성
-if "suggested_questions" not in st.session_state:
+# 검색 범위로 선택할 수 있는 문서 섹션 목록 (URL 경로 접두사, 10분간 캐싱)
+@st.cache_data(ttl=600, show_spinner=False)
+def load_document_sections():
     try:
-        # 벡터 DB 기반 고급 추천 질문 생성 시도
-        initial_questions = generate_advanced_initial_questions(vector_store, embeddings, supabase_client, qa_llm, num_questions=4)
+        answer_api = init_answer_api_client()
+        if answer_api is not None:
+            return answer_api.list_sections()
+        return init_chat_engine().list_sections()
     except Exception as e:
-        print(f"고급 추천 질문 생성 실패: {e}")
-        try:
-            # 대체 방식 시도
-            initial_questions = generate_alternative_questions(supabase_client, qa_llm, num_questions=4)
-        except Exception as backup_e:
-            print(f"대체 추천 질문 생성도 실패: {backup_e}")
-            # 마지막 대안으로 기본 질문 사용
-            initial_questions = get_default_questions(4)
-    
-    st.session_state.suggested_questions = initial_questions
+        print(f"섹션 목록 조회 실패: {e}")
+        return []
 
-# 추천 질문 처리 함수
-def handle_suggested_question(question):
-    # 사용자 질문을 채팅창에 추가
-    st.session_state.messages.append({"role": "user", "content": question})
-    
-    # 답변 생성
+# 검색 범위 (사이드바 selectbox의 값은 위젯이 그려지기 전에도 session_state에 남아 있음)
+# warm-up이 끝나기 전에는 Supabase 조회를 기다리지 않고 전체 문서만 검색 (끝나면 앱을 다시 실행하여 표시)
+document_sections = load_document_sections() if startup_profile.warmup_done else []
+if st.session_state.get("search_section") not in [ALL_SECTIONS_LABEL] + document_sections:
+    st.session_state.search_section = ALL_SECTIONS_LABEL
+selected_section = st.session_state.search_section
+
+# 단계별 지연 시간 지표 엔드포인트 (TELEMETRY_METRICS_PORT를 지정한 경우에만, 프로세스당 한 번 시작)
+@st.cache_resource
+def init_metrics_server():
+    try:
+        return start_metrics_server()
+    except OSError as e:
+        print(f"지표 엔드포인트 시작 실패: {e}")
+        return None
+
+init_metrics_server()
+
+# 미리 생성된 추천 질문 풀 (ingest_gitbook.py 또는 suggested_questions.py가 생성, 모든 세션이 공유)
+# 아직 생성되지 않았으면 DEFAULT_SUGGESTED_QUESTIONS 사용
+@st.cache_data(ttl=600, show_spinner=False)
+def load_suggested_question_pool():
+    from suggested_questions import load_question_pool
+
+    return load_question_pool(init_supabase_client()) or DEFAULT_SUGGESTED_QUESTIONS
+
+# 추천 질문 풀에서 무작위로 추출 (OpenAI 호출 없음, warm-up이 끝나기 전에는 기본 질문에서 추출)
+def sample_suggested_questions(num_questions=4):
+    pool = load_suggested_question_pool() if startup_profile.warmup_done else DEFAULT_SUGGESTED_QUESTIONS
+    return random.sample(pool, min(num_questions, len(pool)))
+
+# 추천 질문 초기화 (기본 질문으로 시작한 새 대화는 warm-up이 끝나면 질문 풀에서 다시 추출)
+if "suggested_questions" not in st.session_state or (
+    st.session_state.get("suggested_from_defaults") and startup_profile.warmup_done and len(st.session_state.messages) == 1
+):
+    st.session_state.suggested_questions = sample_suggested_questions(4)
+    st.session_state.suggested_from_defaults = not startup_profile.warmup_done
+
+# 답변 후 후속 추천 질문 생성과 앱 시작 warm-up을 실행하는 백그라운드 작업자 (모든 세션이 공유)
+@st.cache_resource
+def init_background_executor():
+    return ThreadPoolExecutor(max_workers=4, thread_name_prefix="app-background")
+
+background_executor = init_background_executor()
+
+# 후속 추천 질문 생성을 백그라운드로 시작 (답변 표시를 기다리게 하지 않음)
+def start_followup_questions(answer):
+    st.session_state.followup_future = background_executor.submit(generate_context_questions, answer, init_followup_model())
+
+# 백그라운드 생성이 끝났으면 결과를 추천 질문에 반영
+def collect_followup_questions():
+    future = st.session_state.get("followup_future")
+    if future is None or not future.done():
+        return
+    st.session_state.followup_future = None
+    try:
+        context_questions = future.result()
+    except Exception as e:
+        print(f"추천 질문 생성 오류: {e}")
+        context_questions = []
+    # 생성에 실패하면 질문 풀에서 추출
+    st.session_state.suggested_questions = context_questions or sample_suggested_questions(3)
+
+# 진행 중인 후속 추천 질문 생성 취소 (새 대화/대화 지우기)
+def cancel_followup_questions():
+    future = st.session_state.get("followup_future")
+    if future is not None:
+        future.cancel()
+    st.session_state.followup_future = None
+
+NO_ANSWER_MESSAGE = "죄송합니다, 답변을 찾을 수 없습니다. 컨텍스트가 부족하거나 질문이 명확하지 않을 수 있습니다."
+ERROR_ANSWER_MESSAGE = "죄송합니다, 현재 답변을 드릴 수 없습니다. 관리자에게 문의해주세요."
+
+# 답변 LLM이 생성하는 토큰을 message_placeholder에 바로 표시하는 콜백
+class StreamlitAnswerStreamHandler(BaseCallbackHandler):
+    def __init__(self, placeholder, min_update_interval=0.05):
+        self.placeholder = placeholder
+        self.min_update_interval = min_update_interval  # 화면 갱신 최소 간격 (초)
+        self.text = ""
+        self._last_update = 0.0
+
+    def on_llm_new_token(self, token, **kwargs):
+        self.text += token
+        now = time.monotonic()
+        if now - self._last_update >= self.min_update_interval:
+            self.placeholder.markdown(self.text + "▌")
+            self._last_update = now
+
+# 참고 문서 URL 목록 (중복 URL 제거, 메시지에는 답변과 따로 저장)
+def source_urls(source_documents):
+    urls = []
+    for doc in source_documents or []:
+        source_url = doc.metadata.get('source', '출처 정보 없음')
+        if source_url not in urls and source_url != '출처 정보 없음':
+            urls.append(source_url)
+    return urls
+
+# 참고 문서 링크 목록 (같은 출처 목록은 다시 실행될 때마다 만들지 않고 캐시에서 가져옴)
+@st.cache_data(max_entries=1000, show_spinner=False)
+def format_source_links(urls):
+    if not urls:
+        return ""
+    links = "\n\n---\n**참고 문서:**\n"
+    for source_url in urls:
+        # URL의 마지막 부분을 제목처럼 사용
+        link_title = source_url.split('/')[-1] or source_url.split('/')[-2] or "문서"
+        link_title = link_title.replace('-', ' ').title() # 가독성 향상
+        links += f"- [{link_title}]({source_url})\n"
+    return links
+
+# 메시지 본문 + 참고 문서 링크 (이전에 저장된 대화는 링크가 본문에 포함되어 있음)
+def render_message_content(message):
+    return message["content"] + format_source_links(tuple(message.get("sources") or ()))
+
+# 턴별 프롬프트 토큰 수 표시 문자열
+def format_prompt_tokens(prompt_tokens):
+    labels = {"condense_question": "질문 재구성", "answer": "답변", "other": "기타"}
+    parts = [f"{labels.get(label, label)} {tokens:,}" for label, tokens in prompt_tokens.items()]
+    return f"프롬프트 토큰: {' · '.join(parts)} (합계 {sum(prompt_tokens.values()):,})"
+
+# 질문에 대한 답변을 스트리밍으로 표시하고 메시지 히스토리에 추가 (단계별 소요 시간과 토큰 수를 계측)
+def answer_question(question):
+    from qa_engine import RETRIEVAL_MODE
+
+    with start_turn(section=selected_section, retrieval_mode=RETRIEVAL_MODE, memory_mode=st.session_state.memory_mode) as trace:
+        answer_question_traced(question, trace)
+    st.session_state.last_turn_trace = trace.to_dict()
+
+def answer_question_traced(question, trace):
+    from ingest_pipeline import count_tokens
+    from qa_engine import RETRIEVAL_MODE
+
+    answer_api = init_answer_api_client()
+    chat_engine = get_chat_engine()
     with st.chat_message("assistant"):
         message_placeholder = st.empty()
-        full_response_content = ""
+        message_placeholder.markdown("답변을 생성 중입니다... 🤔")
+        stream_handler = StreamlitAnswerStreamHandler(message_placeholder)
+        token_counter = PromptTokenCounter()
         
-        with st.spinner("답변을 생성 중입니다... 🤔"):
-            try:
-                # Langchain QA 실행
-                response = qa_chain.invoke({"question": question})
-                
-                # 응답 추출
-                answer = response.get("answer", "")
-                source_documents = response.get("source_documents", [])
-                    
-                if not answer:
-                    answer = "죄송합니다, 답변을 찾을 수 없습니다. 컨텍스트가 부족하거나 질문이 명확하지 않을 수 있습니다."
-
-                full_response_content = answer
-
-                if source_documents:
-                    full_response_content += "\n\n---\n**참고 문서:**\n"
-                    # 중복된 source URL을 제거하기 위한 set
-                    unique_sources = set()
-                    for doc in source_documents:
-                        source_url = doc.metadata.get('source', '출처 정보 없음')
-                        if source_url not in unique_sources and source_url != '출처 정보 없음':
-                            # URL의 마지막 부분을 제목처럼 사용
-                            link_title = source_url.split('/')[-1] or source_url.split('/')[-2] or "문서"
-                            link_title = link_title.replace('-', ' ').title() # 가독성 향상
-                            full_response_content += f"- [{link_title}]({source_url})\n"
-                            unique_sources.add(source_url)
-                
-                message_placeholder.markdown(full_response_content)
-                
-                # 맥락에 맞는 새로운 추천 질문 생성
-                context_questions = generate_context_questions(answer, qa_llm)
-                if context_questions:
-                    st.session_state.suggested_questions = context_questions
-                else:
-                    # 새로운 기본 질문 표시
-                    st.session_state.suggested_questions = random.sample(
-                        DEFAULT_SUGGESTED_QUESTIONS, 
-                        min(3, len(DEFAULT_SUGGESTED_QUESTIONS))
-                    )
-
-            except Exception as e:
-                st.error(f"답변 생성 중 오류가 발생했습니다: {e}")
-                full_response_content = "죄송합니다, 현재 답변을 드릴 수 없습니다. 관리자에게 문의해주세요."
-                message_placeholder.markdown(full_response_content)
-                
-                # 오류 발생 시 기본 추천 질문 표시
-                st.session_state.suggested_questions = random.sample(
-                    DEFAULT_SUGGESTED_QUESTIONS, 
-                    min(3, len(DEFAULT_SUGGESTED_QUESTIONS))
+        try:
+            # 공유 엔진에는 메모리가 없으므로 이 세션의 대화 기록을 입력으로 전달
+            # (대화 기록이 없으면 의미 기반 캐시를 먼저 조회, 답변 토큰은 stream_handler로 전달됨)
+            chat_history = get_conversation_memory().load_memory_variables({})["chat_history"]
+            section = None if selected_section == ALL_SECTIONS_LABEL else selected_section
+            if answer_api is not None:
+                with timed("answer_api"):
+                    response = answer_api.answer(question, chat_history, section, RETRIEVAL_MODE, on_token=stream_handler.on_llm_new_token)
+                token_counter.prompt_tokens = response.get("prompt_tokens") or {}
+            else:
+                response = chat_engine.answer(
+                    question,
+                    chat_history,
+                    section=section,
+                    callbacks=[stream_handler, token_counter, StageTimingHandler(trace)],
+                    cache_namespace=selected_section
                 )
+            if response.get("cache_hit"):
+                trace.attrs["cache_hit"] = True
+            if response.get("retrieval_strategy"):
+                # 미리 검색(SPECULATIVE_RETRIEVAL) 결과를 그대로 썼는지, 다시 검색했는지 등
+                trace.attrs["retrieval_strategy"] = response["retrieval_strategy"]
+
+            # 응답 추출
+            answer = response.get("answer", "") or stream_handler.text
+            source_documents = response.get("source_documents", [])
+
+            if not answer:
+                answer = NO_ANSWER_MESSAGE
+
+            # 답변이 끝나면 참고 문서 링크를 덧붙여 다시 표시
+            sources = source_urls(source_documents)
+            full_response_content = answer
+            message_placeholder.markdown(answer + format_source_links(tuple(sources)))
+            if token_counter.prompt_tokens:
+                st.caption(format_prompt_tokens(token_counter.prompt_tokens))
+            for label, tokens in token_counter.prompt_tokens.items():
+                record_tokens(f"prompt_{label}", tokens)
+            record_tokens("completion_answer", count_tokens(answer))
+
+            # 이 세션의 대화 메모리에 기록 (답변 표시 후에 하므로 요약 방식의 요약 호출이 답변을 늦추지 않음)
+            with timed("memory_save"):
+                get_conversation_memory().save_context({"question": question}, {"answer": answer})
+            
+            # 맥락에 맞는 새로운 추천 질문은 백그라운드에서 생성 (준비될 때까지 질문 풀에서 추출한 질문 표시)
+            st.session_state.suggested_questions = sample_suggested_questions(3)
+            start_followup_questions(answer)
 
-        # 메시지 히스토리에 추가
-        st.session_state.messages.append({"role": "assistant", "content": full_response_content})
+        except Exception as e:
+            trace.attrs["outcome"] = "error"
+            st.error(f"답변 생성 중 오류가 발생했습니다: {e}")
+            full_response_content = ERROR_ANSWER_MESSAGE
+            message_placeholder.markdown(full_response_content)
+            
+            # 오류 발생 시 기본 추천 질문 표시
+            cancel_followup_questions()
+            st.session_state.suggested_questions = sample_suggested_questions(3)
+            sources = []
+
+        # 메시지 히스토리에 추가 (이번 턴의 참고 문서 URL과 프롬프트 토큰 수 포함)
+        st.session_state.messages.append({
+            "role": "assistant",
+            "content": full_response_content,
+            "sources": sources,
+            "prompt_tokens": token_counter.prompt_tokens
+        })
         
         # 대화 자동 저장
         # 현재 대화 이름 저장
@@ -537,9 +444,56 @@ def handle_suggested_question(question):
             first_user_msg = question
             chat_title = first_user_msg[:15] + ("..." if len(first_user_msg) > 15 else "")
             st.session_state["current_time_str"] = chat_title
+
+        # 저장된 대화를 이어가는 중이면 이번 턴의 메시지만 저장소에 추가
+        if st.session_state.get("conversation_id"):
+            with timed("save_conversation"):
+                save_current_conversation()
+
+# 현재 대화 저장 함수 - 처음 저장할 때 대화 ID를 만들고, 이후에는 새 메시지만 추가
+def save_current_conversation():
+    if len(st.session_state.get("messages", [])) <= 1:
+        return False
+
+    chat_id = st.session_state.get("conversation_id")
+    current_title = st.session_state.get("current_time_str", "새 대화")
+    if not current_title or current_title == "새 대화":
+        current_title = f"대화 {datetime.datetime.now().strftime('%Y-%m-%d %H:%M')}"
+    if not chat_id:
+        # 타임스탬프 기반 ID 생성
+        chat_id = f"chat_{datetime.datetime.now().strftime('%Y%m%d%H%M%S%f')}"
+
+    try:
+        chat_store.save_conversation(chat_id, current_title, st.session_state.messages)
+    except Exception as e:
+        st.warning(f"채팅 내역 저장 중 오류 발생: {e}")
+        return False
+
+    if not st.session_state.get("conversation_id"):
+        st.session_state.conversation_id = chat_id
+        st.session_state.chat_history.append((current_title, chat_id))
+    return True
+
+# 추천 질문 처리 함수 - 입력창과 같은 위치에서 답변하도록 질문을 넘기고 앱 전체를 다시 실행
+def handle_suggested_question(question):
+    st.session_state.pending_question = question
+    st.rerun(scope="app")
+
+# 추천 질문 버튼 표시
+def render_suggested_questions():
+    # 후속 추천 질문이 준비되면 앱 전체를 다시 실행하여 반영 (주기적 확인은 이때 멈춤)
+    future = st.session_state.get("followup_future")
+    if future is not None and future.done():
+        st.rerun(scope="app")
+
+    st.write("#### 추천 질문:")
+    if future is not None:
+        st.caption("답변에 맞는 추천 질문을 준비하고 있습니다...")
+    cols = st.columns(len(st.session_state.suggested_questions))
     
-    # 페이지 새로고침
-    st.rerun()
+    for i, question in enumerate(st.session_state.suggested_questions):
+        if cols[i].button(question, key=f"suggested_{i}", use_container_width=True):
+            handle_suggested_question(question)
 
 # --- Streamlit UI ---
 st.title("📚 Gitbook Q&A Chatbot")
@@ -548,74 +502,119 @@ st.caption(f"'{TARGET_GITBOOK_NAME}' 문서 기반 질문 답변 서비스")
 # 사이드바 설정
 st.sidebar.header("챗봇 설정")
 
+# 검색 범위 선택 (선택한 섹션의 문서만 검색하여 LLM에 보내는 문맥을 줄임)
+if document_sections:
+    st.sidebar.selectbox(
+        "🔎 검색 범위",
+        [ALL_SECTIONS_LABEL] + document_sections,
+        key="search_section",
+        help="선택한 섹션(문서 경로)의 문서에서만 답변을 찾습니다."
+    )
+
+# 대화 기억 방식 선택 (바꾸면 현재 대화로 메모리를 다시 구성)
+st.sidebar.selectbox(
+    "🧠 대화 기억 방식",
+    list(MEMORY_MODES),
+    format_func=lambda mode: MEMORY_MODES[mode],
+    key="memory_mode",
+    help="대화가 길어져도 질문 재구성 프롬프트가 토큰 예산을 넘지 않도록 오래된 대화를 버리거나 요약합니다."
+)
+# 대화가 시작되기 전에는 메모리를 만들지 않음 (첫 화면에서 요약용 LLM 클라이언트를 만들지 않도록)
+if len(st.session_state.messages) > 1:
+    try:
+        st.sidebar.caption(f"다음 질문에 포함될 대화 기록: {memory_token_count(get_conversation_memory()):,} 토큰")
+    except Exception as e:
+        print(f"대화 기록 토큰 수 계산 오류: {e}")
+
+# 디버그 패널 - 마지막 턴의 단계별 소요 시간과 토큰 수
+if st.sidebar.checkbox("⏱️ 마지막 답변 단계별 소요 시간", key="show_turn_debug"):
+    last_turn = st.session_state.get("last_turn_trace")
+    if last_turn:
+        status = "캐시 적중" if last_turn.get("cache_hit") else ("오류" if last_turn.get("outcome") == "error" else "정상")
+        st.sidebar.caption(f"전체 {last_turn['total_ms']:,.0f} ms · {status}")
+        st.sidebar.dataframe(
+            [{"단계": span["stage"], "시작 (ms)": span["start_ms"], "소요 (ms)": span["duration_ms"]} for span in last_turn["spans"]],
+            hide_index=True,
+            use_container_width=True
+        )
+        if last_turn["tokens"]:
+            st.sidebar.caption(" · ".join(f"{label} {count:,}" for label, count in last_turn["tokens"].items()) + " 토큰")
+    else:
+        st.sidebar.caption("아직 기록된 답변이 없습니다.")
+
 # 대화 히스토리 섹션 추가
 st.sidebar.markdown("---")
 st.sidebar.subheader("💬 대화 히스토리")
 
-# 저장된 대화 히스토리 표시
-history_cols = st.sidebar.columns([4, 1])
-for i, (chat_name, chat_id) in enumerate(st.session_state.chat_history):
-    # 대화 선택
-    if history_cols[0].button(f"{chat_name}", key=f"history_{i}", use_container_width=True):
-        # 선택한 대화 내용 불러오기
-        st.session_state.messages = st.session_state[f"chat_{chat_id}"].copy()
-        # 메모리 초기화 (해당 대화에 맞게)
-        st.session_state.memory.clear()
-        # 메모리 재구성 (대화 내용 기반)
-        for msg in st.session_state.messages:
-            if msg["role"] == "user":
-                user_msg = msg["content"]
-            elif msg["role"] == "assistant" and user_msg:
-                st.session_state.memory.chat_memory.add_user_message(user_msg)
-                st.session_state.memory.chat_memory.add_ai_message(msg["content"])
-                user_msg = None
-        st.rerun()
-    
-    # 대화 삭제 버튼
-    if history_cols[1].button("🗑️", key=f"delete_{i}", help="이 대화 삭제하기"):
-        # 대화 삭제 확인
-        chat_key = f"chat_{chat_id}"
-        if chat_key in st.session_state:
-            del st.session_state[chat_key]
-        
-        # 히스토리에서 제거
-        st.session_state.chat_history.pop(i)
-        save_chat_history()
-        st.rerun()
+# 저장된 대화 히스토리 표시 (최근 대화부터 한 페이지씩, 제목 검색 가능)
+# 검색어 입력과 페이지 이동은 이 영역만 다시 그리고, 대화를 열거나 지울 때만 앱 전체를 다시 실행
+def set_history_page(page):
+    st.session_state.history_page = page
+
+@st.fragment
+def render_chat_history():
+    query = st.text_input(
+        "대화 검색",
+        key="history_query",
+        placeholder="제목으로 검색",
+        label_visibility="collapsed",
+        on_change=set_history_page,
+        args=(0,)
+    ).strip().lower()
+    conversations = [item for item in reversed(st.session_state.chat_history) if query in item[0].lower()]
+    if not conversations:
+        st.caption("검색 결과가 없습니다." if query else "저장된 대화가 없습니다.")
+        return
+
+    page_count = (len(conversations) - 1) // HISTORY_PAGE_SIZE + 1
+    page = min(st.session_state.get("history_page", 0), page_count - 1)
+    history_cols = st.columns([4, 1])
+    for chat_name, chat_id in conversations[page * HISTORY_PAGE_SIZE:(page + 1) * HISTORY_PAGE_SIZE]:
+        # 대화 선택
+        if history_cols[0].button(f"{chat_name}", key=f"history_{chat_id}", use_container_width=True):
+            # 선택한 대화 내용 불러오기 (이 대화의 메시지만 읽음)
+            cancel_followup_questions()
+            st.session_state.messages = chat_store.load_messages(chat_id)
+            st.session_state.conversation_id = chat_id
+            st.session_state["current_time_str"] = chat_name
+            st.session_state.message_window = CHAT_MESSAGE_WINDOW
+            # 메모리는 다음에 쓸 때 이 대화로 다시 구성 (선택한 기억 방식의 토큰 예산 적용)
+            st.session_state.pop("memory", None)
+            st.rerun(scope="app")
+
+        # 대화 삭제 버튼
+        if history_cols[1].button("🗑️", key=f"delete_{chat_id}", help="이 대화 삭제하기"):
+            # 저장소와 히스토리에서 이 대화만 제거
+            chat_store.delete_conversation(chat_id)
+            st.session_state.chat_history.remove((chat_name, chat_id))
+            if st.session_state.get("conversation_id") == chat_id:
+                st.session_state.conversation_id = None
+            st.rerun(scope="app")
+
+    if page_count > 1:
+        page_cols = st.columns([1, 2, 1])
+        page_cols[0].button("◀", key="history_prev", disabled=page == 0, on_click=set_history_page, args=(page - 1,))
+        page_cols[1].caption(f"{page + 1} / {page_count} 페이지 · {len(conversations)}개")
+        page_cols[2].button("▶", key="history_next", disabled=page == page_count - 1, on_click=set_history_page, args=(page + 1,))
+
+with st.sidebar:
+    render_chat_history()
 
 # 새 대화 시작 버튼
 if st.sidebar.button("➕ 새 대화 시작", use_container_width=True):
     # 현재 대화가 있으면 저장
-    if "messages" in st.session_state and len(st.session_state.messages) > 1:
-        # 새 대화 ID 생성 (타임스탬프 기반)
-        timestamp = datetime.datetime.now().strftime("%Y%m%d%H%M%S")
-        chat_id = f"chat_{timestamp}"
-        
-        # 대화 제목 생성
-        current_title = st.session_state.get("current_time_str", "새 대화")
-        
-        # 현재 대화 내용 저장
-        st.session_state[f"chat_{chat_id}"] = st.session_state.messages.copy()
-        st.session_state.chat_history.append((current_title, chat_id))
-        save_chat_history()
+    save_current_conversation()
     
     # 새 대화 시작 - 메모리 초기화
-    st.session_state.memory.clear()
+    cancel_followup_questions()
+    st.session_state.conversation_id = None
+    st.session_state.pop("current_time_str", None)
+    st.session_state.pop("memory", None)
     st.session_state.messages = [{"role": "assistant", "content": "안녕하세요! Gitbook 문서에 대해 무엇이든 물어보세요."}]
+    st.session_state.message_window = CHAT_MESSAGE_WINDOW
     
-    # 추천 질문 초기화 - 벡터 DB 기반 고급 추천 질문
-    try:
-        # 벡터 DB 기반 고급 추천 질문 생성 시도
-        st.session_state.suggested_questions = generate_advanced_initial_questions(vector_store, embeddings, supabase_client, qa_llm, num_questions=4)
-    except Exception as e:
-        print(f"새 대화 시작 시 고급 추천 질문 생성 실패: {e}")
-        try:
-            # 대체 방식 시도
-            st.session_state.suggested_questions = generate_alternative_questions(supabase_client, qa_llm, num_questions=4)
-        except Exception as backup_e:
-            print(f"새 대화 시작 시 대체 추천 질문 생성도 실패: {backup_e}")
-            # 마지막 대안으로 기본 질문 사용
-            st.session_state.suggested_questions = get_default_questions(4)
+    # 추천 질문 초기화 - 미리 생성된 질문 풀에서 추출
+    st.session_state.suggested_questions = sample_suggested_questions(4)
     
     st.rerun()
 
@@ -624,91 +623,46 @@ st.sidebar.info(
     "이 챗봇은 FETA Gitbook 문서 내용을 기반으로 답변합니다."
 )
 
-# 이전 채팅 기록 표시
-for message in st.session_state.messages:
+# 이전 채팅 기록 표시 (대화가 길어도 다시 실행할 때마다 최근 메시지만 그림)
+if "message_window" not in st.session_state:
+    st.session_state.message_window = CHAT_MESSAGE_WINDOW
+
+def show_earlier_messages():
+    st.session_state.message_window += CHAT_MESSAGE_WINDOW
+
+hidden_count = max(len(st.session_state.messages) - st.session_state.message_window, 0)
+if hidden_count:
+    st.button(
+        f"⬆️ 이전 메시지 더 보기 ({hidden_count}개 숨김)",
+        key="show_earlier_messages",
+        on_click=show_earlier_messages,
+        use_container_width=True
+    )
+for message in st.session_state.messages[hidden_count:]:
     with st.chat_message(message["role"]):
-        st.markdown(message["content"])
+        st.markdown(render_message_content(message))
+        if message.get("prompt_tokens"):
+            st.caption(format_prompt_tokens(message["prompt_tokens"]))
 
 # 추천 질문 표시 (첫 메시지 또는 마지막 메시지가 assistant인 경우)
+collect_followup_questions()
 if len(st.session_state.messages) == 1 or st.session_state.messages[-1]["role"] == "assistant":
-    # 추천 질문 컨테이너
-    with st.container():
-        st.write("#### 추천 질문:")
-        cols = st.columns(len(st.session_state.suggested_questions))
-        
-        for i, question in enumerate(st.session_state.suggested_questions):
-            if cols[i].button(question, key=f"suggested_{i}", use_container_width=True):
-                handle_suggested_question(question)
+    # 후속 추천 질문을 생성 중이면 이 영역만 1초마다 다시 그려 완료 여부를 확인
+    polling = st.session_state.get("followup_future") is not None
+    st.fragment(run_every=1 if polling else None)(render_suggested_questions)()
 
-# 사용자 입력
-if prompt := st.chat_input("질문을 입력해주세요..."):
+# 사용자 입력 (추천 질문 버튼으로 넘어온 질문 포함)
+prompt = st.chat_input("질문을 입력해주세요...") or st.session_state.pop("pending_question", None)
+if prompt:
     st.session_state.messages.append({"role": "user", "content": prompt})
     with st.chat_message("user"):
         st.markdown(prompt)
 
-    with st.chat_message("assistant"):
-        message_placeholder = st.empty()
-        full_response_content = ""
-        
-        with st.spinner("답변을 생성 중입니다... 🤔"):
-            try:
-                # Langchain QA 실행 (ConversationalRetrievalChain)
-                response = qa_chain.invoke({"question": prompt})
-                
-                # 응답 추출
-                answer = response.get("answer", "")
-                source_documents = response.get("source_documents", [])
-                    
-                if not answer:
-                    answer = "죄송합니다, 답변을 찾을 수 없습니다. 컨텍스트가 부족하거나 질문이 명확하지 않을 수 있습니다."
-
-                full_response_content = answer
-
-                if source_documents:
-                    full_response_content += "\n\n---\n**참고 문서:**\n"
-                    # 중복된 source URL을 제거하기 위한 set
-                    unique_sources = set()
-                    for doc in source_documents:
-                        source_url = doc.metadata.get('source', '출처 정보 없음')
-                        if source_url not in unique_sources and source_url != '출처 정보 없음':
-                            # URL의 마지막 부분을 제목처럼 사용
-                            link_title = source_url.split('/')[-1] or source_url.split('/')[-2] or "문서"
-                            link_title = link_title.replace('-', ' ').title() # 가독성 향상
-                            full_response_content += f"- [{link_title}]({source_url})\n"
-                            unique_sources.add(source_url)
-                
-                message_placeholder.markdown(full_response_content)
-                
-                # 맥락에 맞는 새로운 추천 질문 생성
-                context_questions = generate_context_questions(answer, qa_llm)
-                if context_questions:
-                    st.session_state.suggested_questions = context_questions
-                else:
-                    # 새로운 기본 질문 표시
-                    st.session_state.suggested_questions = random.sample(
-                        DEFAULT_SUGGESTED_QUESTIONS, 
-                        min(3, len(DEFAULT_SUGGESTED_QUESTIONS))
-                    )
-
-            except Exception as e:
-                st.error(f"답변 생성 중 오류가 발생했습니다: {e}")
-                full_response_content = "죄송합니다, 현재 답변을 드릴 수 없습니다. 관리자에게 문의해주세요."
-                message_placeholder.markdown(full_response_content)
-                
-                # 오류 발생 시 기본 추천 질문 표시
-                st.session_state.suggested_questions = random.sample(
-                    DEFAULT_SUGGESTED_QUESTIONS, 
-                    min(3, len(DEFAULT_SUGGESTED_QUESTIONS))
-                )
+    # 답변 생성 (스트리밍)
+    answer_question(prompt)
 
-        st.session_state.messages.append({"role": "assistant", "content": full_response_content})
-        
-        # 대화 자동 저장
-        # 현재 대화 이름 저장
-        if len(st.session_state.messages) == 3:  # 첫 번째 질문 후 제목 생성
-            first_user_msg = prompt
-            chat_title = first_user_msg[:15] + ("..." if len(first_user_msg) > 15 else "")
-            st.session_state["current_time_str"] = chat_title
+    # 후속 추천 질문 생성 상태를 반영하도록 페이지 새로고침
+    st.rerun()
 
 # 채팅 기록 지우기 버튼
 st.sidebar.markdown("---")
@@ -716,54 +670,71 @@ all_cols = st.sidebar.columns([1, 1])
 
 if all_cols[0].button("모든 대화 지우기", use_container_width=True):
     # 대화 메모리 초기화
-    st.session_state.memory.clear()
+    cancel_followup_questions()
+    st.session_state.pop("memory", None)
     # 대화 히스토리 초기화
     st.session_state.chat_history = []
+    st.session_state.history_page = 0
     # 현재 대화 초기화
     st.session_state.messages = [{"role": "assistant", "content": "안녕하세요! Gitbook 문서에 대해 무엇이든 물어보세요."}]
+    st.session_state.message_window = CHAT_MESSAGE_WINDOW
+    st.session_state.conversation_id = None
+    st.session_state.pop("current_time_str", None)
     # 저장된 모든 대화 삭제
-    for key in list(st.session_state.keys()):
-        if key.startswith("chat_"):
-            del st.session_state[key]
-    # 파일 삭제 (선택 사항)
-    if os.path.exists(CHAT_HISTORY_FILE):
-        try:
-            os.remove(CHAT_HISTORY_FILE)
-        except:
-            pass
-    # 추천 질문 초기화 - 벡터 DB 기반 고급 추천 질문
-    try:
-        # 벡터 DB 기반 고급 추천 질문 생성 시도
-        st.session_state.suggested_questions = generate_advanced_initial_questions(vector_store, embeddings, supabase_client, qa_llm, num_questions=4)
-    except Exception as e:
-        print(f"대화 지우기 시 고급 추천 질문 생성 실패: {e}")
-        try:
-            # 대체 방식 시도
-            st.session_state.suggested_questions = generate_alternative_questions(supabase_client, qa_llm, num_questions=4)
-        except Exception as backup_e:
-            print(f"대화 지우기 시 대체 추천 질문 생성도 실패: {backup_e}")
-            # 마지막 대안으로 기본 질문 사용
-            st.session_state.suggested_questions = get_default_questions(4)
+    chat_store.clear()
+    # 추천 질문 초기화 - 미리 생성된 질문 풀에서 추출
+    st.session_state.suggested_questions = sample_suggested_questions(4)
             
     st.rerun()
 
 # 현재 대화 저장 버튼
 if all_cols[1].button("대화 저장하기", use_container_width=True):
-    # 직접 현재 대화 저장
-    if "messages" in st.session_state and len(st.session_state.messages) > 1:
-        # 타임스탬프 기반 ID 생성
-        timestamp = datetime.datetime.now().strftime("%Y%m%d%H%M%S")
-        chat_id = f"chat_{timestamp}"
-        
-        # 대화 제목 생성
-        current_title = st.session_state.get("current_time_str", "새 대화")
-        if not current_title or current_title == "새 대화":
-            current_title = f"대화 {datetime.datetime.now().strftime('%Y-%m-%d %H:%M')}"
-        
-        # 현재 대화 내용 저장
-        st.session_state[f"chat_{chat_id}"] = st.session_state.messages.copy()
-        st.session_state.chat_history.append((current_title, chat_id))
-        save_chat_history()
+    # 직접 현재 대화 저장 (이미 저장한 대화면 새 메시지만 추가)
+    if save_current_conversation():
         st.success("대화가 저장되었습니다!")
     else:
-        st.warning("저장할 대화가 없습니다.")
\ No newline at end of file
+        st.warning("저장할 대화가 없습니다.")
+
+# warm-up에서 미리 import할 무거운 모듈 (의존 순서, 모듈별 import 시간은 startup_profile에 기록)
+WARMUP_MODULES = [
+    "ingest_pipeline",
+    "langchain.memory",
+    "supabase.client",
+    "openai_clients",
+    "model_router",
+    "embedding_cache",
+    "reranker",
+    "semantic_cache",
+    "qa_engine",
+    "answer_client",
+    "suggested_questions",
+]
+
+# 첫 화면 뒤 백그라운드에서 무거운 모듈 import, 공유 클라이언트 생성, 섹션/추천 질문 조회를 미리 실행 (프로세스당 한 번)
+# 사용자가 첫 질문을 입력할 즈음에는 답변 엔진이 준비되어 있고, 끝나기 전에 질문하면 같은 캐시 항목이 준비될 때까지 기다림
+def warm_up():
+    for module in WARMUP_MODULES:
+        startup_profile.import_module(module)
+    with startup_profile.stage("supabase_client"):
+        init_supabase_client()
+    with startup_profile.stage("chat_models"):
+        init_chat_model()
+        init_followup_model()
+    with startup_profile.stage("chat_engine"):
+        if init_answer_api_client() is None:
+            init_chat_engine()
+    with startup_profile.stage("document_sections"):
+        load_document_sections()
+    with startup_profile.stage("question_pool"):
+        load_suggested_question_pool()
+
+# warm-up이 끝나면 앱 전체를 다시 실행하여 검색 범위와 질문 풀의 추천 질문을 표시 (주기적 확인은 이때 멈춤)
+def refresh_after_warmup():
+    if startup_profile.warmup_done:
+        st.rerun(scope="app")
+
+# 첫 화면을 다 그린 뒤 (프로세스당 한 번) 첫 화면까지 걸린 시간을 기록하고 warm-up 시작
+startup_profile.record_first_render(SCRIPT_STARTED)
+startup_profile.start_warmup(background_executor, warm_up)
+if not startup_profile.warmup_done:
+    st.fragment(run_every=1)(refresh_after_warmup)()
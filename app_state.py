@@ -0,0 +1,45 @@
+"""
+Supabase 'app_state' 테이블에 앱 전역 상태(키-값)를 저장하고 읽습니다.
+
+- corpus_version: 수집(ingest_gitbook.py)으로 documents 내용이 바뀔 때마다 갱신되며,
+  앱은 이 값이 바뀌면 의미 기반 답변 캐시를 비웁니다.
+"""
+
+import datetime
+import uuid
+from typing import Any, Optional
+
+APP_STATE_TABLE = "app_state"
+CORPUS_VERSION_KEY = "corpus_version"
+
+
+def get_app_state(client: Any, key: str) -> Optional[Any]:
+    """키에 저장된 값을 반환합니다. 없으면 None."""
+    response = client.table(APP_STATE_TABLE).select("value").eq("key", key).limit(1).execute()
+    rows = response.data or []
+    return rows[0]["value"] if rows else None
+
+
+def set_app_state(client: Any, key: str, value: Any) -> None:
+    """키에 값을 저장합니다 (있으면 덮어씀)."""
+    client.table(APP_STATE_TABLE).upsert({
+        "key": key,
+        "value": value,
+        "updated_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+    }).execute()
+
+
+def get_corpus_version(client: Any) -> Optional[str]:
+    """현재 문서 버전을 반환합니다. 한 번도 수집하지 않았으면 None."""
+    value = get_app_state(client, CORPUS_VERSION_KEY)
+    return value.get("version") if isinstance(value, dict) else value
+
+
+def publish_corpus_version(client: Any) -> str:
+    """documents 내용이 바뀌었음을 알리는 새 문서 버전을 기록하고 반환합니다."""
+    version = uuid.uuid4().hex
+    set_app_state(client, CORPUS_VERSION_KEY, {
+        "version": version,
+        "published_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+    })
+    return version
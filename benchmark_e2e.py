@@ -0,0 +1,329 @@
+#!/usr/bin/env python
+"""
+수집 파이프라인(ingest_documents) 전체와 앱의 검색 → 답변 경로(qa_engine)를 로컬 대체 구현으로 실행하는
+종단 간 벤치마크입니다. OpenAI API 키나 Supabase 프로젝트 없이 실행되며, 배포 전 성능 회귀 확인용입니다.
+
+- GitBook: 가짜 사이트맵과 페이지를 제공하는 로컬 HTTP 서버 (benchmark_fetch.py)
+- OpenAI: 지연 시간/토큰 간 지연/오류 비율을 설정할 수 있는 모의 서버 (mock_openai_server.py)
+- 벡터 스토어: 메모리 구현(in_memory_supabase.py, 기본) 또는 로컬 Supabase(--store supabase)
+  로컬 Supabase(supabase start로 실행한 Postgres + pgvector)는 SUPABASE_URL/SUPABASE_ANON_KEY로 지정하며,
+  벤치마크가 넣은 행은 끝날 때 삭제합니다.
+- 검색 백엔드: --vector-backend local이면 수집 후 스냅샷을 내보내 로컬 벡터 인덱스(local_vector_index.py)로 검색합니다.
+- 대화 기록: --history이면 이전 대화 한 턴과 함께 질문하여 질문 재구성 단계를 포함하고,
+  --speculative이면 재구성과 검색을 겹쳐 실행하는 SpeculativeRetrievalChain으로 답합니다.
+
+단계별로 처리량, 지연 시간(p50/p95/p99), 최대 메모리(tracemalloc 기준 Python 할당량과 프로세스 최대 RSS)를 보고합니다.
+tracemalloc은 Python 코드를 눈에 띄게 느리게 하므로, 지연 시간은 같은 설정(--no-tracemalloc 여부)끼리만 비교하세요.
+--max-* / --min-* 기준을 넘으면 종료 코드 1로 끝나므로 CI나 배포 스크립트에서 회귀를 막는 데 쓸 수 있습니다.
+
+사용 예:
+    python benchmark_e2e.py --pages 200 --questions 100 --concurrency 8 --openai-latency 0.05
+    python benchmark_e2e.py --json bench_e2e.json --max-qa-p95-ms 800 --min-ingest-pages-per-sec 20
+    python benchmark_e2e.py --history --speculative
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import logging
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from langchain_core.messages import AIMessage, HumanMessage
+
+from benchmark_fetch import start_fake_gitbook_server
+from embedding_cache import CachedEmbeddings, SQLiteEmbeddingCache
+from in_memory_supabase import InMemorySupabaseClient
+from ingest_gitbook import delete_document_rows, ingest_documents, load_existing_page_index
+from ingest_pipeline import IngestCheckpoint
+from latency_stats import percentile
+from mock_openai_server import start_mock_openai_server
+from openai_clients import client_metrics, create_embeddings
+from local_vector_index import export_snapshot
+from qa_engine import create_qa_chain, create_search_client, create_shared_components, run_qa_chain
+from telemetry import StageTimingHandler, start_turn
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+MOCK_API_KEY = "sk-mock"
+
+
+def max_rss_mb() -> Optional[float]:
+    """프로세스 최대 RSS (MB, Linux 기준 ru_maxrss는 KB)."""
+    if resource is None:
+        return None
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+@contextlib.contextmanager
+def measure_peak_memory(result: Dict[str, Any]) -> Any:
+    """블록 실행 중 tracemalloc 최대 할당량(MB)을 result["peak_traced_mb"]에 기록합니다."""
+    if tracemalloc.is_tracing():
+        tracemalloc.reset_peak()
+    try:
+        yield
+    finally:
+        if tracemalloc.is_tracing():
+            result["peak_traced_mb"] = round(tracemalloc.get_traced_memory()[1] / 1024 / 1024, 1)
+        result["max_rss_mb"] = max_rss_mb()
+
+
+def latency_summary(values_ms: List[float]) -> Dict[str, float]:
+    if not values_ms:
+        return {}
+    return {
+        "p50_ms": round(percentile(values_ms, 50), 1),
+        "p95_ms": round(percentile(values_ms, 95), 1),
+        "p99_ms": round(percentile(values_ms, 99), 1),
+        "max_ms": round(max(values_ms), 1),
+    }
+
+
+def create_store(kind: str) -> Any:
+    if kind == "memory":
+        return InMemorySupabaseClient()
+    from dotenv import load_dotenv
+    from supabase.client import create_client
+
+    load_dotenv()
+    return create_client(os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_ANON_KEY"))
+
+
+def run_ingest(client: Any, embeddings: Any, base_url: str, work_dir: str, args: argparse.Namespace) -> Dict[str, Any]:
+    """가짜 GitBook 전체를 수집하고 처리량/메모리를 반환합니다."""
+    result: Dict[str, Any] = {}
+    # 수집 로그는 --verbose일 때만 출력
+    log_output = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+    with measure_peak_memory(result):
+        start = time.perf_counter()
+        with log_output:
+            stats = ingest_documents(
+                gitbook_base_url=base_url + "/",
+                sitemap_xml_url=base_url + "/sitemap-pages.xml",
+                max_concurrent_requests=args.fetch_workers,
+                requests_per_second=args.fetch_rps,
+                embedding_concurrency=args.embedding_concurrency,
+                refresh_suggested_questions=False,
+                client=client,
+                embeddings=embeddings,
+                checkpoint=IngestCheckpoint(os.path.join(work_dir, "ingest_checkpoint.jsonl")),
+            )
+        elapsed = time.perf_counter() - start
+    result.update({
+        "seconds": round(elapsed, 2),
+        "pages": stats.get("loaded", 0),
+        "chunks": stats.get("uploaded", 0),
+        "failed_chunks": stats.get("failed", 0),
+        "pages_per_sec": round(stats.get("loaded", 0) / elapsed, 1) if elapsed else 0.0,
+        "chunks_per_sec": round(stats.get("uploaded", 0) / elapsed, 1) if elapsed else 0.0,
+    })
+    return result
+
+
+def make_questions(num_pages: int, count: int, seed: int = 0) -> List[str]:
+    """가짜 페이지 내용과 겹치는 질문 (검색 결과가 임계값을 넘도록)."""
+    rng = random.Random(seed)
+    templates = ["Page {i} 본문입니다. 이 페이지에는 어떤 내용이 있나요?", "Page {i} 본문입니다. 내용을 요약해줘", "Page {i} 본문입니다 무슨 내용인가요?"]
+    return [rng.choice(templates).format(i=rng.randrange(num_pages)) for _ in range(count)]
+
+
+def make_chat_history(previous_question: Optional[str]) -> List[Any]:
+    """이전 대화 한 턴 (질문 재구성 단계를 거치도록)."""
+    if previous_question is None:
+        return []
+    return [HumanMessage(content=previous_question), AIMessage(content=f"모의 답변입니다. 질문 요약: {previous_question}")]
+
+
+def answer_one(qa_chain: Any, question: str, retrieval_mode: str, previous_question: Optional[str] = None) -> Dict[str, Any]:
+    """질문 하나에 답하고 턴 계측 결과를 반환합니다 (app.py와 같은 StageTimingHandler 사용)."""
+    with start_turn(benchmark=True, retrieval_mode=retrieval_mode) as trace:
+        try:
+            response = run_qa_chain(qa_chain, question, make_chat_history(previous_question), callbacks=[StageTimingHandler(trace)])
+            trace.attrs["sources"] = len(response.get("source_documents", []))
+            if response.get("retrieval_strategy"):
+                trace.attrs["retrieval_strategy"] = response["retrieval_strategy"]
+        except Exception as e:
+            trace.attrs["outcome"] = "error"
+            trace.attrs["error"] = str(e)
+    return trace.to_dict()
+
+
+def run_qa(qa_chain: Any, questions: List[str], args: argparse.Namespace) -> Dict[str, Any]:
+    """질문을 동시에 실행하고 지연 시간/처리량/단계별 지연 시간을 반환합니다."""
+    result: Dict[str, Any] = {}
+    # --history이면 바로 앞 질문을 이전 대화로 사용
+    previous_questions = [None] + questions[:-1] if args.history else [None] * len(questions)
+    with measure_peak_memory(result):
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency, thread_name_prefix="bench-qa") as executor:
+            traces = list(executor.map(lambda pair: answer_one(qa_chain, pair[0], args.retrieval_mode, pair[1]), zip(questions, previous_questions)))
+        elapsed = time.perf_counter() - start
+
+    ok = [trace for trace in traces if trace["outcome"] == "ok"]
+    stages: Dict[str, List[float]] = {}
+    first_token_ms: List[float] = []
+    for trace in ok:
+        for span in trace["spans"]:
+            stages.setdefault(span["stage"], []).append(span["duration_ms"])
+            if span["stage"] == "answer" and span.get("first_token_ms") is not None:
+                # 턴 시작부터 첫 답변 토큰까지
+                first_token_ms.append(span["start_ms"] + span["first_token_ms"])
+    errors = [trace.get("error") for trace in traces if trace["outcome"] != "ok"]
+    result.update({
+        "questions": len(traces),
+        "errors": len(errors),
+        "first_error": errors[0] if errors else None,
+        "seconds": round(elapsed, 2),
+        "questions_per_sec": round(len(traces) / elapsed, 2) if elapsed else 0.0,
+        "avg_sources": round(sum(trace.get("sources", 0) for trace in ok) / len(ok), 2) if ok else 0.0,
+        "latency": latency_summary([trace["total_ms"] for trace in ok]),
+        "first_token": latency_summary(first_token_ms),
+        "stages": {stage: latency_summary(values) for stage, values in sorted(stages.items())},
+        "retrieval_strategies": dict(Counter(trace["retrieval_strategy"] for trace in ok if trace.get("retrieval_strategy"))),
+    })
+    return result
+
+
+def check_thresholds(results: Dict[str, Any], args: argparse.Namespace) -> List[str]:
+    """기준을 넘은 항목의 설명 목록 (비어 있으면 통과)."""
+    failures = []
+    ingest, qa = results["ingest"], results["qa"]
+    if ingest["failed_chunks"] or qa["errors"]:
+        failures.append(f"실패: 청크 {ingest['failed_chunks']}개, 질문 {qa['errors']}개 ({qa['first_error']})")
+    if args.min_ingest_pages_per_sec and ingest["pages_per_sec"] < args.min_ingest_pages_per_sec:
+        failures.append(f"수집 처리량 {ingest['pages_per_sec']} pages/s < {args.min_ingest_pages_per_sec}")
+    if args.min_qa_per_sec and qa["questions_per_sec"] < args.min_qa_per_sec:
+        failures.append(f"질문 처리량 {qa['questions_per_sec']} q/s < {args.min_qa_per_sec}")
+    for pct in ("p95", "p99"):
+        limit = getattr(args, f"max_qa_{pct}_ms")
+        value = qa["latency"].get(f"{pct}_ms")
+        if limit and value is not None and value > limit:
+            failures.append(f"답변 지연 {pct} {value}ms > {limit}ms")
+    peak = max(ingest.get("peak_traced_mb") or 0, qa.get("peak_traced_mb") or 0)
+    if args.max_peak_mb and peak > args.max_peak_mb:
+        failures.append(f"최대 메모리(tracemalloc) {peak}MB > {args.max_peak_mb}MB")
+    return failures
+
+
+def format_memory(result: Dict[str, Any]) -> str:
+    traced = result.get("peak_traced_mb")
+    traced_text = f"peak {traced}MB traced, " if traced is not None else ""
+    return f"{traced_text}max RSS {result.get('max_rss_mb')}MB"
+
+
+def print_report(results: Dict[str, Any]) -> None:
+    ingest, qa = results["ingest"], results["qa"]
+    print(f"\n[수집] {ingest['pages']} pages / {ingest['chunks']} chunks in {ingest['seconds']}s"
+          f" → {ingest['pages_per_sec']} pages/s, {ingest['chunks_per_sec']} chunks/s ({format_memory(ingest)})")
+    latency = qa["latency"]
+    print(f"[답변] {qa['questions']} questions ({qa['errors']} errors) in {qa['seconds']}s → {qa['questions_per_sec']} q/s,"
+          f" 평균 참고 문서 {qa['avg_sources']}개 ({format_memory(qa)})")
+    print(f"{'stage':24} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    rows = [("turn", latency), ("first_token", qa["first_token"])] + list(qa["stages"].items())
+    for stage, summary in rows:
+        if summary:
+            print(f"{stage:24} {summary['p50_ms']:>9.1f} {summary['p95_ms']:>9.1f} {summary['p99_ms']:>9.1f} {summary['max_ms']:>9.1f}")
+    if qa["retrieval_strategies"]:
+        print("검색 경로: " + ", ".join(f"{strategy} {count}" for strategy, count in sorted(qa["retrieval_strategies"].items())))
+    print(f"OpenAI client stats: {results['openai_client']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="로컬 대체 구현을 사용하는 수집/답변 종단 간 벤치마크")
+    parser.add_argument("--pages", type=int, default=200, help="가짜 GitBook 페이지 수")
+    parser.add_argument("--page-latency", type=float, default=0.01, help="페이지 응답 지연 (초)")
+    parser.add_argument("--fetch-workers", type=int, default=8, help="수집 동시 요청 수")
+    parser.add_argument("--fetch-rps", type=float, default=200.0, help="수집 초당 최대 요청 수")
+    parser.add_argument("--embedding-concurrency", type=int, default=4, help="동시 임베딩 요청 수")
+    parser.add_argument("--openai-latency", type=float, default=0.05, help="모의 OpenAI 요청당 지연 (초)")
+    parser.add_argument("--token-delay", type=float, default=0.005, help="모의 OpenAI 스트리밍 조각 사이 지연 (초)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="모의 OpenAI 429/500 응답 비율 (0~1)")
+    parser.add_argument("--store", choices=["memory", "supabase"], default="memory", help="벡터 스토어 (supabase는 로컬 Supabase 권장)")
+    parser.add_argument("--vector-backend", choices=["supabase", "local"], default="supabase", help="검색 백엔드 (local은 스냅샷 인덱스)")
+    parser.add_argument("--questions", type=int, default=100, help="답변할 질문 수")
+    parser.add_argument("--concurrency", type=int, default=8, help="동시에 답변할 질문 수")
+    parser.add_argument("--retrieval-mode", choices=["vector", "hybrid"], default="vector", help="검색 방식")
+    parser.add_argument("--history", action="store_true", help="이전 대화 한 턴과 함께 질문 (질문 재구성 포함)")
+    parser.add_argument("--speculative", action="store_true", help="질문 재구성과 검색을 겹쳐 실행 (SpeculativeRetrievalChain)")
+    parser.add_argument("--no-tracemalloc", action="store_true", help="메모리 추적 끄기 (추적 오버헤드 없이 지연 시간만 측정)")
+    parser.add_argument("--json", help="결과를 저장할 JSON 파일 경로")
+    parser.add_argument("--max-qa-p95-ms", type=float, help="답변 지연 p95 상한 (ms)")
+    parser.add_argument("--max-qa-p99-ms", type=float, help="답변 지연 p99 상한 (ms)")
+    parser.add_argument("--min-qa-per-sec", type=float, help="질문 처리량 하한 (q/s)")
+    parser.add_argument("--min-ingest-pages-per-sec", type=float, help="수집 처리량 하한 (pages/s)")
+    parser.add_argument("--max-peak-mb", type=float, help="tracemalloc 최대 메모리 상한 (MB)")
+    parser.add_argument("--verbose", action="store_true", help="수집 로그와 턴별 계측 로그 출력")
+    args = parser.parse_args()
+
+    gitbook_server, gitbook_url = start_fake_gitbook_server(args.pages, args.page_latency)
+    openai_server, openai_url = start_mock_openai_server(latency=args.openai_latency, token_delay=args.token_delay, error_rate=args.error_rate)
+    os.environ["OPENAI_BASE_URL"] = openai_url
+    os.environ["OPENAI_API_KEY"] = MOCK_API_KEY
+    print(f"Fake GitBook: {gitbook_url} ({args.pages} pages), mock OpenAI: {openai_url}, store: {args.store}, search: {args.vector_backend}")
+
+    if not args.verbose:
+        logging.getLogger("telemetry").setLevel(logging.WARNING)  # 턴별 JSON 로그 생략
+    if not args.no_tracemalloc:
+        tracemalloc.start()
+    client = create_store(args.store)
+    try:
+        with tempfile.TemporaryDirectory(prefix="bench-e2e-") as work_dir:
+            # 토큰 길이 확인(tiktoken)은 모의 서버에 필요 없으므로 끔 (오프라인에서도 실행)
+            embeddings = CachedEmbeddings(
+                create_embeddings(MOCK_API_KEY, check_embedding_ctx_length=False),
+                SQLiteEmbeddingCache(os.path.join(work_dir, "embedding_cache.sqlite3")),
+            )
+            ingest = run_ingest(client, embeddings, gitbook_url, work_dir, args)
+
+            search_client = client
+            if args.vector_backend == "local":
+                index_path = os.path.join(work_dir, "local_index")
+                export_snapshot(client, index_path)
+                search_client = create_search_client(client, "local", index_path)
+            vector_store, llm, answer_llm = create_shared_components(search_client, embeddings, MOCK_API_KEY)
+            qa_chain = create_qa_chain(vector_store, llm, answer_llm, retrieval_mode=args.retrieval_mode, speculative=args.speculative)
+            qa = run_qa(qa_chain, make_questions(args.pages, args.questions), args)
+    finally:
+        if args.store == "supabase":
+            # 벤치마크가 넣은 가짜 페이지의 청크만 삭제
+            index = load_existing_page_index(client)
+            row_ids = [row_id for source, page in index.items() if source.startswith(gitbook_url) for ids in page["chunks"].values() for row_id in ids]
+            delete_document_rows(client, row_ids)
+        gitbook_server.shutdown()
+        openai_server.shutdown()
+
+    results = {
+        "config": {key: value for key, value in vars(args).items() if not key.startswith(("max_", "min_"))},
+        "ingest": ingest,
+        "qa": qa,
+        "openai_client": client_metrics(),
+        "mock_openai_requests": dict(openai_server.stats),
+    }
+    print_report(results)
+
+    failures = check_thresholds(results, args)
+    results["failures"] = failures
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"결과 저장: {args.json}")
+    if failures:
+        print("\n기준 미달:")
+        for failure in failures:
+            print(f"- {failure}")
+        raise SystemExit(1)
+    print("\n모든 기준 통과")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+#!/usr/bin/env python
+"""
+페이지 수집 단계의 처리량(pages/sec)을 로컬에서 측정하는 벤치마크 스크립트입니다.
+
+가짜 사이트맵과 GitBook 형식의 페이지를 제공하는 로컬 HTTP 서버를 띄운 뒤,
+기존 방식(직렬 요청 + 고정 딜레이)과 동시 수집 방식을 비교합니다.
+
+사용 예:
+    python benchmark_fetch.py --pages 200 --latency 0.1 --delay 0.5 --workers 8 --rps 20
+"""
+
+import argparse
+import contextlib
+import io
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+import xmltodict
+
+from gitbook_fetcher import fetch_documents_concurrently, fetch_page
+
+PAGE_TEMPLATE = """<html><head><title>Page {index}</title></head>
+<body><nav>navigation</nav><article class="page-body">
+<h1>Page {index}</h1>
+<p>{body}</p>
+</article></body></html>"""
+
+
+def make_fake_gitbook_handler(num_pages: int, latency: float):
+    """가짜 사이트맵(/sitemap-pages.xml)과 페이지(/docs/page-N)를 제공하는 핸들러 클래스를 만듭니다."""
+
+    class FakeGitbookHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive 지원
+
+        def do_GET(self):
+            host = self.headers.get("Host")
+            if self.path == "/sitemap-pages.xml":
+                urls = "".join(
+                    f"<url><loc>http://{host}/docs/page-{i}</loc><lastmod>2025-01-01</lastmod></url>"
+                    for i in range(num_pages)
+                )
+                body = f'<?xml version="1.0" encoding="UTF-8"?><urlset>{urls}</urlset>'
+                self._send(200, body, "application/xml")
+            elif self.path.startswith("/docs/page-"):
+                time.sleep(latency)  # 원격 서버의 응답 지연 흉내
+                index = self.path.rsplit("-", 1)[-1]
+                text = f"Page {index} 본문입니다. " * 40
+                self._send(200, PAGE_TEMPLATE.format(index=index, body=text), "text/html; charset=utf-8")
+            else:
+                self._send(404, "not found", "text/plain")
+
+        def _send(self, status: int, body: str, content_type: str):
+            data = body.encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass  # 벤치마크 출력이 묻히지 않도록 접근 로그 생략
+
+    return FakeGitbookHandler
+
+
+def start_fake_gitbook_server(num_pages: int, latency: float, port: int = 0):
+    """백그라운드 스레드에서 가짜 GitBook 서버를 시작하고 (server, base_url)을 반환합니다."""
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_fake_gitbook_handler(num_pages, latency))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def load_sitemap_urls(sitemap_url: str):
+    response = requests.get(sitemap_url, timeout=15)
+    response.raise_for_status()
+    entries = xmltodict.parse(response.content)["urlset"]["url"]
+    if not isinstance(entries, list):
+        entries = [entries]
+    return [entry["loc"] for entry in entries]
+
+
+def run_serial(urls, delay: float) -> int:
+    """기존 ingest_documents 방식: 페이지마다 새 연결로 직렬 요청 + 고정 딜레이."""
+    loaded = 0
+    for i, url in enumerate(urls):
+        if i > 0:
+            time.sleep(delay)
+        if fetch_page(url, max_retries=0):
+            loaded += 1
+    return loaded
+
+
+def run_concurrent(urls, workers: int, rps: float) -> int:
+    loaded = 0
+    for _, doc in fetch_documents_concurrently(urls, max_workers=workers, requests_per_second=rps, burst=workers):
+        if doc:
+            loaded += 1
+    return loaded
+
+
+def main():
+    parser = argparse.ArgumentParser(description="GitBook 페이지 수집 처리량 벤치마크")
+    parser.add_argument("--pages", type=int, default=100, help="가짜 사이트맵의 페이지 수")
+    parser.add_argument("--latency", type=float, default=0.1, help="페이지당 서버 응답 지연 (초)")
+    parser.add_argument("--delay", type=float, default=0.5, help="직렬 방식의 요청 간 딜레이 (초)")
+    parser.add_argument("--workers", type=int, default=8, help="동시 수집 워커 수")
+    parser.add_argument("--rps", type=float, default=20.0, help="동시 수집 시 호스트별 초당 최대 요청 수")
+    parser.add_argument("--skip-serial", action="store_true", help="직렬 방식 측정 생략")
+    args = parser.parse_args()
+
+    server, base_url = start_fake_gitbook_server(args.pages, args.latency)
+    try:
+        urls = load_sitemap_urls(f"{base_url}/sitemap-pages.xml")
+        print(f"가짜 사이트맵에서 {len(urls)}개 URL을 읽었습니다. (응답 지연 {args.latency}s)")
+
+        results = []
+        if not args.skip_serial:
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                loaded = run_serial(urls, args.delay)
+            results.append((f"serial (delay={args.delay}s)", loaded, time.perf_counter() - start))
+
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            loaded = run_concurrent(urls, args.workers, args.rps)
+        results.append((f"concurrent (workers={args.workers}, rps={args.rps})", loaded, time.perf_counter() - start))
+
+        print(f"\n{'mode':45} {'pages':>6} {'seconds':>9} {'pages/sec':>10}")
+        for name, loaded, elapsed in results:
+            print(f"{name:45} {loaded:>6} {elapsed:>9.2f} {loaded / elapsed:>10.2f}")
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+"""
+검색 방식(vector / hybrid, 재정렬 여부)별 검색 품질(recall@k, MRR), 지연 시간(p50/p95)과
+프롬프트에 들어갈 문서 토큰 수를 비교하는 벤치마크 스크립트입니다.
+
+평가 세트(JSONL)의 각 줄은 질문과 답이 들어 있어야 하는 문서 URL 목록입니다:
+    {"question": "메시지 삭제 기능에 대해 자세히 설명해줘", "expected_sources": ["https://docs.fe-ta.com/cs/faq/chat"]}
+
+LLM은 호출하지 않고 검색기만 실행합니다. 질문 임베딩은 측정 전에 한 번에 만들어 디스크 캐시에 저장하므로,
+지연 시간에는 데이터베이스 검색 시간만 포함됩니다. hybrid 방식은 hybrid_match_documents 함수가 필요합니다
+(reset_supabase_schema.py 또는 supabase_schema.sql 참고).
+
+사용 예:
+    python benchmark_retrieval.py --eval-file retrieval_eval_set.jsonl --k 5 --modes vector,hybrid --rerank
+"""
+
+import argparse
+import json
+import os
+import time
+from typing import Any, Dict, List
+
+from dotenv import load_dotenv
+from supabase.client import create_client
+
+from embedding_cache import create_cached_embeddings
+from ingest_pipeline import count_tokens
+from latency_stats import percentile
+from reranker import RERANK_CANDIDATES, RerankingRetriever, load_cross_encoder
+from vector_store import RETRIEVAL_MODES, TunedSupabaseVectorStore, create_retriever
+
+RETRIEVAL_EVAL_FILE = os.getenv("RETRIEVAL_EVAL_FILE", "retrieval_eval_set.jsonl")
+
+
+def load_eval_set(path: str) -> List[Dict[str, Any]]:
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def evaluate_retriever(retriever: Any, eval_set: List[Dict[str, Any]], k: int, repeat: int = 1) -> Dict[str, Any]:
+    """평가 세트의 질문마다 검색하여 recall@k, hit@k, MRR, 지연 시간(ms)과 평균 문서 토큰 수를 계산합니다."""
+    latencies: List[float] = []
+    recall_total = hit_total = reciprocal_rank_total = token_total = 0.0
+    for item in eval_set:
+        expected = set(item["expected_sources"])
+        for _ in range(repeat):
+            start = time.perf_counter()
+            docs = retriever.invoke(item["question"])
+            latencies.append((time.perf_counter() - start) * 1000)
+        token_total += sum(count_tokens(doc.page_content) for doc in docs)
+
+        # 같은 페이지의 청크가 여러 개일 수 있으므로 출처 순서(중복 제거)로 평가
+        sources: List[str] = []
+        for doc in docs[:k]:
+            source = doc.metadata.get("source")
+            if source and source not in sources:
+                sources.append(source)
+
+        found = expected & set(sources)
+        recall_total += len(found) / len(expected)
+        hit_total += 1 if found else 0
+        first_rank = next((rank for rank, source in enumerate(sources, start=1) if source in expected), None)
+        reciprocal_rank_total += 1 / first_rank if first_rank else 0
+
+    count = len(eval_set)
+    return {
+        "recall": recall_total / count,
+        "hit": hit_total / count,
+        "mrr": reciprocal_rank_total / count,
+        "p50": percentile(latencies, 50),
+        "p95": percentile(latencies, 95),
+        "tokens": token_total / count,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="검색 방식별 recall@k/지연 시간 벤치마크")
+    parser.add_argument("--eval-file", default=RETRIEVAL_EVAL_FILE, help="평가 세트 JSONL 파일")
+    parser.add_argument("--k", type=int, default=5, help="검색 문서 수")
+    parser.add_argument("--modes", default=",".join(RETRIEVAL_MODES), help="비교할 검색 방식 (쉼표 구분)")
+    parser.add_argument("--section", default=None, help="검색 범위로 제한할 섹션 (예: cs/faq)")
+    parser.add_argument("--rerank", action="store_true", help="방식별로 재정렬(RerankingRetriever) 결과도 측정")
+    parser.add_argument("--repeat", type=int, default=3, help="질문별 지연 시간 측정 반복 횟수")
+    args = parser.parse_args()
+
+    load_dotenv()
+    openai_api_key = os.getenv("OPENAI_API_KEY")
+    client = create_client(os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_ANON_KEY"))
+    embeddings = create_cached_embeddings(openai_api_key)
+    vector_store = TunedSupabaseVectorStore(
+        client=client,
+        embedding=embeddings,
+        table_name="documents",
+        query_name="match_documents",
+        match_threshold=0.5,
+        ef_search=int(os.getenv("VECTOR_EF_SEARCH", "0")) or None,
+        probes=int(os.getenv("VECTOR_PROBES", "0")) or None,
+    )
+
+    eval_set = load_eval_set(args.eval_file)
+    print(f"평가 질문 {len(eval_set)}개 임베딩 준비 중...")
+    embeddings.embed_documents([item["question"] for item in eval_set])
+
+    search_filter = {"sections": [args.section]} if args.section else {}
+    retrievers = []
+    for mode in args.modes.split(","):
+        retrievers.append((mode, create_retriever(vector_store, mode=mode, k=args.k, filter=search_filter)))
+        if args.rerank:
+            candidates = create_retriever(vector_store, mode=mode, k=RERANK_CANDIDATES, filter=search_filter)
+            retrievers.append((f"{mode}+rerank", RerankingRetriever(base_retriever=candidates, cross_encoder=load_cross_encoder())))
+
+    results = []
+    for name, retriever in retrievers:
+        retriever.invoke(eval_set[0]["question"])  # 연결 준비 (측정에서 제외)
+        results.append((name, evaluate_retriever(retriever, eval_set, args.k, args.repeat)))
+
+    print(f"\n{'mode':16} {f'recall@{args.k}':>10} {f'hit@{args.k}':>8} {'MRR':>7} {'p50 ms':>9} {'p95 ms':>9} {'tokens':>8}")
+    for name, metrics in results:
+        print(
+            f"{name:16} {metrics['recall']:>10.3f} {metrics['hit']:>8.3f} {metrics['mrr']:>7.3f} "
+            f"{metrics['p50']:>9.2f} {metrics['p95']:>9.2f} {metrics['tokens']:>8.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""
+대화 내역을 SQLite(WAL)에 대화 단위로 저장하는 저장소입니다.
+
+- conversations 테이블에는 대화 목록(제목)만, messages 테이블에는 메시지를 한 행씩 저장합니다.
+- 사이드바에는 대화 목록만 불러오고, 메시지는 대화를 열 때 해당 대화의 것만 읽습니다.
+- 저장할 때는 이미 저장된 메시지 뒤에 새 메시지만 추가하므로 비용이 대화 하나의 새 메시지 수에 비례합니다.
+- 쓰기는 트랜잭션(BEGIN IMMEDIATE)으로 원자적으로 처리되며, 여러 Streamlit 세션/프로세스가 동시에 써도 안전합니다.
+
+이전 형식의 chat_history.json은 처음 열 때 한 번 가져옵니다.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Tuple
+
+CHAT_STORE_PATH = os.getenv("CHAT_STORE_PATH", "chat_history.sqlite3")
+
+# messages 테이블의 컬럼으로 저장하는 키 (나머지 키는 extra에 JSON으로 저장)
+MESSAGE_COLUMNS = ("role", "content")
+
+
+class ChatStore:
+    """대화 목록과 메시지를 저장하는 SQLite 저장소 (스레드 안전)."""
+
+    def __init__(self, path: str = CHAT_STORE_PATH, busy_timeout: float = 10.0):
+        self.path = path
+        self._lock = threading.Lock()
+        # isolation_level=None: 트랜잭션을 직접 관리 (BEGIN IMMEDIATE)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=busy_timeout, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA foreign_keys=ON")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS conversations ("
+            " id TEXT PRIMARY KEY,"
+            " title TEXT NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " updated_at REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS messages ("
+            " conversation_id TEXT NOT NULL REFERENCES conversations(id) ON DELETE CASCADE,"
+            " position INTEGER NOT NULL,"
+            " role TEXT NOT NULL,"
+            " content TEXT NOT NULL,"
+            " extra TEXT,"
+            " created_at REAL NOT NULL,"
+            " PRIMARY KEY (conversation_id, position))"
+        )
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        """쓰기 트랜잭션 (다른 프로세스의 쓰기가 끝날 때까지 busy_timeout만큼 대기)."""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._conn
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def list_conversations(self) -> List[Tuple[str, str]]:
+        """(제목, 대화 id) 목록을 만든 순서대로 반환합니다 (메시지는 읽지 않음)."""
+        with self._lock:
+            rows = self._conn.execute("SELECT title, id FROM conversations ORDER BY created_at, id").fetchall()
+        return [(title, conversation_id) for title, conversation_id in rows]
+
+    def load_messages(self, conversation_id: str) -> List[Dict[str, Any]]:
+        """대화 하나의 메시지를 순서대로 반환합니다."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT role, content, extra FROM messages WHERE conversation_id = ? ORDER BY position",
+                (conversation_id,),
+            ).fetchall()
+        messages = []
+        for role, content, extra in rows:
+            message: Dict[str, Any] = {"role": role, "content": content}
+            if extra:
+                message.update(json.loads(extra))
+            messages.append(message)
+        return messages
+
+    def save_conversation(self, conversation_id: str, title: str, messages: List[Dict[str, Any]]) -> int:
+        """
+        대화를 저장하고 새로 추가한 메시지 수를 반환합니다.
+
+        이미 저장된 메시지는 다시 쓰지 않고 그 뒤의 메시지만 추가합니다.
+        (저장된 메시지가 더 많으면 대화가 바뀐 것이므로 메시지를 모두 다시 씁니다.)
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            conn.execute(
+                "INSERT INTO conversations (id, title, created_at, updated_at) VALUES (?, ?, ?, ?)"
+                " ON CONFLICT(id) DO UPDATE SET title = excluded.title, updated_at = excluded.updated_at",
+                (conversation_id, title, now, now),
+            )
+            stored = conn.execute(
+                "SELECT COUNT(*) FROM messages WHERE conversation_id = ?", (conversation_id,)
+            ).fetchone()[0]
+            if stored > len(messages):
+                conn.execute("DELETE FROM messages WHERE conversation_id = ?", (conversation_id,))
+                stored = 0
+
+            new_rows = []
+            for position, message in enumerate(messages[stored:], start=stored):
+                extra = {key: value for key, value in message.items() if key not in MESSAGE_COLUMNS}
+                new_rows.append((
+                    conversation_id,
+                    position,
+                    message["role"],
+                    message["content"],
+                    json.dumps(extra, ensure_ascii=False) if extra else None,
+                    now,
+                ))
+            conn.executemany(
+                "INSERT INTO messages (conversation_id, position, role, content, extra, created_at)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                new_rows,
+            )
+        return len(new_rows)
+
+    def delete_conversation(self, conversation_id: str) -> None:
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM conversations WHERE id = ?", (conversation_id,))
+
+    def clear(self) -> None:
+        """모든 대화를 삭제합니다."""
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM messages")
+            conn.execute("DELETE FROM conversations")
+
+    def migrate_json_file(self, json_path: str) -> int:
+        """
+        이전 형식의 chat_history.json을 가져오고 가져온 대화 수를 반환합니다.
+
+        가져온 파일은 다시 가져오지 않도록 '<파일명>.migrated'로 이름을 바꿉니다.
+        """
+        if not os.path.exists(json_path):
+            return 0
+        with open(json_path, "r", encoding="utf-8") as f:
+            chat_data = json.load(f)
+
+        imported = 0
+        for title, chat_id in chat_data.get("chat_history", []):
+            messages = chat_data.get(f"chat_{chat_id}")
+            if messages:
+                self.save_conversation(chat_id, title, messages)
+                imported += 1
+        os.replace(json_path, json_path + ".migrated")
+        return imported
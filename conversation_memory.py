@@ -0,0 +1,108 @@
+"""
+대화 기억(memory) 방식을 선택하고 프롬프트 토큰 수를 측정합니다.
+
+- buffer: 전체 대화를 그대로 기억 (대화가 길어질수록 질문 재구성 프롬프트가 계속 커짐)
+- token_window: 최근 대화만 토큰 예산(max_token_limit) 안에서 기억
+- summary: 토큰 예산을 넘는 오래된 대화는 요약문에 점진적으로 합치고, 최근 대화는 그대로 기억
+
+토큰 수는 tiktoken으로 계산합니다.
+langchain.memory, langchain_core.messages, tiktoken(ingest_pipeline)은 import가 느리므로, 앱 첫 화면을 늦추지 않도록 메모리를 만들거나 토큰을 셀 때 import합니다.
+"""
+
+import os
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+if TYPE_CHECKING:
+    from langchain_core.messages import BaseMessage
+
+MEMORY_MODES = {
+    "buffer": "전체 대화",
+    "token_window": "최근 대화 (토큰 제한)",
+    "summary": "요약 + 최근 대화",
+}
+DEFAULT_MEMORY_MODE = os.getenv("MEMORY_MODE", "summary")
+MEMORY_MAX_TOKENS = int(os.getenv("MEMORY_MAX_TOKENS", "1000"))
+
+
+def create_conversation_memory(mode: str, llm: Any, max_token_limit: int = MEMORY_MAX_TOKENS):
+    """선택한 방식의 대화 메모리를 만듭니다 (llm은 토큰 계산과 요약에 사용)."""
+    from langchain.memory import ConversationBufferMemory, ConversationSummaryBufferMemory, ConversationTokenBufferMemory
+
+    common = {"memory_key": "chat_history", "input_key": "question", "output_key": "answer", "return_messages": True}
+    if mode == "token_window":
+        return ConversationTokenBufferMemory(llm=llm, max_token_limit=max_token_limit, **common)
+    if mode == "summary":
+        return ConversationSummaryBufferMemory(llm=llm, max_token_limit=max_token_limit, **common)
+    return ConversationBufferMemory(**common)
+
+
+def restore_conversation_memory(memory: Any, messages: List[Dict[str, Any]]) -> None:
+    """
+    저장된 대화 메시지로 메모리를 다시 채웁니다.
+
+    대화를 한꺼번에 추가한 뒤 한 번만 토큰 예산을 적용하므로, summary 방식도 요약 LLM 호출은 최대 한 번입니다.
+    """
+    from langchain.memory import ConversationSummaryBufferMemory, ConversationTokenBufferMemory
+
+    memory.clear()
+    user_msg = None
+    for msg in messages:
+        if msg["role"] == "user":
+            user_msg = msg["content"]
+        elif msg["role"] == "assistant" and user_msg:
+            memory.chat_memory.add_user_message(user_msg)
+            memory.chat_memory.add_ai_message(msg["content"])
+            user_msg = None
+
+    if not memory.chat_memory.messages:
+        return
+    if isinstance(memory, ConversationSummaryBufferMemory):
+        memory.prune()
+    elif isinstance(memory, ConversationTokenBufferMemory):
+        buffer = memory.chat_memory.messages
+        while buffer and memory.llm.get_num_tokens_from_messages(buffer) > memory.max_token_limit:
+            buffer.pop(0)
+
+
+def memory_token_count(memory: Any) -> int:
+    """다음 질문 재구성 프롬프트에 들어갈 대화 기록의 토큰 수."""
+    from langchain_core.messages import get_buffer_string
+
+    from ingest_pipeline import count_tokens
+
+    chat_history = memory.load_memory_variables({}).get(memory.memory_key, [])
+    if isinstance(chat_history, list):
+        chat_history = get_buffer_string(chat_history)
+    return count_tokens(chat_history)
+
+
+class PromptTokenCounter(BaseCallbackHandler):
+    """
+    체인 실행 중 LLM 호출별 프롬프트 토큰 수를 기록합니다.
+
+    LLM에 지정한 태그(예: "condense_question", "answer")를 키로 사용하며, 태그가 없으면 "other"로 합산합니다.
+    """
+
+    def __init__(self, tags: Optional[List[str]] = None):
+        self.tags = tags or ["condense_question", "answer"]
+        self.prompt_tokens: Dict[str, int] = {}
+
+    def on_chat_model_start(
+        self,
+        serialized: Dict[str, Any],
+        messages: List[List["BaseMessage"]],
+        *,
+        run_id: UUID,
+        tags: Optional[List[str]] = None,
+        **kwargs: Any,
+    ) -> None:
+        from langchain_core.messages import get_buffer_string
+
+        from ingest_pipeline import count_tokens
+
+        label = next((tag for tag in self.tags if tag in (tags or [])), "other")
+        tokens = sum(count_tokens(get_buffer_string(batch)) for batch in messages)
+        self.prompt_tokens[label] = self.prompt_tokens.get(label, 0) + tokens
@@ -0,0 +1,157 @@
+"""
+임베딩 결과를 디스크(SQLite)에 캐싱하는 Embeddings 래퍼입니다.
+
+키는 sha256(모델 이름 + 텍스트)이며, 같은 텍스트를 같은 모델로 다시 임베딩할 때는
+OpenAI API를 호출하지 않습니다. 항목 수가 max_entries를 넘으면 가장 오래 사용되지 않은 항목부터 삭제합니다 (LRU).
+ingest_gitbook.py와 app.py가 같은 캐시 파일을 공유할 수 있습니다.
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from typing import Dict, List, Optional
+
+from langchain_core.embeddings import Embeddings
+
+from openai_clients import create_embeddings
+
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "embedding_cache.sqlite3")
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "200000"))
+
+
+def embedding_cache_key(model_name: str, text: str) -> str:
+    """모델 이름과 텍스트로 캐시 키(sha256)를 만듭니다."""
+    return hashlib.sha256(f"{model_name}\0{text}".encode("utf-8")).hexdigest()
+
+
+class SQLiteEmbeddingCache:
+    """크기 제한(LRU 삭제)이 있는 SQLite 기반 임베딩 저장소."""
+
+    def __init__(self, path: str = EMBEDDING_CACHE_PATH, max_entries: int = EMBEDDING_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " key TEXT PRIMARY KEY,"
+            " vector BLOB NOT NULL,"
+            " last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS embeddings_last_access ON embeddings (last_access)")
+        self._conn.commit()
+        self._size = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def get_many(self, keys: List[str]) -> Dict[str, List[float]]:
+        """저장된 키의 벡터를 반환하고 마지막 사용 시각을 갱신합니다."""
+        found: Dict[str, List[float]] = {}
+        if not keys:
+            return found
+        with self._lock:
+            unique_keys = list(dict.fromkeys(keys))
+            for i in range(0, len(unique_keys), 500):  # SQLite 변수 개수 제한
+                batch = unique_keys[i:i + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", batch
+                ).fetchall()
+                for key, blob in rows:
+                    vector = array("f")
+                    vector.frombytes(blob)
+                    found[key] = vector.tolist()
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_access = ? WHERE key = ?", [(now, key) for key in found]
+                )
+                self._conn.commit()
+        return found
+
+    def put_many(self, items: Dict[str, List[float]]) -> None:
+        """벡터를 저장하고, 최대 항목 수를 넘으면 가장 오래 사용되지 않은 항목부터 삭제합니다."""
+        if not items:
+            return
+        now = time.time()
+        with self._lock:
+            before = self._conn.total_changes
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO embeddings (key, vector, last_access) VALUES (?, ?, ?)",
+                [(key, array("f", vector).tobytes(), now) for key, vector in items.items()],
+            )
+            self._size += self._conn.total_changes - before
+            overflow = self._size - self.max_entries
+            if overflow > 0:
+                self._conn.execute(
+                    "DELETE FROM embeddings WHERE key IN ("
+                    " SELECT key FROM embeddings ORDER BY last_access ASC LIMIT ?)",
+                    (overflow,),
+                )
+                self._size -= overflow
+            self._conn.commit()
+
+    def __len__(self) -> int:
+        return self._size
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    다른 Embeddings 객체를 감싸 캐시에 없는 텍스트만 실제로 임베딩합니다.
+
+    hits/misses 카운터로 캐시 적중률을 확인할 수 있습니다.
+    """
+
+    def __init__(self, underlying: Embeddings, cache: SQLiteEmbeddingCache, model_name: Optional[str] = None):
+        self.underlying = underlying
+        self.cache = cache
+        self.model_name = model_name or getattr(underlying, "model", None) or type(underlying).__name__
+        self.hits = 0
+        self.misses = 0
+        self._stats_lock = threading.Lock()
+
+    def _embed(self, texts: List[str], embed_fn) -> List[List[float]]:
+        keys = [embedding_cache_key(self.model_name, text) for text in texts]
+        cached = self.cache.get_many(keys)
+
+        missing: Dict[str, str] = {}
+        for key, text in zip(keys, texts):
+            if key not in cached and key not in missing:
+                missing[key] = text
+
+        if missing:
+            vectors = embed_fn(list(missing.values()))
+            computed = dict(zip(missing.keys(), vectors))
+            self.cache.put_many(computed)
+            cached.update(computed)
+
+        with self._stats_lock:
+            self.misses += len(missing)
+            self.hits += len(texts) - len(missing)
+        return [cached[key] for key in keys]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._embed(texts, self.underlying.embed_documents)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed([text], lambda missing: [self.underlying.embed_query(missing[0])])[0]
+
+    def stats(self) -> Dict[str, float]:
+        """캐시 적중/미적중 횟수, 적중률, 저장된 항목 수를 반환합니다."""
+        with self._stats_lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "entries": len(self.cache),
+            }
+
+
+def create_cached_embeddings(openai_api_key: str, **embedding_kwargs) -> CachedEmbeddings:
+    """OpenAIEmbeddings(공유 연결 풀/재시도/동시 실행 제한 사용)를 디스크 캐시로 감싼 임베딩 객체를 생성합니다."""
+    underlying = create_embeddings(openai_api_key, **embedding_kwargs)
+    return CachedEmbeddings(underlying, SQLiteEmbeddingCache(EMBEDDING_CACHE_PATH, EMBEDDING_CACHE_MAX_ENTRIES))
@@ -0,0 +1,254 @@
+"""
+GitBook 페이지를 동시에 가져오는 수집(fetch) 단계입니다.
+
+- 호스트별 토큰 버킷으로 초당 요청 수를 제한합니다 (서버 부하 방지).
+- requests.Session + HTTPAdapter로 커넥션 풀/keep-alive를 재사용합니다.
+- 429/5xx 및 네트워크 오류는 지수 백오프(지터 포함)로 재시도합니다.
+- 제한된 크기의 스레드 풀에서 페이지를 병렬로 가져오므로,
+  처리량은 직렬 왕복 지연이 아닌 요청 속도 제한(politeness budget)에 의해 결정됩니다.
+"""
+
+import os
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+from urllib.parse import urlparse
+
+import requests
+from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+from langchain_core.documents import Document
+
+DEFAULT_USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+
+# 재시도 대상 HTTP 상태 코드
+RETRYABLE_STATUS_CODES = (429, 500, 502, 503, 504)
+
+# 재시도 전 최대 대기 시간 (초) - 큰 Retry-After 값으로 수집 작업자가 오래 멈추지 않도록 제한
+RETRY_MAX_DELAY = 30.0
+
+# 본문 내용 추출을 시도할 셀렉터 목록 (사용자 지정 셀렉터 다음 순서로 시도)
+FALLBACK_CONTENT_SELECTORS = [
+    "article",                # 일반적인 본문 요소
+    "main",                   # 메인 콘텐츠 영역
+    "div.content",            # 일반적인 내용 컨테이너
+    "div.markdown",           # GitBook 마크다운 영역
+    "div[role='main']",       # 메인 역할을 하는 div
+    "body"                    # 최후의 수단으로 전체 본문
+]
+
+
+class TokenBucket:
+    """초당 rate개의 토큰을 채우고 최대 capacity개까지 버스트를 허용하는 토큰 버킷."""
+
+    def __init__(self, rate: float, capacity: float = 1.0):
+        if rate <= 0:
+            raise ValueError("rate는 0보다 커야 합니다.")
+        self.rate = rate
+        self.capacity = max(1.0, capacity)
+        self._tokens = self.capacity
+        self._last_refill = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """토큰 하나를 얻을 때까지 대기하고, 대기한 시간(초)을 반환합니다."""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._last_refill) * self.rate)
+                self._last_refill = now
+                if self._tokens >= 1.0:
+                    self._tokens -= 1.0
+                    return waited
+                wait_time = (1.0 - self._tokens) / self.rate
+            time.sleep(wait_time)
+            waited += wait_time
+
+
+class HostRateLimiter:
+    """호스트(netloc)별로 독립된 TokenBucket을 관리합니다."""
+
+    def __init__(self, requests_per_second: float, burst: float = 1.0):
+        self.requests_per_second = requests_per_second
+        self.burst = burst
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, url: str) -> float:
+        host = urlparse(url).netloc
+        with self._lock:
+            bucket = self._buckets.get(host)
+            if bucket is None:
+                bucket = TokenBucket(self.requests_per_second, self.burst)
+                self._buckets[host] = bucket
+        return bucket.acquire()
+
+
+def create_http_session(pool_size: int = 8, user_agent: Optional[str] = None) -> requests.Session:
+    """
+    커넥션 풀과 keep-alive를 재사용하는 requests.Session을 생성합니다.
+
+    재시도는 fetch_page에서 속도 제한을 다시 거쳐 수행하므로 어댑터 수준의 재시도는 끕니다.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers.update({
+        "User-Agent": user_agent or os.getenv("USER_AGENT", DEFAULT_USER_AGENT),
+        "Connection": "keep-alive",
+    })
+    return session
+
+
+def parse_gitbook_html(url: str, html: bytes, content_selector: str = "article.page-body") -> Optional[Document]:
+    """
+    HTML에서 BeautifulSoup으로 제목과 본문을 추출합니다.
+
+    Args:
+        url: 페이지 URL (메타데이터의 source로 사용)
+        html: 페이지 HTML 바이트
+        content_selector: 내용을 추출할 HTML 요소의 CSS 셀렉터
+
+    Returns:
+        내용이 추출된 Document 객체 또는 None (내용 추출 실패시)
+    """
+    soup = BeautifulSoup(html, "lxml")
+
+    # 페이지 제목 추출
+    title_tag = soup.find("title")
+    title = title_tag.get_text() if title_tag else "제목 없음"
+
+    content = ""
+    selector_used = None
+    for selector in [content_selector] + FALLBACK_CONTENT_SELECTORS:
+        content_element = soup.select_one(selector)
+        if content_element and content_element.get_text(strip=True):
+            # 불필요한 요소 제거 (선택 사항, 사이트에 따라 조정 필요)
+            for unwanted in content_element.select("nav, footer, script, style, aside, .sidebar, .navigation"):
+                unwanted.decompose()
+
+            content = content_element.get_text(separator="\n", strip=True)
+            selector_used = selector
+            print(f"Content extracted using selector: {selector}")
+            break
+
+    if not content:
+        print(f"No content found in {url} using any CSS selectors")
+        return None
+
+    # 메타데이터와 함께 Document 객체 생성
+    metadata = {
+        "source": url,
+        "title": title,
+        "selector_used": selector_used
+    }
+
+    return Document(page_content=content, metadata=metadata)
+
+
+def _retry_after_seconds(response: requests.Response) -> Optional[float]:
+    """Retry-After 헤더(초 단위)를 RETRY_MAX_DELAY 이하로 해석합니다. 없거나 해석할 수 없으면 None."""
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return min(RETRY_MAX_DELAY, max(0.0, float(value)))
+    except ValueError:
+        return None
+
+
+def fetch_page(
+    url: str,
+    session: Optional[requests.Session] = None,
+    content_selector: str = "article.page-body",
+    rate_limiter: Optional[HostRateLimiter] = None,
+    max_retries: int = 3,
+    backoff_base: float = 0.5,
+    timeout: float = 15,
+) -> Optional[Document]:
+    """
+    페이지 하나를 가져와 Document로 변환합니다.
+
+    429/5xx 및 네트워크 오류는 최대 max_retries번 재시도하며, 재시도마다
+    backoff_base * 2^n 초(+지터, Retry-After 헤더 우선, 최대 RETRY_MAX_DELAY초)를 기다린 뒤 속도 제한을 다시 거칩니다.
+    """
+    http = session or requests
+    headers = None if session else {"User-Agent": os.getenv("USER_AGENT", DEFAULT_USER_AGENT)}
+
+    for attempt in range(max_retries + 1):
+        if rate_limiter:
+            rate_limiter.acquire(url)
+
+        retry_delay = min(RETRY_MAX_DELAY, backoff_base * (2 ** attempt) + random.uniform(0, backoff_base))
+        try:
+            response = http.get(url, headers=headers, timeout=timeout)
+            if response.status_code in RETRYABLE_STATUS_CODES and attempt < max_retries:
+                retry_after = _retry_after_seconds(response)
+                if retry_after is not None:  # Retry-After: 0은 바로 재시도
+                    retry_delay = retry_after
+                print(f"Retrying {url} after HTTP {response.status_code} (attempt {attempt + 1}/{max_retries}, {retry_delay:.1f}s)")
+                time.sleep(retry_delay)
+                continue
+            response.raise_for_status()
+            return parse_gitbook_html(url, response.content, content_selector)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            if attempt < max_retries:
+                print(f"Retrying {url} after network error: {e} (attempt {attempt + 1}/{max_retries}, {retry_delay:.1f}s)")
+                time.sleep(retry_delay)
+                continue
+            print(f"Error extracting content from {url}: {e}")
+            return None
+        except Exception as e:
+            print(f"Error extracting content from {url}: {e}")
+            return None
+    return None
+
+
+def fetch_documents_concurrently(
+    urls: Iterable[str],
+    content_selector: str = "article.page-body",
+    max_workers: int = 8,
+    requests_per_second: float = 2.0,
+    burst: float = 1.0,
+    max_retries: int = 3,
+    session: Optional[requests.Session] = None,
+) -> Iterator[Tuple[str, Optional[Document]]]:
+    """
+    URL 목록을 제한된 스레드 풀에서 병렬로 가져와, 완료되는 순서대로 (url, Document 또는 None)을 반환합니다.
+
+    동시에 진행 중이거나 소비되지 않은 페이지는 최대 max_workers * 2개로 제한되므로,
+    URL 수와 관계없이 메모리 사용량이 일정합니다.
+
+    Args:
+        urls: 가져올 페이지 URL 목록
+        content_selector: 내용을 추출할 HTML 요소의 CSS 셀렉터
+        max_workers: 동시에 진행할 최대 요청 수 (커넥션 풀 크기와 동일)
+        requests_per_second: 호스트별 초당 최대 요청 수
+        burst: 토큰 버킷 용량 (순간적으로 허용할 요청 수)
+        max_retries: 페이지별 최대 재시도 횟수
+        session: 재사용할 requests.Session (None이면 새로 생성)
+    """
+    own_session = session is None
+    session = session or create_http_session(pool_size=max_workers)
+    rate_limiter = HostRateLimiter(requests_per_second, burst)
+    max_in_flight = max_workers * 2  # 결과를 소비하는 속도보다 앞서 쌓아두는 페이지 수 제한
+
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="gitbook-fetch") as executor:
+            in_flight: Dict = {}
+            for url in urls:
+                future = executor.submit(fetch_page, url, session, content_selector, rate_limiter, max_retries)
+                in_flight[future] = url
+                if len(in_flight) >= max_in_flight:
+                    done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        yield in_flight.pop(future), future.result()
+            for future in as_completed(in_flight):
+                yield in_flight[future], future.result()
+    finally:
+        if own_session:
+            session.close()
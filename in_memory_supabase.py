@@ -0,0 +1,150 @@
+"""
+테스트/벤치마크용으로 Supabase 클라이언트의 일부를 메모리에서 흉내 내는 대체 구현입니다.
+
+ingest_gitbook.py, app.py(qa_engine.py), app_state.py, suggested_questions.py가 사용하는 만큼만 구현합니다.
+- table(name) / from_(name): select, upsert, insert, update, delete + eq, neq, in_, limit, range 필터
+- table(name).select(...).order(column): 정렬 (local_vector_index.py의 스냅샷 내보내기용)
+- rpc("match_documents" / "hybrid_match_documents" / "list_document_sections"):
+  현재 documents 행으로 만든 LocalVectorIndex가 처리 (쓰기가 있으면 다시 만듦)
+
+결과는 실제 데이터베이스와 같지 않으므로(ANN 인덱스, tsvector 대신 전수 계산) 지연 시간 비교는 상대적인 값으로만 봐야 합니다.
+"""
+
+import threading
+import uuid
+from typing import Any, Dict, List, Optional
+
+from local_vector_index import LocalVectorIndex, QueryResponse, RpcCall
+
+# 테이블별 기본 키 컬럼 (나머지 테이블은 "id")
+PRIMARY_KEYS = {"app_state": "key"}
+
+
+class InMemoryQuery:
+    """table(name)이 반환하는 쿼리 빌더 (메서드 체이닝 후 execute())."""
+
+    def __init__(self, client: "InMemorySupabaseClient", table: str):
+        self._client = client
+        self._table = table
+        self._action = "select"
+        self._columns: Optional[List[str]] = None
+        self._count: Optional[str] = None
+        self._payload: Any = None
+        self._filters: List[Any] = []
+        self._start = 0
+        self._end: Optional[int] = None
+        self._order: Optional[Any] = None
+
+    def select(self, columns: str = "*", count: Optional[str] = None) -> "InMemoryQuery":
+        self._columns = None if columns.strip() == "*" else [column.strip() for column in columns.split(",")]
+        self._count = count
+        return self
+
+    def upsert(self, rows: Any, **kwargs: Any) -> "InMemoryQuery":
+        self._action = "upsert"
+        self._payload = rows if isinstance(rows, list) else [rows]
+        return self
+
+    insert = upsert
+
+    def update(self, values: Dict[str, Any]) -> "InMemoryQuery":
+        self._action = "update"
+        self._payload = values
+        return self
+
+    def delete(self) -> "InMemoryQuery":
+        self._action = "delete"
+        return self
+
+    def eq(self, column: str, value: Any) -> "InMemoryQuery":
+        self._filters.append(lambda row: row.get(column) == value)
+        return self
+
+    def neq(self, column: str, value: Any) -> "InMemoryQuery":
+        self._filters.append(lambda row: row.get(column) != value)
+        return self
+
+    def in_(self, column: str, values: List[Any]) -> "InMemoryQuery":
+        values = set(values)
+        self._filters.append(lambda row: row.get(column) in values)
+        return self
+
+    def order(self, column: str, desc: bool = False) -> "InMemoryQuery":
+        self._order = (column, desc)
+        return self
+
+    def limit(self, size: int) -> "InMemoryQuery":
+        self._end = self._start + size - 1
+        return self
+
+    def range(self, start: int, end: int) -> "InMemoryQuery":
+        self._start, self._end = start, end
+        return self
+
+    def execute(self) -> QueryResponse:
+        return self._client._execute(self)
+
+    def _matches(self, row: Dict[str, Any]) -> bool:
+        return all(condition(row) for condition in self._filters)
+
+
+class InMemorySupabaseClient:
+    """여러 스레드(수집 파이프라인, 동시 질문)에서 함께 사용해도 안전한 메모리 저장소."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._tables: Dict[str, Dict[Any, Dict[str, Any]]] = {}
+        self._index: Optional[LocalVectorIndex] = None  # documents 검색용 (쓰기가 있으면 다시 만듦)
+
+    def table(self, name: str) -> InMemoryQuery:
+        return InMemoryQuery(self, name)
+
+    from_ = table
+
+    def rpc(self, name: str, params: Optional[Dict[str, Any]] = None) -> RpcCall:
+        return self._document_index().rpc(name, params)
+
+    def _execute(self, query: InMemoryQuery) -> QueryResponse:
+        key_column = PRIMARY_KEYS.get(query._table, "id")
+        with self._lock:
+            table = self._tables.setdefault(query._table, {})
+            if query._action == "upsert":
+                for row in query._payload:
+                    row = dict(row)
+                    row.setdefault(key_column, str(uuid.uuid4()))
+                    table[row[key_column]] = row
+                self._invalidate(query._table)
+                return QueryResponse([dict(row) for row in query._payload])
+
+            matched = [row for row in table.values() if query._matches(row)]
+            if query._action == "update":
+                for row in matched:
+                    row.update(query._payload)
+                self._invalidate(query._table)
+            elif query._action == "delete":
+                for row in matched:
+                    del table[row[key_column]]
+                self._invalidate(query._table)
+            else:
+                if query._order is not None:
+                    column, desc = query._order
+                    matched.sort(key=lambda row: str(row.get(column)), reverse=desc)
+                count = len(matched) if query._count else None
+                end = len(matched) if query._end is None else query._end + 1
+                rows = matched[query._start:end]
+                if query._columns is not None:
+                    rows = [{column: row.get(column) for column in query._columns} for row in rows]
+                else:
+                    rows = [dict(row) for row in rows]
+                return QueryResponse(rows, count)
+            return QueryResponse([dict(row) for row in matched])
+
+    def _invalidate(self, table: str) -> None:
+        if table == "documents":
+            self._index = None
+
+    def _document_index(self) -> LocalVectorIndex:
+        with self._lock:
+            if self._index is None:
+                self._index = LocalVectorIndex.from_rows(list(self._tables.get("documents", {}).values()))
+            return self._index
@@ -1,18 +1,28 @@
 import os
+import hashlib
+import threading
 import requests
 import xmltodict # 사이트맵 파싱용
 from dotenv import load_dotenv
-from typing import List, Dict, Any
-from bs4 import BeautifulSoup
+from collections import Counter
+from typing import List, Dict, Any, Iterable, Iterator, Optional
 from time import sleep
+from urllib.parse import unquote, urlparse
 
 from langchain_community.document_loaders import GitbookLoader
 from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_openai import OpenAIEmbeddings
-from langchain_community.vectorstores.supabase import SupabaseVectorStore
 from langchain_core.documents import Document
 from supabase.client import Client, create_client
 
+from app_state import publish_corpus_version
+from embedding_cache import create_cached_embeddings
+from gitbook_fetcher import fetch_documents_concurrently, fetch_page
+from ingest_pipeline import IngestCheckpoint, bounded_stage, chunk_row_id, embed_and_upload
+from local_vector_index import LOCAL_INDEX_PATH, VECTOR_STORE_BACKEND, export_snapshot, snapshot_exists
+from model_router import create_routed_chat_model
+from openai_clients import client_metrics
+from suggested_questions import refresh_question_pool
+
 load_dotenv()
 
 # 환경 변수 확인
@@ -20,40 +30,43 @@ OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_ANON_KEY = os.getenv("SUPABASE_ANON_KEY")
 
-# 필수 환경 변수 체크
-if not OPENAI_API_KEY or not SUPABASE_URL or not SUPABASE_ANON_KEY:
-    missing_vars = []
-    if not OPENAI_API_KEY:
-        missing_vars.append("OPENAI_API_KEY")
-    if not SUPABASE_URL:
-        missing_vars.append("SUPABASE_URL")
-    if not SUPABASE_ANON_KEY:
-        missing_vars.append("SUPABASE_ANON_KEY")
-    
-    print(f"오류: 다음 환경 변수가 설정되지 않았습니다: {', '.join(missing_vars)}")
-    print("create_env.py 스크립트로 생성된 .env 파일을 편집하여 필요한 값을 채워주세요.")
-    exit(1)
-
-# Supabase 클라이언트 초기화
-supabase: Client = None
-try:
-    supabase = create_client(SUPABASE_URL, SUPABASE_ANON_KEY)
-    # 연결 테스트
-    test_query = supabase.table("documents").select("id").limit(1).execute()
-    print("Supabase 연결 성공!")
-except Exception as e:
-    print(f"Supabase 클라이언트 초기화 또는 연결 테스트 실패: {e}")
-    print("다음 사항을 확인해주세요:")
-    print("1. .env 파일에 올바른 SUPABASE_URL 및 SUPABASE_ANON_KEY가 설정되어 있는지")
-    print("2. Supabase 프로젝트가 활성화되어 있는지")
-    print("3. 'documents' 테이블이 생성되어 있고, 접근 권한이 있는지")
-    print("4. pgvector 확장이 활성화되어 있는지")
-    print("\nSupabase 스키마 설정은 supabase_schema.sql 파일을 참고하세요.")
-    exit(1)
+# Supabase 클라이언트 (처음 필요할 때 생성, 벤치마크/테스트에서는 ingest_documents에 직접 전달)
+supabase: Optional[Client] = None
 
-def get_urls_from_sitemap(sitemap_url: str) -> List[str]:
-    """사이트맵 XML에서 모든 <loc> URL을 추출합니다 (xmltodict 사용)."""
-    urls = []
+def check_required_env(names: List[str]) -> None:
+    """필수 환경 변수가 없으면 안내 메시지를 출력하고 종료합니다."""
+    missing_vars = [name for name in names if not os.getenv(name)]
+    if missing_vars:
+        print(f"오류: 다음 환경 변수가 설정되지 않았습니다: {', '.join(missing_vars)}")
+        print("create_env.py 스크립트로 생성된 .env 파일을 편집하여 필요한 값을 채워주세요.")
+        exit(1)
+
+def get_supabase_client() -> Client:
+    """Supabase 클라이언트를 처음 호출할 때 생성하고 연결을 확인합니다 (실패하면 종료)."""
+    global supabase
+    if supabase is not None:
+        return supabase
+    check_required_env(["SUPABASE_URL", "SUPABASE_ANON_KEY"])
+    try:
+        client = create_client(SUPABASE_URL, SUPABASE_ANON_KEY)
+        # 연결 테스트
+        client.table("documents").select("id").limit(1).execute()
+        print("Supabase 연결 성공!")
+    except Exception as e:
+        print(f"Supabase 클라이언트 초기화 또는 연결 테스트 실패: {e}")
+        print("다음 사항을 확인해주세요:")
+        print("1. .env 파일에 올바른 SUPABASE_URL 및 SUPABASE_ANON_KEY가 설정되어 있는지")
+        print("2. Supabase 프로젝트가 활성화되어 있는지")
+        print("3. 'documents' 테이블이 생성되어 있고, 접근 권한이 있는지")
+        print("4. pgvector 확장이 활성화되어 있는지")
+        print("\nSupabase 스키마 설정은 supabase_schema.sql 파일을 참고하세요.")
+        exit(1)
+    supabase = client
+    return supabase
+
+def get_sitemap_entries(sitemap_url: str) -> List[Dict[str, Optional[str]]]:
+    """사이트맵 XML에서 모든 <url> 항목의 <loc>과 <lastmod>를 추출합니다 (xmltodict 사용)."""
+    entries = []
     try:
         response = requests.get(sitemap_url, timeout=15)
         response.raise_for_status()
@@ -67,16 +80,147 @@ def get_urls_from_sitemap(sitemap_url: str) -> List[str]:
 
         for entry in url_entries:
             if isinstance(entry, dict) and 'loc' in entry:
-                urls.append(entry['loc'])
+                entries.append({"loc": entry['loc'], "lastmod": entry.get('lastmod')})
         
-        print(f"Extracted {len(urls)} URLs from {sitemap_url}")
+        print(f"Extracted {len(entries)} URLs from {sitemap_url}")
     except requests.RequestException as e:
         print(f"Error fetching sitemap {sitemap_url}: {e}")
     except xmltodict.expat.ExpatError as e: # xmltodict 파싱 에러
         print(f"Error parsing sitemap XML from {sitemap_url} with xmltodict: {e}")
     except Exception as e:
         print(f"An unexpected error occurred while processing sitemap {sitemap_url}: {e}")
-    return urls
+    return entries
+
+def get_urls_from_sitemap(sitemap_url: str) -> List[str]:
+    """사이트맵 XML에서 모든 <loc> URL을 추출합니다 (xmltodict 사용)."""
+    return [entry["loc"] for entry in get_sitemap_entries(sitemap_url)]
+
+def compute_content_hash(text: str) -> str:
+    """페이지/청크 내용의 sha256 해시를 반환합니다 (변경 감지용)."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def url_section_metadata(url: str, base_url: Optional[str] = None) -> Dict[str, Any]:
+    """
+    페이지 URL 경로에서 섹션 메타데이터를 만듭니다 (검색 범위 필터용).
+
+    예: base_url이 https://docs.example.com/ 이고 url이 https://docs.example.com/guide/install/linux 이면
+        {"section": "guide", "sections": ["guide", "guide/install", "guide/install/linux"]}
+    base_url 경로 아래의 상대 경로 기준이며, 루트 페이지는 section이 ""이고 sections가 빈 목록입니다.
+    """
+    path = unquote(urlparse(url).path).strip("/")
+    base_path = unquote(urlparse(base_url).path).strip("/") if base_url else ""
+    if base_path and (path == base_path or path.startswith(base_path + "/")):
+        path = path[len(base_path):].strip("/")
+
+    segments = [segment for segment in path.split("/") if segment]
+    return {
+        "section": segments[0] if segments else "",
+        "sections": ["/".join(segments[:i + 1]) for i in range(len(segments))],
+    }
+
+def load_existing_page_index(client: Any, page_size: int = 1000) -> Dict[str, Dict[str, Any]]:
+    """
+    'documents' 테이블의 메타데이터를 읽어 페이지별 색인을 만듭니다.
+
+    Returns:
+        {source URL: {"lastmod": ..., "page_hash": ..., "sections": ..., "page_chunk_count": ..., "row_count": ...,
+                      "chunks": {chunk_hash: [row id, ...]}}}
+        해시가 없는 이전 형식의 행은 page_hash/chunk_hash가 None으로 기록되어 항상 변경된 것으로 취급됩니다.
+        섹션 메타데이터가 없는 행은 sections가 None으로 기록되어 메타데이터만 다시 갱신됩니다.
+        행마다 page_hash/lastmod가 다르거나 행 수가 page_chunk_count와 다른 페이지(이전 실행이 페이지 갱신 도중 중단됨)는
+        page_hash/lastmod가 None으로 기록되어 다시 처리됩니다 (내용이 같은 청크의 임베딩은 재사용).
+    """
+    index: Dict[str, Dict[str, Any]] = {}
+    start = 0
+    while True:
+        rows = client.table("documents").select("id, metadata").range(start, start + page_size - 1).execute().data or []
+        for row in rows:
+            metadata = row.get("metadata") or {}
+            source = metadata.get("source")
+            if not source:
+                continue
+            page = index.setdefault(source, {
+                "lastmod": metadata.get("lastmod"),
+                "page_hash": metadata.get("page_hash"),
+                "sections": metadata.get("sections"),
+                "page_chunk_count": metadata.get("page_chunk_count"),
+                "row_count": 0,
+                "chunks": {},
+            })
+            if metadata.get("page_hash") != page["page_hash"] or metadata.get("lastmod") != page["lastmod"]:
+                page["page_hash"] = page["lastmod"] = None
+            page["row_count"] += 1
+            page["chunks"].setdefault(metadata.get("chunk_hash"), []).append(row["id"])
+        if len(rows) < page_size:
+            break
+        start += page_size
+    for page in index.values():
+        if page["row_count"] != page["page_chunk_count"]:
+            page["page_hash"] = page["lastmod"] = None
+    return index
+
+def delete_document_rows(client: Any, row_ids: List[Any], batch_size: int = 100) -> None:
+    """주어진 id의 청크 행들을 배치 단위로 삭제합니다."""
+    for i in range(0, len(row_ids), batch_size):
+        client.table("documents").delete().in_("id", row_ids[i:i + batch_size]).execute()
+
+class PendingPageUpdates:
+    """
+    증분 모드에서 변경된 페이지의 기존 행 정리(더 이상 없는 청크 삭제, 재사용 청크 메타데이터 갱신)를
+    그 페이지의 새 청크가 모두 업로드된 뒤로 미룹니다.
+
+    새 청크를 올리는 도중 실패하거나 중단되면 기존 행이 이전 page_hash/lastmod를 그대로 갖고 있으므로,
+    다음 실행에서 그 페이지는 다시 변경된 것으로 처리됩니다 (load_existing_page_index 참고).
+    add()는 분할 단계 스레드에서, mark_uploaded()는 임베딩/저장 단계에서 호출됩니다.
+    """
+
+    def __init__(self, client: Any, stats: Dict[str, int]):
+        self.client = client
+        self.stats = stats
+        self._pages: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def add(self, source: str, new_chunks: List[Document], stale_ids: List[Any], metadata_updates: List[Any]) -> None:
+        """페이지의 정리 작업을 등록합니다 (새 청크가 없으면 바로 실행). 새 청크를 다음 단계로 넘기기 전에 호출해야 합니다."""
+        pending_ids = {chunk_row_id(chunk) for chunk in new_chunks}
+        if not pending_ids:
+            self._apply(source, stale_ids, metadata_updates)
+            return
+        with self._lock:
+            self._pages[source] = {"pending_ids": pending_ids, "stale_ids": stale_ids, "metadata_updates": metadata_updates}
+
+    def mark_uploaded(self, chunks: List[Document]) -> None:
+        """업로드된 청크를 기록하고, 새 청크가 모두 저장된 페이지의 정리 작업을 실행합니다."""
+        completed = []
+        with self._lock:
+            for chunk in chunks:
+                source = chunk.metadata.get("source")
+                page = self._pages.get(source)
+                if page is None:
+                    continue
+                page["pending_ids"].discard(chunk_row_id(chunk))
+                if not page["pending_ids"]:
+                    completed.append((source, self._pages.pop(source)))
+        for source, page in completed:
+            self._apply(source, page["stale_ids"], page["metadata_updates"])
+
+    def unfinished_pages(self) -> int:
+        """새 청크가 아직 다 저장되지 않아 정리하지 못한 페이지 수."""
+        with self._lock:
+            return len(self._pages)
+
+    def _apply(self, source: str, stale_ids: List[Any], metadata_updates: List[Any]) -> None:
+        try:
+            if stale_ids:
+                delete_document_rows(self.client, stale_ids)
+            for row_id, metadata in metadata_updates:
+                self.client.table("documents").update({"metadata": metadata}).eq("id", row_id).execute()
+        except Exception as e:
+            print(f"Error updating existing chunks of {source}: {e}")
+            self.stats["failed_pages"] += 1
+            return
+        self.stats["reused_chunks"] += len(metadata_updates)
+        self.stats["stale_chunks"] += len(stale_ids)
 
 def extract_content_with_bs4(url: str, content_selector: str = "article.page-body") -> Document:
     """
@@ -89,58 +233,176 @@ def extract_content_with_bs4(url: str, content_selector: str = "article.page-bod
     Returns:
         내용이 추출된 Document 객체 또는 None (내용 추출 실패시)
     """
-    try:
-        headers = {
-            "User-Agent": os.getenv("USER_AGENT", "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36")
-        }
-        response = requests.get(url, headers=headers, timeout=15)
-        response.raise_for_status()
-        
-        soup = BeautifulSoup(response.content, "lxml")
-        
-        # 페이지 제목 추출
-        title_tag = soup.find("title")
-        title = title_tag.get_text() if title_tag else "제목 없음"
-        
-        # 본문 내용 추출을 시도할 셀렉터 목록
-        selectors_to_try = [
-            content_selector,         # 사용자 지정 셀렉터
-            "article",                # 일반적인 본문 요소
-            "main",                   # 메인 콘텐츠 영역
-            "div.content",            # 일반적인 내용 컨테이너
-            "div.markdown",           # GitBook 마크다운 영역
-            "div[role='main']",       # 메인 역할을 하는 div
-            "body"                    # 최후의 수단으로 전체 본문
-        ]
-        
-        content = ""
-        for selector in selectors_to_try:
-            content_element = soup.select_one(selector)
-            if content_element and content_element.get_text(strip=True):
-                # 불필요한 요소 제거 (선택 사항, 사이트에 따라 조정 필요)
-                for unwanted in content_element.select("nav, footer, script, style, aside, .sidebar, .navigation"):
-                    unwanted.decompose()
-                    
-                content = content_element.get_text(separator="\n", strip=True)
-                print(f"Content extracted using selector: {selector}")
-                break
-        
-        if not content:
-            print(f"No content found in {url} using any CSS selectors")
-            return None
-        
-        # 메타데이터와 함께 Document 객체 생성
-        metadata = {
-            "source": url,
-            "title": title,
-            "selector_used": selector if 'selector' in locals() else None
-        }
+    return fetch_page(url, content_selector=content_selector)
+
+def iter_loaded_documents(
+    page_urls: List[str],
+    content_selector: str,
+    use_bs4_extractor: bool,
+    request_delay: float,
+    max_concurrent_requests: int,
+    requests_per_second: Optional[float],
+    stats: Dict[str, int],
+) -> Iterator[Document]:
+    """페이지를 가져오는 대로 Document를 하나씩 반환합니다 (수집 단계)."""
+    if use_bs4_extractor:
+        # BeautifulSoup을 사용하여 내용 추출 (제한된 스레드 풀 + 호스트별 속도 제한)
+        if requests_per_second is None:
+            requests_per_second = 1.0 / request_delay if request_delay > 0 else float(max_concurrent_requests)
+        print(f"Fetching with {max_concurrent_requests} workers at up to {requests_per_second:.2f} requests/sec per host")
+        fetched = fetch_documents_concurrently(
+            page_urls,
+            content_selector=content_selector,
+            max_workers=max_concurrent_requests,
+            requests_per_second=requests_per_second,
+        )
+        for i, (page_url, doc) in enumerate(fetched):
+            print(f"Processed URL ({i+1}/{len(page_urls)}): {page_url}")
+            if doc:
+                stats["loaded"] += 1
+                print(f"Successfully loaded content from {page_url} using BeautifulSoup")
+                yield doc
+            else:
+                print(f"Failed to extract content from {page_url} using BeautifulSoup")
+        return
+
+    for i, page_url in enumerate(page_urls):
+        print(f"Processing URL ({i+1}/{len(page_urls)}): {page_url}")
         
-        return Document(page_content=content, metadata=metadata)
-    
+        # 요청 간 딜레이 추가 (서버 부하 방지)
+        if i > 0:
+            sleep(request_delay)
+            
+        # 기존 GitbookLoader 사용
+        try:
+            loader = GitbookLoader(
+                web_page=page_url,
+                load_all_paths=False, # 개별 URL 로드
+                content_selector=content_selector,
+                # requests_kwargs={'timeout': 20} # 타임아웃 설정
+            )
+            docs_from_page = loader.load()
+        except Exception as e:
+            print(f"Error loading content from {page_url} using GitbookLoader: {e}")
+            continue
+        if not docs_from_page:
+            print(f"No content loaded from {page_url} using GitbookLoader.")
+            continue
+        # GitbookLoader는 각 페이지를 단일 Document로 반환하는 경향이 있음
+        # 메타데이터에 URL 등을 잘 넣어주는지 확인 필요
+        print(f"Successfully loaded content from {page_url} using GitbookLoader. Documents added: {len(docs_from_page)}")
+        for doc in docs_from_page: # loader.load()는 리스트를 반환
+            if not doc.metadata.get("source"): # source가 없다면 채워줌
+                doc.metadata["source"] = page_url
+            stats["loaded"] += 1
+            yield doc
+
+def iter_filtered_documents(
+    docs: Iterable[Document],
+    lastmod_by_url: Dict[str, Optional[str]],
+    existing_index: Dict[str, Dict[str, Any]],
+    incremental: bool,
+    stats: Dict[str, int],
+    min_doc_length: int = 30,  # 최소 문서 길이 (글자 수)
+    base_url: Optional[str] = None,  # 섹션 경로 계산 기준 URL
+) -> Iterator[Document]:
+    """너무 짧은 문서와 (증분 모드에서) 내용이 바뀌지 않은 페이지를 걸러내고 페이지 해시/섹션을 기록합니다."""
+    for doc in docs:
+        # 문서 내용이 너무 짧은 경우 필터링
+        if len(doc.page_content.strip()) < min_doc_length:
+            stats["too_short"] += 1
+            continue
+
+        # 페이지 해시/lastmod 기록 (분할 시 각 청크 메타데이터로 복사됨)
+        source = doc.metadata.get("source")
+        doc.metadata["page_hash"] = compute_content_hash(doc.page_content)
+        doc.metadata["lastmod"] = lastmod_by_url.get(source)
+        doc.metadata.update(url_section_metadata(source, base_url))
+
+        # 섹션 메타데이터가 없는 기존 페이지는 내용이 같아도 통과시켜 청크 메타데이터만 갱신 (임베딩은 재사용)
+        existing_page = existing_index.get(source, {})
+        if (
+            incremental
+            and existing_page.get("page_hash") == doc.metadata["page_hash"]
+            and existing_page.get("sections") is not None
+        ):
+            stats["unchanged_pages"] += 1
+            continue
+        yield doc
+
+def iter_document_chunks(
+    docs: Iterable[Document],
+    text_splitter: RecursiveCharacterTextSplitter,
+    existing_index: Dict[str, Dict[str, Any]],
+    incremental: bool,
+    stats: Dict[str, int],
+    page_updates: Optional[PendingPageUpdates] = None,  # 증분 모드에서 기존 청크 갱신/삭제를 미뤄 둘 곳
+) -> Iterator[Document]:
+    """
+    문서를 하나씩 청크로 분할하고 청크 해시/순번/페이지 청크 수를 기록합니다.
+
+    증분 모드에서는 페이지 단위로 기존 청크와 비교하여, 내용이 같은 청크는 임베딩 없이 메타데이터만 갱신하고,
+    더 이상 없는 청크는 삭제하며, 새 청크만 다음 단계(임베딩)로 넘깁니다.
+    기존 청크의 갱신/삭제는 그 페이지의 새 청크가 모두 저장된 뒤에 실행됩니다 (PendingPageUpdates).
+    """
+    for doc in docs:
+        page_chunks = text_splitter.split_documents([doc])
+        stats["pages_split"] += 1
+        stats["chunks"] += len(page_chunks)
+
+        # 청크별 해시와 페이지 내 순번 기록
+        for chunk_index, chunk in enumerate(page_chunks):
+            chunk.metadata["chunk_index"] = chunk_index
+            chunk.metadata["chunk_hash"] = compute_content_hash(chunk.page_content)
+            chunk.metadata["page_chunk_count"] = len(page_chunks)
+
+        if not incremental:
+            yield from page_chunks
+            continue
+
+        # 변경된 페이지 안에서도 내용이 같은 청크는 임베딩을 다시 하지 않고 메타데이터만 갱신
+        source = doc.metadata.get("source")
+        remaining = {h: list(ids) for h, ids in existing_index.get(source, {}).get("chunks", {}).items()}
+        # 같은 내용의 청크가 여러 개면 id가 같은(순번도 같은) 기존 행을 먼저 재사용하여 새 청크의 id와 겹치지 않게 함
+        reused_ids: Dict[int, Any] = {}
+        for position, chunk in enumerate(page_chunks):
+            reusable_ids = remaining.get(chunk.metadata["chunk_hash"], [])
+            row_id = chunk_row_id(chunk)
+            if row_id in reusable_ids:
+                reusable_ids.remove(row_id)
+                reused_ids[position] = row_id
+        new_chunks: List[Document] = []
+        for position, chunk in enumerate(page_chunks):
+            if position in reused_ids:
+                continue
+            reusable_ids = remaining.get(chunk.metadata["chunk_hash"])
+            if reusable_ids:
+                reused_ids[position] = reusable_ids.pop()
+            else:
+                new_chunks.append(chunk)
+        metadata_updates = [(row_id, page_chunks[position].metadata) for position, row_id in sorted(reused_ids.items())]
+        stale_ids = [row_id for ids in remaining.values() for row_id in ids]
+
+        # 새 청크가 다음 단계로 넘어가기 전에 등록해야 업로드 완료를 놓치지 않음
+        page_updates.add(source, new_chunks, stale_ids, metadata_updates)
+        yield from new_chunks
+
+def publish_corpus_change(client: Any) -> None:
+    """documents 내용이 바뀌었음을 app_state에 기록합니다 (앱의 답변 캐시 무효화)."""
+    try:
+        version = publish_corpus_version(client)
+        print(f"Published corpus version {version} (app answer caches will be invalidated).")
+    except Exception as e:
+        print(f"Warning: could not publish corpus version to 'app_state' table: {e}")
+        print("Create the table with supabase_schema.sql so the app can invalidate cached answers.")
+
+def refresh_local_index(client: Any, path: str = LOCAL_INDEX_PATH) -> None:
+    """documents 테이블을 로컬 벡터 인덱스 스냅샷으로 다시 내보냅니다 (VECTOR_STORE_BACKEND=local인 앱이 사용)."""
+    try:
+        manifest = export_snapshot(client, path)
+        print(f"Exported {manifest['count']} chunks to local vector index {path} (version {manifest['version']}).")
     except Exception as e:
-        print(f"Error extracting content from {url}: {e}")
-        return None
+        print(f"Warning: could not export local vector index to {path}: {e}")
 
 def ingest_documents(
     gitbook_base_url: str,
@@ -150,34 +412,73 @@ def ingest_documents(
     chunk_size: int = 1000,
     chunk_overlap: int = 150,
     clear_existing_data: bool = False,
+    incremental: bool = False,  # 변경된 페이지만 다시 수집/임베딩 (lastmod + 내용 해시 기준)
     use_bs4_extractor: bool = True,  # BeautifulSoup 사용 여부 플래그 추가
-    request_delay: float = 0.5  # 요청 간 딜레이 (초)
-) -> None:
+    request_delay: float = 0.5,  # 요청 간 딜레이 (초) - GitbookLoader 사용 시
+    max_concurrent_requests: int = 8,  # BeautifulSoup 추출 시 동시 요청 수
+    requests_per_second: float = None,  # 호스트별 초당 최대 요청 수 (None이면 1 / request_delay)
+    embedding_batch_tokens: int = 8000,  # 임베딩 요청 한 번에 포함할 최대 토큰 수
+    embedding_concurrency: int = 4,  # 동시에 진행할 임베딩 요청 수
+    insert_batch_size: int = 100,  # upsert 한 번에 보낼 최대 행 수
+    page_queue_size: int = 32,  # 수집 단계와 분할 단계 사이 큐 크기 (페이지 수)
+    chunk_queue_size: int = 256,  # 분할 단계와 임베딩 단계 사이 큐 크기 (청크 수)
+    refresh_suggested_questions: bool = True,  # 문서가 바뀌면 앱의 추천 질문 풀을 다시 생성
+    client: Any = None,  # Supabase 클라이언트 (None이면 .env 설정으로 생성)
+    embeddings: Any = None,  # 임베딩 객체 (None이면 디스크 캐시를 쓰는 OpenAI 임베딩)
+    checkpoint: Optional[IngestCheckpoint] = None,  # None이면 기본 경로(INGEST_CHECKPOINT_FILE)의 체크포인트
+    local_index_path: Optional[str] = LOCAL_INDEX_PATH if VECTOR_STORE_BACKEND == "local" else None,  # 수집 후 로컬 인덱스 스냅샷을 내보낼 경로
+) -> Dict[str, int]:
     """
     Gitbook 문서를 로드하고 Supabase에 임베딩하여 저장합니다.
+
+    수집 → 추출 → 필터 → 분할 → 임베딩 → 저장 단계가 제너레이터로 연결되어 스트리밍으로 처리되며,
+    단계 사이의 큐 크기가 제한되어 있으므로 문서 수와 관계없이 메모리 사용량이 일정합니다.
+    client/embeddings를 넘기면 로컬 대체 구현으로 전체 파이프라인을 실행할 수 있습니다 (benchmark_e2e.py).
+
+    Returns:
+        단계별 처리 건수 (loaded, chunks, uploaded, failed 등). 중간에 종료하면 그때까지의 값
     """
     print(f"Starting ingestion for Gitbook: {gitbook_base_url}")
-    all_langchain_docs: List[Document] = []
+    if client is None:
+        client = get_supabase_client()
+    stats = Counter()
+
+    if incremental and clear_existing_data:
+        print("Incremental mode is enabled; ignoring clear_existing_data.")
+        clear_existing_data = False
+
+    # 이전 실행이 중단되었다면 체크포인트에 업로드 완료된 청크 id가 남아 있음
+    if checkpoint is None:
+        checkpoint = IngestCheckpoint()
+    if checkpoint.exists():
+        print(f"Resuming from checkpoint {checkpoint.path} ({len(checkpoint.completed_ids)} chunks already uploaded).")
+        if clear_existing_data:
+            print("Skipping clear_existing_data to keep the chunks uploaded before the interruption.")
+            clear_existing_data = False
 
     if clear_existing_data:
         print("Clearing existing documents from Supabase table 'documents'...")
         try:
-            delete_response = supabase.table("documents").delete().neq("id", -1).execute() # 모든 행 삭제
+            delete_response = client.table("documents").delete().neq("id", -1).execute() # 모든 행 삭제
             print(f"Deletion response: {delete_response}")
             print("Existing documents cleared.")
+            publish_corpus_change(client)
         except Exception as e:
             print(f"Error clearing existing documents: {e}")
 
 
     page_urls_to_load = []
+    lastmod_by_url: Dict[str, Optional[str]] = {}
     if sitemap_xml_url:
         print(f"Attempting to load document URLs from sitemap: {sitemap_xml_url}")
-        page_urls_to_load = get_urls_from_sitemap(sitemap_xml_url)
+        sitemap_entries = get_sitemap_entries(sitemap_xml_url)
+        page_urls_to_load = [entry["loc"] for entry in sitemap_entries]
+        lastmod_by_url = {entry["loc"]: entry["lastmod"] for entry in sitemap_entries}
         if not page_urls_to_load:
             print("No URLs found in sitemap or sitemap could not be processed.")
             if use_sitemap_only:
                 print("Exiting as use_sitemap_only is True and no URLs found in sitemap.")
-                return
+                return stats
     
     if not page_urls_to_load and not use_sitemap_only:
         # GitbookLoader의 자체 크롤링은 특정 Gitbook 구현에 따라 불안정할 수 있으므로
@@ -201,93 +502,94 @@ def ingest_documents(
         except Exception as e:
             print(f"Error using GitbookLoader with load_all_paths=True from {gitbook_base_url}: {e}")
     
-    if page_urls_to_load: # 사이트맵에서 가져온 URL이 있다면, 그것들을 우선적으로 로드
-        print(f"Loading content from {len(page_urls_to_load)} URLs found in sitemap...")
-        for i, page_url in enumerate(page_urls_to_load):
-            print(f"Processing URL ({i+1}/{len(page_urls_to_load)}): {page_url}")
-            
-            # 요청 간 딜레이 추가 (서버 부하 방지)
-            if i > 0:
-                sleep(request_delay)
-                
-            if use_bs4_extractor:
-                # BeautifulSoup을 사용하여 내용 추출
-                doc = extract_content_with_bs4(page_url, content_selector)
-                if doc:
-                    all_langchain_docs.append(doc)
-                    print(f"Successfully loaded content from {page_url} using BeautifulSoup")
-                else:
-                    print(f"Failed to extract content from {page_url} using BeautifulSoup")
-            else:
-                # 기존 GitbookLoader 사용
-                try:
-                    loader = GitbookLoader(
-                        web_page=page_url,
-                        load_all_paths=False, # 개별 URL 로드
-                        content_selector=content_selector,
-                        # requests_kwargs={'timeout': 20} # 타임아웃 설정
-                    )
-                    docs_from_page = loader.load()
-                    if docs_from_page:
-                        # GitbookLoader는 각 페이지를 단일 Document로 반환하는 경향이 있음
-                        # 메타데이터에 URL 등을 잘 넣어주는지 확인 필요
-                        for doc in docs_from_page: # loader.load()는 리스트를 반환
-                            if not doc.metadata.get("source"): # source가 없다면 채워줌
-                                doc.metadata["source"] = page_url
-                        all_langchain_docs.extend(docs_from_page)
-                        print(f"Successfully loaded content from {page_url} using GitbookLoader. Documents added: {len(docs_from_page)}")
-                    else:
-                        print(f"No content loaded from {page_url} using GitbookLoader.")
-                except Exception as e:
-                    print(f"Error loading content from {page_url} using GitbookLoader: {e}")
-                    continue
-    
-    if not all_langchain_docs:
-        print("No documents were loaded. Exiting.")
-        return
+    existing_index: Dict[str, Dict[str, Any]] = {}
+    corpus_changed = False  # documents 내용이 바뀌면 앱의 답변 캐시를 무효화해야 함
+    if incremental:
+        print("Incremental mode: loading existing page/chunk hashes from Supabase...")
+        try:
+            existing_index = load_existing_page_index(client)
+        except Exception as e:
+            print(f"Error loading existing page index: {e}")
+            return stats
+        print(f"Found {len(existing_index)} pages already stored.")
 
-    print(f"Total documents loaded before splitting: {len(all_langchain_docs)}")
+        if page_urls_to_load:
+            # 사이트맵에서 사라진 페이지의 청크 삭제
+            removed_sources = [source for source in existing_index if source not in lastmod_by_url]
+            if removed_sources:
+                removed_ids = [row_id for source in removed_sources for ids in existing_index[source]["chunks"].values() for row_id in ids]
+                print(f"Deleting {len(removed_ids)} chunks of {len(removed_sources)} pages removed from the sitemap...")
+                delete_document_rows(client, removed_ids)
+                corpus_changed = True
 
-    # 문서 내용이 너무 짧은 경우 필터링 (선택 사항)
-    min_doc_length = 30 # 최소 문서 길이 (글자 수)
-    filtered_docs = [doc for doc in all_langchain_docs if len(doc.page_content.strip()) >= min_doc_length]
-    if len(filtered_docs) < len(all_langchain_docs):
-        print(f"Filtered out {len(all_langchain_docs) - len(filtered_docs)} short or empty documents.")
-    
-    if not filtered_docs:
-        print("No documents remaining after filtering. Exiting.")
-        return
+            # lastmod가 저장된 값과 같은 페이지는 다시 가져오지 않음 (섹션 메타데이터가 없는 이전 형식은 제외)
+            unchanged_urls = {
+                url for url in page_urls_to_load
+                if lastmod_by_url.get(url)
+                and existing_index.get(url, {}).get("page_hash")
+                and existing_index[url]["sections"] is not None
+                and existing_index[url]["lastmod"] == lastmod_by_url[url]
+            }
+            if unchanged_urls:
+                print(f"Skipping {len(unchanged_urls)} pages whose sitemap lastmod is unchanged.")
+                page_urls_to_load = [url for url in page_urls_to_load if url not in unchanged_urls]
+            if not page_urls_to_load:
+                print("No changed pages to ingest. Exiting.")
+                if corpus_changed:
+                    publish_corpus_change(client)
+                if local_index_path and (corpus_changed or not snapshot_exists(local_index_path)):
+                    refresh_local_index(client, local_index_path)
+                return stats
+
+    if not page_urls_to_load:
+        print("No documents were loaded. Exiting.")
+        return stats
+
+    # 임베딩 모델 초기화 (첫 청크가 도착하는 즉시 임베딩할 수 있도록 미리 준비)
+    if embeddings is None:
+        print("Initializing OpenAI embeddings (with on-disk embedding cache)...")
+        try:
+            embeddings = create_cached_embeddings(OPENAI_API_KEY)
+        except Exception as e:
+            print(f"Error initializing OpenAI embeddings: {e}")
+            return stats
 
-    # 2. 문서 분할
-    print(f"Splitting {len(filtered_docs)} documents into chunks...")
     text_splitter = RecursiveCharacterTextSplitter(
         chunk_size=chunk_size,
         chunk_overlap=chunk_overlap,
         separators=["\n\n", "\n", ". ", " ", ""],
         length_function=len,
     )
-    documents_chunks = text_splitter.split_documents(filtered_docs)
-    print(f"Split into {len(documents_chunks)} chunks.")
 
-    if not documents_chunks:
-        print("No chunks to process. Exiting.")
-        return
-
-    # 3. 임베딩 모델 초기화
-    print("Initializing OpenAI embeddings...")
-    try:
-        embeddings = OpenAIEmbeddings(openai_api_key=OPENAI_API_KEY)
-    except Exception as e:
-        print(f"Error initializing OpenAI embeddings: {e}")
-        return
+    # 수집 → 추출 → 필터 → 분할 → 임베딩 → 저장 스트리밍 파이프라인
+    # 단계 사이의 bounded_stage 큐가 가득 차면 상위 단계가 대기하므로 메모리 사용량이 제한됨
+    loaded_docs = iter_loaded_documents(
+        page_urls_to_load,
+        content_selector,
+        use_bs4_extractor,
+        request_delay,
+        max_concurrent_requests,
+        requests_per_second,
+        stats,
+    )
+    filtered_docs = bounded_stage(
+        iter_filtered_documents(loaded_docs, lastmod_by_url, existing_index, incremental, stats, base_url=gitbook_base_url),
+        maxsize=page_queue_size,
+        name="ingest-fetch",
+    )
+    page_updates = PendingPageUpdates(client, stats) if incremental else None
+    document_chunks = bounded_stage(
+        iter_document_chunks(filtered_docs, text_splitter, existing_index, incremental, stats, page_updates),
+        maxsize=chunk_queue_size,
+        name="ingest-split",
+    )
 
-    # 4. Supabase Vector Store에 저장
-    print(f"Storing {len(documents_chunks)} chunks/embeddings in Supabase...")
+    print(f"Streaming {len(page_urls_to_load)} pages through fetch → split → embed → upsert...")
     try:
         # 테이블이 이미 존재하는지 확인하고, 테이블 구조가 일치하지 않으면 테이블을 재생성
         try:
             # 테이블 구조 확인 전에 테이블 존재 여부 먼저 확인
-            table_check = supabase.table("documents").select("id").limit(1).execute()
+            table_check = client.table("documents").select("id").limit(1).execute()
             print("Existing 'documents' table found.")
         except Exception as table_err:
             print(f"Error checking documents table: {table_err}")
@@ -302,16 +604,52 @@ def ingest_documents(
             except Exception as create_err:
                 print(f"Error creating table: {create_err}")
         
-        # SupabaseVectorStore로 문서 저장
-        vector_store = SupabaseVectorStore.from_documents(
-            documents=documents_chunks,
-            embedding=embeddings,
-            client=supabase,
+        # 토큰 기준 배치로 동시에 임베딩하고, 배치 단위로 upsert (진행 상황은 체크포인트에 기록)
+        summary = embed_and_upload(
+            document_chunks,
+            embeddings,
+            client,
             table_name="documents",
-            query_name="match_documents", # 이 함수는 검색 시 사용됨, 저장 시에는 직접 사용되지 않음
-            # 주의: Supabase 테이블 스키마가 변경되면 이 부분도 업데이트 필요
+            max_tokens_per_batch=embedding_batch_tokens,
+            embedding_concurrency=embedding_concurrency,
+            insert_batch_size=insert_batch_size,
+            checkpoint=checkpoint,
+            on_uploaded=page_updates.mark_uploaded if page_updates else None,
         )
-        print("Ingestion complete! All chunks stored in Supabase.")
+        print(f"Documents loaded: {stats['loaded']}, filtered out as too short: {stats['too_short']}, unchanged pages skipped: {stats['unchanged_pages']}")
+        print(f"Pages split: {stats['pages_split']} into {stats['chunks']} chunks (reused: {stats['reused_chunks']}, stale deleted: {stats['stale_chunks']})")
+        stats.update({key: summary[key] for key in ("uploaded", "skipped", "failed")})
+        if hasattr(embeddings, "stats"):
+            print(f"Embedding cache stats: {embeddings.stats()}")
+        print(f"OpenAI client stats: {client_metrics()}")
+        # 재사용 청크의 메타데이터 갱신(섹션 보강 등)도 검색 필터 결과를 바꾸므로 문서 변경으로 취급
+        documents_changed = corpus_changed or summary["uploaded"] or stats["stale_chunks"] or stats["reused_chunks"]
+        if documents_changed:
+            publish_corpus_change(client)
+        # 스냅샷에 새 corpus_version이 기록되도록 버전을 먼저 갱신한 뒤 내보냄
+        if local_index_path and (documents_changed or not snapshot_exists(local_index_path)):
+            refresh_local_index(client, local_index_path)
+        if documents_changed:
+            if refresh_suggested_questions:
+                print("Refreshing the suggested question pool...")
+                try:
+                    llm = create_routed_chat_model("question_pool", OPENAI_API_KEY)
+                    refresh_question_pool(client, embeddings, llm)
+                except Exception as e:
+                    print(f"Error refreshing suggested questions: {e}")
+        if not stats["loaded"]:
+            print("No documents were loaded.")
+        unfinished_pages = page_updates.unfinished_pages() + stats["failed_pages"] if page_updates else 0
+        if summary["failed"] or unfinished_pages:
+            if incremental:
+                # 페이지의 기존 행은 새 청크가 모두 저장된 뒤에만 갱신되므로, 다시 실행하면 이 페이지들을 변경된 것으로 보고 다시 처리함
+                print(f"{summary['failed']} chunks failed and {unfinished_pages} pages were not fully updated (their previous rows are kept). "
+                      "Run the script again to re-ingest those pages; chunks already stored are reused without re-embedding.")
+            else:
+                print(f"{summary['failed']} chunks failed. Run the script again to resume from the checkpoint.")
+        else:
+            checkpoint.clear()
+            print(f"Ingestion complete! {summary['uploaded']} chunks stored in Supabase ({summary['skipped']} resumed from checkpoint).")
     except Exception as e:
         print(f"Error during Supabase ingestion: {e}")
         print("\n가능한 원인:")
@@ -324,8 +662,12 @@ def ingest_documents(
         print("2. pgvector 확장이 활성화되어 있는지 확인하세요.")
         print("3. 테이블 권한 설정을 확인하세요.")
         print("4. 기존 테이블을 삭제하고 새로 생성하는 것이 가장 확실한 해결책입니다.")
+    return stats
 
 if __name__ == "__main__":
+    check_required_env(["OPENAI_API_KEY", "SUPABASE_URL", "SUPABASE_ANON_KEY"])
+    get_supabase_client()
+
     TARGET_GITBOOK_BASE_URL = "https://docs.fe-ta.com/"
     SITEMAP_XML_URL = "https://docs.fe-ta.com/sitemap-pages.xml"
     
@@ -337,21 +679,31 @@ if __name__ == "__main__":
 
     # True로 설정하면, 스크립트 실행 시 Supabase의 'documents' 테이블 내용이 모두 삭제된 후 새로 추가됩니다.
     # False로 설정하면, 기존 데이터는 유지되고 새로운 데이터가 추가됩니다 (중복 가능성 있음).
-    # 첫 실행 시 또는 전체 갱신 시 True, 부분 추가 시 False (단, 중복 처리 로직은 현재 없음)
-    CLEAR_EXISTING_DATA_ON_INGEST = True
+    # 전체 갱신이 필요할 때만 True (INCREMENTAL_INGEST가 True이면 무시됨)
+    CLEAR_EXISTING_DATA_ON_INGEST = False
+
+    # True로 설정하면, 사이트맵 lastmod와 페이지/청크 내용 해시를 비교하여
+    # 변경된 페이지만 다시 가져오고, 바뀐 청크만 임베딩/저장하며, 사이트맵에서 사라진 페이지의 청크는 삭제합니다.
+    INCREMENTAL_INGEST = True
     
     # BeautifulSoup 추출 기능 사용 여부 (GitbookLoader가 작동하지 않을 때 True로 설정)
     USE_BS4_EXTRACTOR = True
     
-    # 웹 요청 간 딜레이 (초) - 서버 부하 방지를 위해
+    # 웹 요청 간 딜레이 (초) - 서버 부하 방지를 위해 (GitbookLoader 사용 시)
     REQUEST_DELAY = 1.0
 
+    # BeautifulSoup 추출 시 동시 요청 수와 호스트별 초당 최대 요청 수
+    MAX_CONCURRENT_REQUESTS = 8
+    REQUESTS_PER_SECOND = 4.0
+
     print(f"Target GitBook URL: {TARGET_GITBOOK_BASE_URL}")
     print(f"Sitemap URL: {SITEMAP_XML_URL}")
     print(f"Content Selector: {CONTENT_SELECTOR_FOR_FETA}")
     print(f"Clear existing data: {CLEAR_EXISTING_DATA_ON_INGEST}")
+    print(f"Incremental ingest: {INCREMENTAL_INGEST}")
     print(f"Using BeautifulSoup extractor: {USE_BS4_EXTRACTOR}")
     print(f"Request delay: {REQUEST_DELAY} seconds")
+    print(f"Concurrent requests: {MAX_CONCURRENT_REQUESTS} (max {REQUESTS_PER_SECOND} requests/sec)")
 
     user_confirm = input("Proceed with ingestion? (yes/no): ")
     if user_confirm.lower() == 'yes':
@@ -361,8 +713,11 @@ if __name__ == "__main__":
             use_sitemap_only=True, # 사이트맵이 정확하다면 True 권장
             content_selector=CONTENT_SELECTOR_FOR_FETA,
             clear_existing_data=CLEAR_EXISTING_DATA_ON_INGEST,
+            incremental=INCREMENTAL_INGEST,
             use_bs4_extractor=USE_BS4_EXTRACTOR,
-            request_delay=REQUEST_DELAY
+            request_delay=REQUEST_DELAY,
+            max_concurrent_requests=MAX_CONCURRENT_REQUESTS,
+            requests_per_second=REQUESTS_PER_SECOND
         )
     else:
         print("Ingestion cancelled by user.")
\ No newline at end of file
@@ -0,0 +1,263 @@
+"""
+청크 임베딩 및 Supabase 업로드 단계입니다.
+
+- 토큰 수 기준으로 청크를 배치로 묶어 (tiktoken) 여러 배치를 동시에 임베딩합니다.
+- 임베딩된 행은 지정한 크기의 배치로 'documents' 테이블에 upsert합니다.
+- 청크 id는 (source, chunk_index, chunk_hash)로부터 결정적으로 만들어지므로 재실행해도 중복 행이 생기지 않습니다.
+- 업로드가 끝난 청크 id를 체크포인트 파일에 기록하여, 중단된 수집을 이어서 진행할 수 있습니다.
+- bounded_stage로 단계 사이에 크기가 제한된 큐를 두어, 수집 전체를 스트리밍으로 처리합니다.
+"""
+
+import json
+import os
+import queue
+import random
+import threading
+import time
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Set
+
+import tiktoken
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+INGEST_CHECKPOINT_FILE = os.getenv("INGEST_CHECKPOINT_FILE", ".ingest_checkpoint.jsonl")
+
+# 청크 id 생성용 네임스페이스 (값 자체는 의미 없음, 바뀌면 모든 id가 바뀌므로 고정)
+CHUNK_ID_NAMESPACE = uuid.UUID("6f1c1d7e-8a4b-4c1e-9a53-2f0e0b1d7c21")
+
+_encoding = None
+
+# bounded_stage에서 상위 단계의 종료를 알리는 표식
+_STAGE_DONE = object()
+
+
+def count_tokens(text: str) -> int:
+    """
+    OpenAI 임베딩 모델 기준(cl100k_base) 토큰 수를 계산합니다.
+
+    인코딩 파일을 내려받을 수 없는 환경(오프라인)에서는 글자 수 기반의 보수적인 추정치를 사용합니다.
+    """
+    global _encoding
+    if _encoding is None:
+        try:
+            _encoding = tiktoken.get_encoding("cl100k_base")
+        except Exception as e:
+            print(f"tiktoken encoding unavailable ({e}); estimating tokens from character count.")
+            _encoding = False
+    if _encoding is False:
+        return len(text)  # 한글은 대략 글자당 1토큰 이상이므로 글자 수를 상한으로 사용
+    return len(_encoding.encode(text, disallowed_special=()))
+
+
+def chunk_row_id(chunk: Document) -> str:
+    """청크의 source, chunk_index, chunk_hash로 결정적인 UUID를 만듭니다."""
+    metadata = chunk.metadata
+    key = f"{metadata.get('source')}|{metadata.get('chunk_index')}|{metadata.get('chunk_hash')}"
+    return str(uuid.uuid5(CHUNK_ID_NAMESPACE, key))
+
+
+def batch_chunks_by_tokens(
+    chunks: Iterable[Document],
+    max_tokens_per_batch: int = 8000,
+    max_batch_size: int = 256,
+) -> Iterator[List[Document]]:
+    """토큰 합계가 max_tokens_per_batch, 개수가 max_batch_size를 넘지 않도록 청크를 묶습니다."""
+    batch: List[Document] = []
+    batch_tokens = 0
+    for chunk in chunks:
+        tokens = count_tokens(chunk.page_content)
+        if batch and (batch_tokens + tokens > max_tokens_per_batch or len(batch) >= max_batch_size):
+            yield batch
+            batch, batch_tokens = [], 0
+        batch.append(chunk)
+        batch_tokens += tokens
+    if batch:
+        yield batch
+
+
+class IngestCheckpoint:
+    """
+    업로드가 끝난 청크 id를 추가 전용(append-only) 파일에 기록합니다.
+
+    배치마다 id 목록 한 줄(JSON)을 덧붙이므로 기록 비용은 배치 크기에 비례하며,
+    중단 시 마지막 줄이 잘려 있으면 해당 줄만 무시합니다.
+    체크포인트는 청크 단위로만 기록하므로, 증분 수집에서 페이지가 끝까지 반영되었는지는
+    documents 행의 page_hash/lastmod/page_chunk_count로 판단합니다 (ingest_gitbook.load_existing_page_index).
+    """
+
+    def __init__(self, path: str = INGEST_CHECKPOINT_FILE):
+        self.path = path
+        self.completed_ids: Set[str] = set()
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        self.completed_ids.update(json.loads(line))
+                    except ValueError:
+                        continue  # 기록 도중 중단된 마지막 줄
+
+    def exists(self) -> bool:
+        return bool(self.completed_ids)
+
+    def mark_done(self, row_ids: Iterable[str]) -> None:
+        row_ids = list(row_ids)
+        self.completed_ids.update(row_ids)
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(row_ids) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def clear(self) -> None:
+        self.completed_ids = set()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def _with_retries(fn, description: str, max_retries: int = 3, backoff_base: float = 1.0):
+    """fn을 실행하고, 실패하면 지터가 포함된 지수 백오프로 재시도합니다."""
+    for attempt in range(max_retries + 1):
+        try:
+            return fn()
+        except Exception as e:
+            if attempt >= max_retries:
+                raise
+            delay = backoff_base * (2 ** attempt) + random.uniform(0, backoff_base)
+            print(f"{description} failed ({e}); retrying in {delay:.1f}s ({attempt + 1}/{max_retries})")
+            time.sleep(delay)
+
+
+def upsert_rows(client: Any, rows: List[Dict[str, Any]], table_name: str = "documents", batch_size: int = 100, max_retries: int = 3) -> None:
+    """행들을 batch_size 단위로 테이블에 upsert합니다."""
+    for i in range(0, len(rows), batch_size):
+        batch = rows[i:i + batch_size]
+        _with_retries(
+            lambda: client.table(table_name).upsert(batch).execute(),
+            f"Upserting rows {i}-{i + len(batch)}",
+            max_retries,
+        )
+
+
+def bounded_stage(items: Iterable[Any], maxsize: int = 64, name: str = "ingest-stage") -> Iterator[Any]:
+    """
+    상위 단계(items)를 별도 스레드에서 실행하고, 크기가 제한된 큐를 통해 결과를 전달합니다.
+
+    하위 단계가 느리면 큐가 가득 차서 상위 단계가 멈추므로(backpressure),
+    단계들은 동시에 진행되면서도 메모리에는 최대 maxsize개 항목만 쌓입니다.
+    상위 단계에서 발생한 예외는 하위 단계에서 다시 발생합니다.
+    """
+    stage_queue: "queue.Queue[Any]" = queue.Queue(maxsize=maxsize)
+    errors: List[BaseException] = []
+
+    def produce():
+        try:
+            for item in items:
+                stage_queue.put(item)
+        except BaseException as e:
+            errors.append(e)
+        finally:
+            stage_queue.put(_STAGE_DONE)
+
+    threading.Thread(target=produce, name=name, daemon=True).start()
+    while True:
+        item = stage_queue.get()
+        if item is _STAGE_DONE:
+            break
+        yield item
+    if errors:
+        raise errors[0]
+
+
+def embed_and_upload(
+    chunks: Iterable[Document],
+    embeddings: Embeddings,
+    client: Any,
+    table_name: str = "documents",
+    max_tokens_per_batch: int = 8000,
+    embedding_concurrency: int = 4,
+    insert_batch_size: int = 100,
+    max_retries: int = 3,
+    checkpoint: Optional[IngestCheckpoint] = None,
+    on_uploaded: Optional[Callable[[List[Document]], None]] = None,
+) -> Dict[str, int]:
+    """
+    청크를 토큰 기준 배치로 동시에 임베딩하고, 완료되는 대로 테이블에 배치 upsert합니다.
+
+    chunks는 제너레이터여도 되며, 동시에 진행 중인 배치는 최대 embedding_concurrency * 2개로 제한되므로
+    전체 청크를 메모리에 올리지 않고 도착하는 대로 저장합니다.
+
+    Args:
+        chunks: 저장할 청크 (metadata에 source/chunk_index/chunk_hash 포함)
+        embeddings: 임베딩 객체 (CachedEmbeddings 권장)
+        client: Supabase 클라이언트
+        table_name: 저장할 테이블 이름
+        max_tokens_per_batch: 임베딩 요청 한 번에 포함할 최대 토큰 수
+        embedding_concurrency: 동시에 진행할 임베딩 요청 수
+        insert_batch_size: upsert 한 번에 보낼 최대 행 수
+        max_retries: 배치별 최대 재시도 횟수
+        checkpoint: 업로드 완료 id를 기록할 체크포인트 (None이면 기록하지 않음)
+        on_uploaded: 청크가 저장된 뒤(체크포인트로 건너뛴 청크 포함) 그 청크 목록으로 호출할 함수
+
+    Returns:
+        {"uploaded": ..., "skipped": ..., "failed": ...} 청크 수 요약
+    """
+    completed = checkpoint.completed_ids if checkpoint else set()
+    summary = {"uploaded": 0, "skipped": 0, "failed": 0}
+
+    def pending_chunks() -> Iterator[Document]:
+        for chunk in chunks:
+            if chunk_row_id(chunk) in completed:
+                summary["skipped"] += 1
+                if on_uploaded:
+                    on_uploaded([chunk])
+            else:
+                yield chunk
+
+    def embed_batch(batch: List[Document]) -> List[List[float]]:
+        return _with_retries(
+            lambda: embeddings.embed_documents([chunk.page_content for chunk in batch]),
+            f"Embedding batch of {len(batch)} chunks",
+            max_retries,
+        )
+
+    def upload_embedded(future, batch: List[Document]) -> None:
+        try:
+            vectors = future.result()
+            rows = [
+                {
+                    "id": chunk_row_id(chunk),
+                    "content": chunk.page_content,
+                    "metadata": chunk.metadata,
+                    "embedding": vector,
+                }
+                for chunk, vector in zip(batch, vectors)
+            ]
+            upsert_rows(client, rows, table_name, insert_batch_size, max_retries)
+            if checkpoint:
+                checkpoint.mark_done(row["id"] for row in rows)
+            summary["uploaded"] += len(rows)
+            print(f"Uploaded {summary['uploaded']} chunks so far")
+        except Exception as e:
+            summary["failed"] += len(batch)
+            print(f"Error embedding/uploading batch of {len(batch)} chunks: {e}")
+            return
+        if on_uploaded:
+            on_uploaded(batch)
+
+    print(f"Embedding chunks in batches of up to {max_tokens_per_batch} tokens ({embedding_concurrency} concurrent)...")
+    max_in_flight = embedding_concurrency * 2
+    with ThreadPoolExecutor(max_workers=embedding_concurrency, thread_name_prefix="embed") as executor:
+        in_flight: Dict[Any, List[Document]] = {}
+        for batch in batch_chunks_by_tokens(pending_chunks(), max_tokens_per_batch):
+            in_flight[executor.submit(embed_batch, batch)] = batch
+            if len(in_flight) >= max_in_flight:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    upload_embedded(future, in_flight.pop(future))
+        for future in as_completed(in_flight):
+            upload_embedded(future, in_flight[future])
+
+    if summary["skipped"]:
+        print(f"Skipped {summary['skipped']} chunks already uploaded according to the checkpoint.")
+    return summary
@@ -0,0 +1,14 @@
+"""
+벤치마크 스크립트가 함께 쓰는 지연 시간 통계 함수입니다.
+
+데이터베이스 드라이버(psycopg2)나 외부 서비스에 의존하지 않으므로 오프라인 벤치마크에서도 import할 수 있습니다.
+"""
+
+from typing import Sequence
+
+
+def percentile(values: Sequence[float], pct: float) -> float:
+    """가장 가까운 순위(nearest-rank) 방식의 백분위수 (values는 비어 있지 않아야 함)."""
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
@@ -0,0 +1,485 @@
+#!/usr/bin/env python
+"""
+Supabase 대신 프로세스 메모리에서 검색하는 로컬 벡터 인덱스입니다 (VECTOR_STORE_BACKEND=local).
+
+- documents 테이블을 스냅샷 파일(정규화된 float32 임베딩 행렬 .npy + 행 JSONL + manifest.json)로 내보내고,
+  앱은 이 스냅샷을 (기본적으로 메모리 맵으로) 읽어 NumPy 행렬 곱 한 번으로 코사인 top-k를 계산합니다.
+- hnswlib이 설치되어 있고 LOCAL_INDEX_HNSW=true이면 내보낼 때 HNSW 인덱스도 만들어 근사 검색에 사용합니다.
+  (섹션 필터가 있는 검색은 해당 섹션 행만 정확 검색)
+- LocalIndexClient는 match_documents / hybrid_match_documents / list_document_sections RPC를 흉내 내므로
+  TunedSupabaseVectorStore, HybridSupabaseRetriever에 Supabase 클라이언트 대신 그대로 전달할 수 있습니다.
+- 수집(ingest_gitbook.py)이 끝나면 스냅샷을 다시 내보내며, 앱은 manifest가 바뀐 것을 감지해 새 스냅샷으로 교체합니다.
+
+사용 예:
+    python local_vector_index.py export            # Supabase documents → 스냅샷
+    python local_vector_index.py bench --queries 200 # 스냅샷 검색 지연 시간 (정확 검색 / HNSW)
+"""
+
+import argparse
+import datetime
+import json
+import math
+import os
+import threading
+import time
+import uuid
+from collections import Counter
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from reranker import lexical_terms
+
+# 검색 백엔드: supabase (match_documents RPC) 또는 local (이 모듈의 스냅샷 인덱스)
+VECTOR_STORE_BACKEND = os.getenv("VECTOR_STORE_BACKEND", "supabase").lower()
+LOCAL_INDEX_PATH = os.getenv("LOCAL_INDEX_PATH", "local_index")
+LOCAL_INDEX_MMAP = os.getenv("LOCAL_INDEX_MMAP", "true").lower() in ("1", "true", "yes")
+LOCAL_INDEX_HNSW = os.getenv("LOCAL_INDEX_HNSW", "false").lower() in ("1", "true", "yes")
+LOCAL_INDEX_EF_SEARCH = int(os.getenv("LOCAL_INDEX_EF_SEARCH", "64"))
+# 앱이 스냅샷 교체(manifest 변경)를 확인하는 간격 (초)
+LOCAL_INDEX_RELOAD_SECONDS = float(os.getenv("LOCAL_INDEX_RELOAD_SECONDS", "60"))
+
+MANIFEST_FILE = "manifest.json"
+
+
+def jsonb_contains(value: Any, pattern: Any) -> bool:
+    """Postgres JSONB의 value @> pattern."""
+    if isinstance(pattern, dict):
+        return isinstance(value, dict) and all(key in value and jsonb_contains(value[key], sub) for key, sub in pattern.items())
+    if isinstance(pattern, list):
+        return isinstance(value, list) and all(any(jsonb_contains(item, sub) for item in value) for sub in pattern)
+    return value == pattern
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """행별 단위 벡터 (내적 = 코사인 유사도)."""
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return (matrix / np.where(norms == 0, 1, norms)).astype(np.float32, copy=False)
+
+
+def parse_embedding(value: Any) -> np.ndarray:
+    """PostgREST가 문자열("[0.1,...]")로 돌려주는 pgvector 값도 float32 배열로 변환합니다."""
+    if isinstance(value, str):
+        value = json.loads(value)
+    return np.asarray(value, dtype=np.float32)
+
+
+def _load_hnswlib():
+    try:
+        import hnswlib
+    except ImportError:
+        return None
+    return hnswlib
+
+
+class QueryResponse:
+    """postgrest 응답처럼 data와 count를 가진 결과."""
+
+    def __init__(self, data: List[Dict[str, Any]], count: Optional[int] = None):
+        self.data = data
+        self.count = count
+
+
+class RpcCall:
+    """rpc()가 반환하는 객체 (execute()로 실행)."""
+
+    def __init__(self, run):
+        self._run = run
+        self.params = None
+
+    def execute(self) -> QueryResponse:
+        return QueryResponse(self._run())
+
+
+class LexicalIndex:
+    """글자 bigram BM25용 역색인 (hybrid_match_documents의 전문 검색 대신 사용)."""
+
+    def __init__(self, texts: List[str], k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        postings: Dict[str, Tuple[List[int], List[int]]] = {}
+        lengths = np.zeros(len(texts), dtype=np.float32)
+        for row, text in enumerate(texts):
+            terms = Counter(lexical_terms(text))
+            lengths[row] = sum(terms.values())
+            for term, frequency in terms.items():
+                rows, frequencies = postings.setdefault(term, ([], []))
+                rows.append(row)
+                frequencies.append(frequency)
+        self.postings = {
+            term: (np.asarray(rows, dtype=np.int64), np.asarray(frequencies, dtype=np.float32))
+            for term, (rows, frequencies) in postings.items()
+        }
+        self.size = len(texts)
+        self.length_norm = 1 - b + b * lengths / (lengths.mean() or 1.0) if len(texts) else lengths
+
+    def scores(self, query: str) -> np.ndarray:
+        scores = np.zeros(self.size, dtype=np.float32)
+        for term in set(lexical_terms(query)):
+            if term not in self.postings:
+                continue
+            rows, frequencies = self.postings[term]
+            idf = math.log(1 + (self.size - len(rows) + 0.5) / (len(rows) + 0.5))
+            scores[rows] += idf * frequencies * (self.k1 + 1) / (frequencies + self.k1 * self.length_norm[rows])
+        return scores
+
+
+class LocalVectorIndex:
+    """정규화된 임베딩 행렬과 행(id, content, metadata)으로 검색하는 인덱스 (읽기 전용, 스레드 안전)."""
+
+    def __init__(self, rows: List[Dict[str, Any]], matrix: np.ndarray, hnsw: Any = None, version: Optional[str] = None):
+        if len(rows) != len(matrix):
+            raise ValueError(f"행 수({len(rows)})와 임베딩 수({len(matrix)})가 다릅니다.")
+        self.rows = rows
+        self.matrix = matrix
+        self.hnsw = hnsw
+        self.version = version
+        self._lock = threading.Lock()
+        self._filter_masks: Dict[str, np.ndarray] = {}
+        self._lexical: Optional[LexicalIndex] = None
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    @classmethod
+    def from_rows(cls, rows: List[Dict[str, Any]]) -> "LocalVectorIndex":
+        """embedding 컬럼이 있는 행 목록으로 만듭니다 (임베딩이 없는 행은 제외)."""
+        rows = [row for row in rows if row.get("embedding") is not None]
+        if not rows:
+            return cls([], np.zeros((0, 0), dtype=np.float32))
+        matrix = normalize_rows(np.stack([parse_embedding(row["embedding"]) for row in rows]))
+        return cls([{key: row.get(key) for key in ("id", "content", "metadata")} for row in rows], matrix)
+
+    @classmethod
+    def load(cls, path: str = LOCAL_INDEX_PATH, mmap: bool = LOCAL_INDEX_MMAP, use_hnsw: bool = LOCAL_INDEX_HNSW) -> "LocalVectorIndex":
+        """스냅샷을 읽습니다. mmap이면 임베딩 행렬을 메모리 맵으로 열어 필요한 부분만 읽습니다."""
+        with open(os.path.join(path, MANIFEST_FILE), "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        matrix = np.load(os.path.join(path, manifest["embeddings_file"]), mmap_mode="r" if mmap else None)
+        with open(os.path.join(path, manifest["rows_file"]), "r", encoding="utf-8") as f:
+            rows = [json.loads(line) for line in f if line.strip()]
+
+        hnsw = None
+        if use_hnsw and manifest.get("hnsw_file"):
+            hnswlib = _load_hnswlib()
+            if hnswlib is None:
+                print("hnswlib이 설치되어 있지 않아 정확 검색을 사용합니다.")
+            else:
+                hnsw = hnswlib.Index(space="ip", dim=int(manifest["dim"]))
+                hnsw.load_index(os.path.join(path, manifest["hnsw_file"]), max_elements=len(rows))
+                hnsw.set_ef(LOCAL_INDEX_EF_SEARCH)
+        return cls(rows, matrix, hnsw, manifest.get("version"))
+
+    def save(self, path: str = LOCAL_INDEX_PATH, build_hnsw: bool = LOCAL_INDEX_HNSW, **manifest_extra: Any) -> Dict[str, Any]:
+        """
+        스냅샷을 저장하고 manifest를 반환합니다.
+
+        파일 이름에 버전을 붙여 새 파일을 모두 쓴 뒤 manifest를 원자적으로 바꾸므로,
+        읽는 쪽은 항상 완성된 스냅샷만 봅니다. 이전 버전 파일은 교체 후 삭제합니다.
+        """
+        os.makedirs(path, exist_ok=True)
+        version = uuid.uuid4().hex[:12]
+        manifest: Dict[str, Any] = {
+            "version": version,
+            "count": len(self.rows),
+            "dim": int(self.matrix.shape[1]) if len(self.rows) else 0,
+            "embeddings_file": f"embeddings-{version}.npy",
+            "rows_file": f"rows-{version}.jsonl",
+            "created_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            **manifest_extra,
+        }
+        np.save(os.path.join(path, manifest["embeddings_file"]), np.ascontiguousarray(self.matrix, dtype=np.float32))
+        with open(os.path.join(path, manifest["rows_file"]), "w", encoding="utf-8") as f:
+            for row in self.rows:
+                f.write(json.dumps(row, ensure_ascii=False) + "\n")
+
+        if build_hnsw and len(self.rows):
+            hnswlib = _load_hnswlib()
+            if hnswlib is None:
+                print("hnswlib이 설치되어 있지 않아 HNSW 인덱스를 만들지 않습니다 (pip install hnswlib).")
+            else:
+                # 정규화된 벡터의 내적 = 코사인 유사도
+                index = hnswlib.Index(space="ip", dim=manifest["dim"])
+                index.init_index(max_elements=len(self.rows), ef_construction=200, M=16)
+                index.add_items(np.asarray(self.matrix), np.arange(len(self.rows)))
+                manifest["hnsw_file"] = f"hnsw-{version}.bin"
+                index.save_index(os.path.join(path, manifest["hnsw_file"]))
+
+        manifest_path = os.path.join(path, MANIFEST_FILE)
+        with open(manifest_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        os.replace(manifest_path + ".tmp", manifest_path)
+
+        # 이전 버전 파일 정리 (이미 메모리 맵으로 연 프로세스는 삭제된 파일을 계속 읽을 수 있음)
+        current = {manifest["embeddings_file"], manifest["rows_file"], manifest.get("hnsw_file")}
+        for name in os.listdir(path):
+            if name.startswith(("embeddings-", "rows-", "hnsw-")) and name not in current:
+                os.remove(os.path.join(path, name))
+        self.version = version
+        return manifest
+
+    def _filter_mask(self, filter: Optional[Dict[str, Any]]) -> Optional[np.ndarray]:
+        """metadata @> filter인 행의 마스크 (필터별로 한 번만 계산). 필터가 없으면 None."""
+        if not filter:
+            return None
+        key = json.dumps(filter, sort_keys=True, ensure_ascii=False)
+        with self._lock:
+            mask = self._filter_masks.get(key)
+            if mask is None:
+                mask = np.fromiter((jsonb_contains(row.get("metadata") or {}, filter) for row in self.rows), dtype=bool, count=len(self.rows))
+                self._filter_masks[key] = mask
+        return mask
+
+    def search(self, query_embedding: List[float], k: int, filter: Optional[Dict[str, Any]] = None) -> List[Tuple[int, float]]:
+        """코사인 유사도 상위 k개 (행 번호, 유사도)를 유사도 순으로 반환합니다."""
+        if not self.rows or k <= 0:
+            return []
+        query = np.asarray(query_embedding, dtype=np.float32)
+        query = query / (np.linalg.norm(query) or 1.0)
+        mask = self._filter_mask(filter)
+
+        # HNSW는 ef_search보다 많은 결과를 보장하지 않으므로 k가 더 크면 정확 검색
+        if self.hnsw is not None and mask is None and k <= LOCAL_INDEX_EF_SEARCH:
+            labels, distances = self.hnsw.knn_query(query, k=min(k, len(self.rows)))
+            return [(int(label), float(1 - distance)) for label, distance in zip(labels[0], distances[0])]
+
+        if mask is None:
+            candidates = None
+            similarities = self.matrix @ query
+        else:
+            candidates = np.flatnonzero(mask)
+            if not len(candidates):
+                return []
+            similarities = self.matrix[candidates] @ query
+        k = min(k, len(similarities))
+        top = np.argpartition(-similarities, k - 1)[:k]
+        top = top[np.argsort(-similarities[top])]
+        rows = top if candidates is None else candidates[top]
+        return [(int(row), float(similarities[index])) for row, index in zip(rows, top)]
+
+    def lexical_scores(self, query_text: str) -> np.ndarray:
+        with self._lock:
+            if self._lexical is None:
+                self._lexical = LexicalIndex([row.get("content") or "" for row in self.rows])
+        return self._lexical.scores(query_text)
+
+    def _result(self, row: int, similarity: float, **extra: Any) -> Dict[str, Any]:
+        data = self.rows[row]
+        return {"id": data["id"], "content": data.get("content"), "metadata": data.get("metadata") or {}, "similarity": similarity, **extra}
+
+    def match_documents(
+        self,
+        query_embedding: List[float],
+        match_count: int = 5,
+        match_threshold: float = 0.0,
+        filter: Optional[Dict[str, Any]] = None,
+        **kwargs: Any,  # ef_search, probes (Postgres 인덱스용 인자는 무시)
+    ) -> List[Dict[str, Any]]:
+        """supabase_schema.sql의 match_documents와 같은 인자/결과."""
+        return [
+            self._result(row, similarity)
+            for row, similarity in self.search(query_embedding, match_count, filter)
+            if similarity > match_threshold
+        ]
+
+    def hybrid_match_documents(
+        self,
+        query_text: str,
+        query_embedding: List[float],
+        match_count: int = 5,
+        candidate_count: int = 30,
+        rrf_k: int = 60,
+        full_text_weight: float = 1.0,
+        semantic_weight: float = 1.0,
+        filter: Optional[Dict[str, Any]] = None,
+        **kwargs: Any,
+    ) -> List[Dict[str, Any]]:
+        """벡터 순위와 어휘(BM25) 순위를 RRF로 합칩니다 (hybrid_match_documents와 같은 인자/결과)."""
+        if not self.rows:
+            return []
+        semantic = self.search(query_embedding, candidate_count, filter)
+        lexical = self.lexical_scores(query_text)
+        mask = self._filter_mask(filter)
+        if mask is not None:
+            lexical = np.where(mask, lexical, 0)
+        lexical_order = [int(row) for row in np.argsort(-lexical)[:candidate_count] if lexical[row] > 0]
+
+        scores: Dict[int, float] = {}
+        similarity_by_row = dict(semantic)
+        for rank, (row, _) in enumerate(semantic, start=1):
+            scores[row] = scores.get(row, 0.0) + semantic_weight / (rrf_k + rank)
+        for rank, row in enumerate(lexical_order, start=1):
+            scores[row] = scores.get(row, 0.0) + full_text_weight / (rrf_k + rank)
+
+        query = np.asarray(query_embedding, dtype=np.float32)
+        query = query / (np.linalg.norm(query) or 1.0)
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:match_count]
+        return [
+            self._result(row, similarity_by_row.get(row, float(self.matrix[row] @ query)), score=score)
+            for row, score in ranked
+        ]
+
+    def list_document_sections(self, **kwargs: Any) -> List[Dict[str, Any]]:
+        sources_by_section: Dict[str, set] = {}
+        for row in self.rows:
+            metadata = row.get("metadata") or {}
+            for prefix in metadata.get("sections") or []:
+                sources_by_section.setdefault(prefix, set()).add(metadata.get("source"))
+        return [
+            {"section": section, "page_count": len(sources)}
+            for section, sources in sorted(sources_by_section.items())
+            if len(sources) > 1
+        ]
+
+    def rpc(self, name: str, params: Optional[Dict[str, Any]] = None) -> RpcCall:
+        handlers = {
+            "match_documents": self.match_documents,
+            "hybrid_match_documents": self.hybrid_match_documents,
+            "list_document_sections": self.list_document_sections,
+        }
+        if name not in handlers:
+            raise ValueError(f"로컬 인덱스에서 지원하지 않는 RPC입니다: {name}")
+        return RpcCall(lambda: handlers[name](**(params or {})))
+
+
+class LocalIndexClient:
+    """
+    스냅샷 인덱스로 검색 RPC를 처리하는 읽기 전용 클라이언트 (Supabase 클라이언트 대신 벡터 스토어에 전달).
+
+    reload_interval초마다 manifest를 확인하여 수집으로 스냅샷이 바뀌었으면 새 인덱스로 교체합니다.
+    """
+
+    def __init__(self, path: str = LOCAL_INDEX_PATH, reload_interval: float = LOCAL_INDEX_RELOAD_SECONDS):
+        self.path = path
+        self.reload_interval = reload_interval
+        self._lock = threading.Lock()
+        self._manifest_mtime = self._read_manifest_mtime()
+        self.index = LocalVectorIndex.load(path)
+        self._checked_at = time.monotonic()
+        print(f"로컬 벡터 인덱스 로드: {path} ({len(self.index)} chunks, HNSW {'사용' if self.index.hnsw is not None else '미사용'})")
+
+    def _read_manifest_mtime(self) -> float:
+        return os.path.getmtime(os.path.join(self.path, MANIFEST_FILE))
+
+    def _maybe_reload(self) -> LocalVectorIndex:
+        now = time.monotonic()
+        if now - self._checked_at < self.reload_interval:
+            return self.index
+        with self._lock:
+            if now - self._checked_at < self.reload_interval:
+                return self.index
+            self._checked_at = now
+            try:
+                mtime = self._read_manifest_mtime()
+                if mtime != self._manifest_mtime:
+                    self.index = LocalVectorIndex.load(self.path)
+                    self._manifest_mtime = mtime
+                    print(f"로컬 벡터 인덱스 교체: version {self.index.version} ({len(self.index)} chunks)")
+            except Exception as e:
+                # 교체에 실패하면 기존 인덱스로 계속 검색
+                print(f"로컬 벡터 인덱스 다시 읽기 실패: {e}")
+        return self.index
+
+    def rpc(self, name: str, params: Optional[Dict[str, Any]] = None) -> RpcCall:
+        return self._maybe_reload().rpc(name, params)
+
+
+def snapshot_exists(path: str = LOCAL_INDEX_PATH) -> bool:
+    return os.path.exists(os.path.join(path, MANIFEST_FILE))
+
+
+def iter_document_rows(client: Any, page_size: int = 500) -> Iterator[Dict[str, Any]]:
+    """documents 테이블의 id, content, metadata, embedding을 id 순서로 페이지 단위로 읽습니다."""
+    start = 0
+    while True:
+        rows = (
+            client.table("documents")
+            .select("id, content, metadata, embedding")
+            .order("id")
+            .range(start, start + page_size - 1)
+            .execute()
+            .data
+            or []
+        )
+        yield from rows
+        if len(rows) < page_size:
+            break
+        start += page_size
+
+
+def export_snapshot(client: Any, path: str = LOCAL_INDEX_PATH, page_size: int = 500, build_hnsw: bool = LOCAL_INDEX_HNSW) -> Dict[str, Any]:
+    """documents 테이블을 로컬 인덱스 스냅샷으로 내보내고 manifest를 반환합니다."""
+    from app_state import get_corpus_version
+
+    rows: List[Dict[str, Any]] = []
+    vectors: List[np.ndarray] = []
+    for row in iter_document_rows(client, page_size):
+        if row.get("embedding") is None:
+            continue
+        vectors.append(parse_embedding(row.pop("embedding")))
+        rows.append(row)
+    matrix = normalize_rows(np.stack(vectors)) if vectors else np.zeros((0, 0), dtype=np.float32)
+
+    try:
+        corpus_version = get_corpus_version(client)
+    except Exception:
+        corpus_version = None  # app_state 테이블이 없는 이전 스키마
+    return LocalVectorIndex(rows, matrix).save(path, build_hnsw=build_hnsw, corpus_version=corpus_version)
+
+
+def benchmark_index(index: LocalVectorIndex, queries: int, k: int) -> None:
+    """저장된 벡터에 잡음을 더한 질의로 검색 지연 시간과 (HNSW 사용 시) 정확 검색 대비 recall@k를 출력합니다."""
+    rng = np.random.default_rng(0)
+    picks = rng.integers(0, len(index), size=queries)
+    query_vectors = np.asarray(index.matrix[picks]) + rng.normal(0, 0.01, size=(queries, index.matrix.shape[1])).astype(np.float32)
+
+    hnsw = index.hnsw
+    modes = [("exact", None)] + ([("hnsw", hnsw)] if hnsw is not None else [])
+    exact_results: List[set] = []
+    for name, hnsw_index in modes:
+        index.hnsw = hnsw_index
+        latencies, recalls = [], []
+        for i, query in enumerate(query_vectors):
+            start = time.perf_counter()
+            results = index.search(query, k)
+            latencies.append((time.perf_counter() - start) * 1000)
+            found = {row for row, _ in results}
+            if hnsw_index is None:
+                exact_results.append(found)
+            else:
+                recalls.append(len(found & exact_results[i]) / k)
+        recall_text = f"{np.mean(recalls):.3f}" if recalls else "-"
+        print(f"{name:6} p50 {np.percentile(latencies, 50):.3f}ms  p99 {np.percentile(latencies, 99):.3f}ms  recall@{k} {recall_text}")
+    index.hnsw = hnsw
+
+
+def main():
+    parser = argparse.ArgumentParser(description="로컬 벡터 인덱스 스냅샷 내보내기/측정")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    export_parser = subparsers.add_parser("export", help="Supabase documents 테이블을 스냅샷으로 내보내기")
+    export_parser.add_argument("--path", default=LOCAL_INDEX_PATH, help="스냅샷 디렉터리")
+    export_parser.add_argument("--hnsw", action="store_true", default=LOCAL_INDEX_HNSW, help="HNSW 인덱스도 생성 (hnswlib 필요)")
+    bench_parser = subparsers.add_parser("bench", help="스냅샷 검색 지연 시간 측정")
+    bench_parser.add_argument("--path", default=LOCAL_INDEX_PATH, help="스냅샷 디렉터리")
+    bench_parser.add_argument("--queries", type=int, default=200, help="질의 수")
+    bench_parser.add_argument("--k", type=int, default=5, help="검색 개수")
+    args = parser.parse_args()
+
+    if args.command == "export":
+        from dotenv import load_dotenv
+        from supabase.client import create_client
+
+        load_dotenv()
+        client = create_client(os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_ANON_KEY"))
+        start = time.perf_counter()
+        manifest = export_snapshot(client, args.path, build_hnsw=args.hnsw)
+        print(f"{manifest['count']} chunks ({manifest['dim']}차원)를 {args.path}에 저장했습니다 ({time.perf_counter() - start:.1f}s, version {manifest['version']}).")
+    else:
+        start = time.perf_counter()
+        index = LocalVectorIndex.load(args.path, use_hnsw=True)
+        print(f"{len(index)} chunks 로드 {(time.perf_counter() - start) * 1000:.0f}ms")
+        benchmark_index(index, args.queries, args.k)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+#!/usr/bin/env python
+"""
+OpenAI 호환 API를 흉내 내는 로컬 모의 서버입니다 (테스트/벤치마크용, API 키와 네트워크 불필요).
+
+- POST /v1/chat/completions: 마지막 사용자 메시지를 바탕으로 한 고정 형식 답변 (stream=true이면 SSE로 나눠 전송)
+- POST /v1/embeddings: 입력 텍스트의 단어/글자 bigram을 해시해 만든 결정적 단위 벡터
+  (같은 입력 → 같은 벡터, 단어가 많이 겹치는 텍스트 → 코사인 유사도가 높은 벡터)
+- --latency로 응답 지연, --token-delay로 스트리밍 토큰 간 지연, --error-rate로 429/500 응답을 섞을 수 있어
+  openai_clients.py의 타임아웃/재시도/동시 실행 제한을 확인할 수 있습니다.
+
+사용 예:
+    python mock_openai_server.py --port 8001 --latency 0.2 --error-rate 0.1
+    OPENAI_BASE_URL=http://127.0.0.1:8001/v1 OPENAI_API_KEY=sk-mock streamlit run app.py
+"""
+
+import argparse
+import hashlib
+import json
+import random
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List
+
+import numpy as np
+
+MOCK_MODEL_NAME = "mock-gpt"
+
+_WORD_PATTERN = re.compile(r"[0-9A-Za-z_]+|[가-힣]+")
+
+
+def mock_embedding(text: str, dim: int = 1536) -> List[float]:
+    """
+    단어(한글은 글자 bigram)를 해시해 차원에 더한 결정적 단위 벡터 (feature hashing).
+
+    실제 임베딩처럼 비슷한 텍스트끼리 유사도가 높아 match_threshold를 넘는 검색 결과가 나옵니다.
+    """
+    vector = np.zeros(dim)
+    for word in _WORD_PATTERN.findall(text.lower()):
+        terms = [word[i:i + 2] for i in range(len(word) - 1)] if word[0] >= "가" and len(word) > 1 else [word]
+        for term in terms:
+            digest = int.from_bytes(hashlib.sha256(term.encode("utf-8")).digest()[:8], "big")
+            vector[digest % dim] += 1.0 if digest >> 63 else -1.0
+    vector = np.sign(vector) * np.sqrt(np.abs(vector))  # 반복되는 단어의 영향 완화
+    norm = np.linalg.norm(vector)
+    if not norm:  # 단어가 없는 입력은 텍스트 해시 방향의 단위 벡터
+        vector[int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "big") % dim] = 1.0
+        norm = 1.0
+    return (vector / norm).round(6).tolist()
+
+
+def mock_reply(messages: List[Dict[str, Any]]) -> str:
+    """마지막 사용자 메시지를 인용하는 고정 형식 답변."""
+    question = next((m.get("content", "") for m in reversed(messages) if m.get("role") == "user"), "")
+    if isinstance(question, list):  # 멀티파트 content
+        question = " ".join(part.get("text", "") for part in question if isinstance(part, dict))
+    return f"모의 답변입니다. 질문 요약: {question.strip()[-80:]}"
+
+
+def make_mock_openai_handler(latency: float, token_delay: float, error_rate: float, stats: Dict[str, int], lock: threading.Lock):
+    """설정값을 사용하는 요청 핸들러 클래스를 만듭니다."""
+
+    class MockOpenAIHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive 지원
+
+        def do_GET(self):
+            if self.path.rstrip("/").endswith("/models"):
+                self._send_json(200, {"object": "list", "data": [{"id": MOCK_MODEL_NAME, "object": "model"}]})
+            else:
+                self._send_json(404, {"error": {"message": "not found"}})
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            body = json.loads(self.rfile.read(length) or b"{}")
+            path = self.path.rstrip("/")
+            with lock:
+                stats[path] = stats.get(path, 0) + 1
+
+            time.sleep(latency)  # 원격 API의 응답 지연 흉내
+            if error_rate and random.random() < error_rate:
+                status = random.choice([429, 500])
+                with lock:
+                    stats[f"error_{status}"] = stats.get(f"error_{status}", 0) + 1
+                self._send_json(status, {"error": {"message": "mock error", "type": "server_error"}}, {"Retry-After": "0"})
+                return
+
+            if path.endswith("/chat/completions"):
+                self._chat_completions(body)
+            elif path.endswith("/embeddings"):
+                self._embeddings(body)
+            else:
+                self._send_json(404, {"error": {"message": "not found"}})
+
+        def _chat_completions(self, body: Dict[str, Any]):
+            reply = mock_reply(body.get("messages", []))
+            model = body.get("model", MOCK_MODEL_NAME)
+            created = int(time.time())
+            usage = {"prompt_tokens": sum(len(str(m.get("content", ""))) for m in body.get("messages", [])), "completion_tokens": len(reply)}
+            usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+
+            if not body.get("stream"):
+                self._send_json(200, {
+                    "id": "chatcmpl-mock",
+                    "object": "chat.completion",
+                    "created": created,
+                    "model": model,
+                    "choices": [{"index": 0, "message": {"role": "assistant", "content": reply}, "finish_reason": "stop"}],
+                    "usage": usage,
+                })
+                return
+
+            # SSE 스트리밍 (Transfer-Encoding: chunked)
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Cache-Control", "no-cache")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            pieces = [reply[i:i + 4] for i in range(0, len(reply), 4)]
+            for index, piece in enumerate(pieces):
+                delta = {"role": "assistant", "content": piece} if index == 0 else {"content": piece}
+                self._send_event({
+                    "id": "chatcmpl-mock",
+                    "object": "chat.completion.chunk",
+                    "created": created,
+                    "model": model,
+                    "choices": [{"index": 0, "delta": delta, "finish_reason": None}],
+                })
+                time.sleep(token_delay)
+            self._send_event({
+                "id": "chatcmpl-mock",
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+            })
+            self._send_chunk(b"data: [DONE]\n\n")
+            self._send_chunk(b"")
+
+        def _embeddings(self, body: Dict[str, Any]):
+            inputs = body.get("input", [])
+            if not isinstance(inputs, list) or (inputs and isinstance(inputs[0], int)):
+                inputs = [inputs]
+            dim = int(body.get("dimensions") or 1536)
+            # 토큰 배열로 들어온 입력은 배열 자체를 해시 (같은 텍스트 → 같은 토큰 → 같은 벡터)
+            data = [
+                {"object": "embedding", "index": i, "embedding": mock_embedding(item if isinstance(item, str) else json.dumps(item), dim)}
+                for i, item in enumerate(inputs)
+            ]
+            self._send_json(200, {
+                "object": "list",
+                "data": data,
+                "model": body.get("model", "mock-embedding"),
+                "usage": {"prompt_tokens": 0, "total_tokens": 0},
+            })
+
+        def _send_event(self, payload: Dict[str, Any]):
+            self._send_chunk(f"data: {json.dumps(payload, ensure_ascii=False)}\n\n".encode("utf-8"))
+
+        def _send_chunk(self, data: bytes):
+            self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+            self.wfile.flush()
+
+        def _send_json(self, status: int, payload: Dict[str, Any], headers: Dict[str, str] = None):
+            data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass  # 테스트 출력이 묻히지 않도록 접근 로그 생략
+
+    return MockOpenAIHandler
+
+
+class QuietThreadingHTTPServer(ThreadingHTTPServer):
+    """클라이언트가 keep-alive 연결을 끊을 때 생기는 연결 오류는 출력하지 않는 서버."""
+
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        if isinstance(sys.exc_info()[1], (ConnectionResetError, BrokenPipeError)):
+            return
+        super().handle_error(request, client_address)
+
+
+def start_mock_openai_server(port: int = 0, latency: float = 0.0, token_delay: float = 0.0, error_rate: float = 0.0):
+    """
+    백그라운드 스레드에서 모의 서버를 시작하고 (server, base_url)을 반환합니다.
+
+    base_url은 '/v1'까지 포함하므로 OPENAI_BASE_URL에 그대로 사용할 수 있습니다.
+    요청 경로별 횟수는 server.stats에 기록됩니다.
+    """
+    stats: Dict[str, int] = {}
+    handler = make_mock_openai_handler(latency, token_delay, error_rate, stats, threading.Lock())
+    server = QuietThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.stats = stats
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OpenAI 호환 모의 서버")
+    parser.add_argument("--port", type=int, default=8001, help="수신 포트")
+    parser.add_argument("--latency", type=float, default=0.0, help="요청당 응답 지연 (초)")
+    parser.add_argument("--token-delay", type=float, default=0.02, help="스트리밍 조각 사이 지연 (초)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="429/500 오류 응답 비율 (0~1)")
+    args = parser.parse_args()
+
+    server, base_url = start_mock_openai_server(args.port, args.latency, args.token_delay, args.error_rate)
+    print(f"모의 OpenAI 서버 실행 중: OPENAI_BASE_URL={base_url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+LLM 호출 종류(route)별로 모델, 엔드포인트, 최대 출력 토큰, 타임아웃을 정하는 라우팅 계층입니다.
+
+- 질문 재구성, 추천 질문, 대화 요약 같은 보조 호출은 작고 빠른 모델(LLM_FAST_MODEL, 기본 gpt-4o-mini)로,
+  답변은 더 강한 모델(LLM_ANSWER_MODEL, 기본 gpt-4o)로 보내며, 보조 호출은 출력 토큰과 타임아웃을 짧게 제한합니다.
+- route의 타임아웃은 동시 실행 대기, 재시도, 백오프를 모두 포함한 호출 전체의 상한입니다
+  (openai_clients.DEADLINE_HEADER로 전송 계층에 전달, 각 시도에는 남은 시간 이하의 타임아웃 적용).
+  스트리밍 답변은 응답이 시작될 때까지가 상한이며, 이후에는 조각 사이 대기 시간에만 적용됩니다.
+- route마다 LLM_ROUTE_<ROUTE>_MODEL / _BASE_URL / _API_KEY / _MAX_TOKENS / _TIMEOUT / _TEMPERATURE로 따로 지정할 수 있습니다.
+  (예: LLM_ROUTE_CONDENSE_QUESTION_MODEL=gpt-4o-mini, LLM_ROUTE_ANSWER_BASE_URL=http://vllm:8000/v1)
+  _BASE_URL을 비워두면 OPENAI_BASE_URL(없으면 OpenAI API)을 사용합니다.
+- 모든 route는 openai_clients.py의 공유 연결 풀/재시도/동시 실행 제한을 함께 쓰고,
+  route 이름을 태그로 붙이므로 telemetry의 StageTimingHandler가 단계별로 기록합니다.
+
+memory_summary route의 모델은 대화 메모리의 토큰 계산에도 쓰이므로 OpenAI 모델 이름(tiktoken이 아는 이름)이어야 합니다.
+
+사용 예:
+    python model_router.py   # 현재 설정된 route 목록 출력
+"""
+
+import os
+from typing import Any, Dict, Optional
+
+from langchain_openai import ChatOpenAI
+
+from openai_clients import DEADLINE_HEADER, OPENAI_TIMEOUT_SECONDS, create_chat_model
+
+# 모델 등급별 (환경 변수, 기본 모델) - 앱이 load_dotenv()를 먼저 실행하도록 route를 만들 때 읽음
+MODEL_TIERS = {
+    "fast": ("LLM_FAST_MODEL", "gpt-4o-mini"),
+    "answer": ("LLM_ANSWER_MODEL", "gpt-4o"),
+}
+
+# route 기본값: (모델 등급, temperature, 최대 출력 토큰, 타임아웃 초 - 대기/재시도 포함 전체 상한)
+DEFAULT_ROUTES = {
+    "condense_question": ("fast", 0.1, 128, 10.0),
+    "answer": ("answer", 0.1, 1024, OPENAI_TIMEOUT_SECONDS),
+    "followup_questions": ("fast", 0.1, 150, 15.0),
+    "memory_summary": ("fast", 0.1, 256, 20.0),
+    "question_pool": ("fast", 0.3, 1024, OPENAI_TIMEOUT_SECONDS),
+}
+
+
+class ModelRoute:
+    """한 route의 모델 설정."""
+
+    def __init__(
+        self,
+        name: str,
+        model: str,
+        temperature: float,
+        max_tokens: Optional[int] = None,
+        timeout: Optional[float] = None,
+        base_url: Optional[str] = None,
+        api_key: Optional[str] = None,
+    ):
+        self.name = name
+        self.model = model
+        self.temperature = temperature
+        self.max_tokens = max_tokens
+        self.timeout = timeout
+        self.base_url = base_url
+        self.api_key = api_key
+
+    def chat_kwargs(self) -> Dict[str, Any]:
+        """create_chat_model에 넘길 인자 (지정하지 않은 값은 공유 클라이언트 기본값 사용)."""
+        kwargs: Dict[str, Any] = {"model_name": self.model, "temperature": self.temperature, "tags": [self.name]}
+        if self.max_tokens:
+            kwargs["max_tokens"] = self.max_tokens
+        if self.timeout:
+            kwargs["timeout"] = self.timeout
+            kwargs["default_headers"] = {DEADLINE_HEADER: str(self.timeout)}
+        if self.base_url:
+            kwargs["base_url"] = self.base_url
+        return kwargs
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "route": self.name,
+            "model": self.model,
+            "temperature": self.temperature,
+            "max_tokens": self.max_tokens,
+            "timeout": self.timeout,
+            "base_url": self.base_url or os.getenv("OPENAI_BASE_URL") or "(OpenAI)",
+        }
+
+
+def load_route(name: str) -> ModelRoute:
+    """기본값에 LLM_ROUTE_<NAME>_* 환경 변수를 덮어쓴 route 설정을 읽습니다."""
+    if name not in DEFAULT_ROUTES:
+        raise ValueError(f"알 수 없는 LLM route입니다: {name}")
+    tier, temperature, max_tokens, timeout = DEFAULT_ROUTES[name]
+    tier_env, tier_model = MODEL_TIERS[tier]
+    prefix = f"LLM_ROUTE_{name.upper()}_"
+    return ModelRoute(
+        name,
+        model=os.getenv(prefix + "MODEL") or os.getenv(tier_env) or tier_model,
+        temperature=float(os.getenv(prefix + "TEMPERATURE") or temperature),
+        max_tokens=int(os.getenv(prefix + "MAX_TOKENS") or max_tokens) or None,  # 0이면 제한 없음
+        timeout=float(os.getenv(prefix + "TIMEOUT") or timeout) or None,
+        base_url=os.getenv(prefix + "BASE_URL") or None,
+        api_key=os.getenv(prefix + "API_KEY") or None,
+    )
+
+
+def create_routed_chat_model(route: str, openai_api_key: Optional[str] = None, **kwargs: Any) -> ChatOpenAI:
+    """
+    route 설정에 맞는 ChatOpenAI를 만듭니다.
+
+    kwargs(예: streaming=True)는 route 설정보다 우선하며, tags는 route 이름 뒤에 덧붙입니다.
+    route에 API 키(LLM_ROUTE_<ROUTE>_API_KEY)가 있으면 openai_api_key 대신 사용합니다.
+    """
+    model_route = load_route(route)
+    chat_kwargs = model_route.chat_kwargs()
+    chat_kwargs["tags"] = chat_kwargs["tags"] + list(kwargs.pop("tags", []))
+    chat_kwargs.update(kwargs)
+    return create_chat_model(model_route.api_key or openai_api_key, **chat_kwargs)
+
+
+def main():
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    print(f"{'route':20} {'model':24} {'temp':>5} {'max_tokens':>10} {'timeout':>8}  endpoint")
+    for name in DEFAULT_ROUTES:
+        route = load_route(name).to_dict()
+        print(f"{name:20} {route['model']:24} {route['temperature']:>5} {str(route['max_tokens']):>10} {str(route['timeout']):>8}  {route['base_url']}")
+
+
+if __name__ == "__main__":
+    main()
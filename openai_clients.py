@@ -0,0 +1,348 @@
+"""
+app.py, ingest_gitbook.py 등이 함께 사용하는 OpenAI 클라이언트 계층입니다.
+
+- 프로세스 전체가 하나의 httpx 연결 풀(동기/비동기 각각)을 공유합니다.
+- 모든 호출에 타임아웃(OPENAI_TIMEOUT_SECONDS)을 적용합니다.
+- 429/5xx 응답과 연결 오류는 지수 백오프 + 지터로 재시도합니다 (Retry-After 헤더가 있으면 따름).
+  SDK 자체 재시도는 끄므로 재시도가 중복되지 않습니다.
+- 동시에 진행 중인 요청 수를 OPENAI_MAX_CONCURRENCY로 제한하고, 대기 시간과 재시도 횟수를 기록합니다.
+- 타임아웃은 시도(attempt) 한 번에 적용됩니다. 요청에 DEADLINE_HEADER(초)가 있으면 동시 실행 대기, 재시도, 백오프를 모두 포함한
+  전체 상한으로 사용하여, 남은 시간이 없으면 더 기다리거나 재시도하지 않습니다 (model_router.py의 route별 타임아웃).
+
+OPENAI_BASE_URL을 지정하면 OpenAI 호환 서버(예: mock_openai_server.py)로 요청을 보냅니다.
+"""
+
+import asyncio
+import os
+import random
+import threading
+import time
+from typing import Any, Dict, Optional
+
+import httpx
+from langchain_openai import ChatOpenAI, OpenAIEmbeddings
+
+OPENAI_TIMEOUT_SECONDS = float(os.getenv("OPENAI_TIMEOUT_SECONDS", "30"))
+OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "3"))
+OPENAI_MAX_CONCURRENCY = int(os.getenv("OPENAI_MAX_CONCURRENCY", "8"))
+OPENAI_MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", "20"))
+
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+RETRY_BASE_DELAY = 0.5
+RETRY_MAX_DELAY = 20.0
+
+# 요청 전체(대기 + 재시도 포함) 상한(초)을 전송 계층에 알리는 헤더 (서버로 보내기 전에 제거됨)
+DEADLINE_HEADER = "x-client-deadline-seconds"
+
+
+class ClientMetrics:
+    """요청 수, 재시도 수, 동시 실행 제한으로 인한 대기 시간 등을 집계합니다 (스레드 안전)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.requests = 0
+            self.retries = 0
+            self.failures = 0
+            self.in_flight = 0
+            self.queue_wait_total = 0.0
+            self.queue_wait_max = 0.0
+            self.status_counts: Dict[int, int] = {}
+
+    def record_queue_wait(self, seconds: float) -> None:
+        with self._lock:
+            self.requests += 1
+            self.in_flight += 1
+            self.queue_wait_total += seconds
+            self.queue_wait_max = max(self.queue_wait_max, seconds)
+
+    def record_done(self) -> None:
+        with self._lock:
+            self.in_flight -= 1
+
+    def record_attempt(self, status_code: Optional[int], retrying: bool) -> None:
+        with self._lock:
+            if status_code is not None:
+                self.status_counts[status_code] = self.status_counts.get(status_code, 0) + 1
+            if retrying:
+                self.retries += 1
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "retries": self.retries,
+                "failures": self.failures,
+                "in_flight": self.in_flight,
+                "queue_wait_avg_ms": round(self.queue_wait_total / self.requests * 1000, 1) if self.requests else 0.0,
+                "queue_wait_max_ms": round(self.queue_wait_max * 1000, 1),
+                "status_counts": dict(self.status_counts),
+            }
+
+
+metrics = ClientMetrics()
+
+
+def retry_delay(attempt: int, response: Optional[httpx.Response] = None) -> float:
+    """재시도 전 대기 시간 (Retry-After 헤더 우선, 없으면 지수 백오프 + full jitter)."""
+    if response is not None:
+        retry_after = response.headers.get("retry-after")
+        try:
+            if retry_after is not None:
+                return min(RETRY_MAX_DELAY, max(0.0, float(retry_after)))
+        except ValueError:
+            pass
+    return random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * (2 ** attempt)))
+
+
+def _request_deadline(request: httpx.Request, start: float) -> Optional[float]:
+    """요청의 DEADLINE_HEADER를 꺼내 마감 시각(perf_counter 기준)으로 바꿉니다 (헤더가 없으면 None)."""
+    value = request.headers.pop(DEADLINE_HEADER, None)
+    try:
+        return start + float(value) if value else None
+    except ValueError:
+        return None
+
+
+def _remaining(deadline: Optional[float]) -> Optional[float]:
+    return None if deadline is None else max(0.0, deadline - time.perf_counter())
+
+
+def _has_time_for(deadline: Optional[float], delay: float) -> bool:
+    """delay만큼 기다린 뒤에도 마감 전에 다시 시도할 수 있는지."""
+    return deadline is None or time.perf_counter() + delay < deadline
+
+
+def _limit_attempt_timeout(request: httpx.Request, deadline: Optional[float]) -> None:
+    """이번 시도의 타임아웃을 마감까지 남은 시간 이하로 줄입니다."""
+    remaining = _remaining(deadline)
+    if remaining is None:
+        return
+    timeouts = request.extensions.get("timeout", {})
+    request.extensions["timeout"] = {
+        key: remaining if value is None else min(value, remaining) for key, value in timeouts.items()
+    }
+
+
+def _queue_timeout(request: httpx.Request) -> httpx.PoolTimeout:
+    metrics.record_failure()
+    return httpx.PoolTimeout("Deadline passed while waiting for a free OpenAI request slot", request=request)
+
+
+class _ReleasingStream(httpx.SyncByteStream):
+    """응답 본문(스트리밍 포함)을 다 읽고 닫을 때 동시 실행 슬롯을 반납합니다."""
+
+    def __init__(self, stream: httpx.SyncByteStream, release):
+        self._stream = stream
+        self._release = release
+
+    def __iter__(self):
+        yield from self._stream
+
+    def close(self) -> None:
+        try:
+            self._stream.close()
+        finally:
+            self._release()
+
+
+class _AsyncReleasingStream(httpx.AsyncByteStream):
+    def __init__(self, stream: httpx.AsyncByteStream, release):
+        self._stream = stream
+        self._release = release
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            yield chunk
+
+    async def aclose(self) -> None:
+        try:
+            await self._stream.aclose()
+        finally:
+            self._release()
+
+
+def _release_once(release):
+    released = threading.Event()
+
+    def wrapper():
+        if not released.is_set():
+            released.set()
+            release()
+            metrics.record_done()
+
+    return wrapper
+
+
+class LimitedRetryTransport(httpx.BaseTransport):
+    """동시 실행 수 제한과 재시도를 적용하는 동기 httpx 전송 계층."""
+
+    def __init__(self, max_concurrency: int = OPENAI_MAX_CONCURRENCY, max_retries: int = OPENAI_MAX_RETRIES, **transport_kwargs: Any):
+        self._transport = httpx.HTTPTransport(**transport_kwargs)
+        self._semaphore = threading.BoundedSemaphore(max_concurrency)
+        self.max_retries = max_retries
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        start = time.perf_counter()
+        deadline = _request_deadline(request, start)
+        if not self._semaphore.acquire(timeout=_remaining(deadline)):
+            raise _queue_timeout(request)
+        metrics.record_queue_wait(time.perf_counter() - start)
+        release = _release_once(self._semaphore.release)
+        try:
+            attempt = 0
+            while True:
+                _limit_attempt_timeout(request, deadline)
+                try:
+                    response = self._transport.handle_request(request)
+                except (httpx.ConnectError, httpx.ConnectTimeout, httpx.RemoteProtocolError):
+                    delay = retry_delay(attempt)
+                    if attempt >= self.max_retries or not _has_time_for(deadline, delay):
+                        raise
+                    metrics.record_attempt(None, retrying=True)
+                    time.sleep(delay)
+                    attempt += 1
+                    continue
+
+                retrying = response.status_code in RETRY_STATUS_CODES and attempt < self.max_retries
+                delay = retry_delay(attempt, response) if retrying else 0.0
+                retrying = retrying and _has_time_for(deadline, delay)
+                metrics.record_attempt(response.status_code, retrying)
+                if not retrying:
+                    response.stream = _ReleasingStream(response.stream, release)
+                    return response
+                response.close()
+                time.sleep(delay)
+                attempt += 1
+        except BaseException:
+            metrics.record_failure()
+            release()
+            raise
+
+    def close(self) -> None:
+        self._transport.close()
+
+
+class AsyncLimitedRetryTransport(httpx.AsyncBaseTransport):
+    """동시 실행 수 제한과 재시도를 적용하는 비동기 httpx 전송 계층 (하나의 이벤트 루프에서 사용)."""
+
+    def __init__(self, max_concurrency: int = OPENAI_MAX_CONCURRENCY, max_retries: int = OPENAI_MAX_RETRIES, **transport_kwargs: Any):
+        self._transport = httpx.AsyncHTTPTransport(**transport_kwargs)
+        self._max_concurrency = max_concurrency
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self.max_retries = max_retries
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self._max_concurrency)
+        start = time.perf_counter()
+        deadline = _request_deadline(request, start)
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=_remaining(deadline))
+        except asyncio.TimeoutError:
+            raise _queue_timeout(request) from None
+        metrics.record_queue_wait(time.perf_counter() - start)
+        release = _release_once(self._semaphore.release)
+        try:
+            attempt = 0
+            while True:
+                _limit_attempt_timeout(request, deadline)
+                try:
+                    response = await self._transport.handle_async_request(request)
+                except (httpx.ConnectError, httpx.ConnectTimeout, httpx.RemoteProtocolError):
+                    delay = retry_delay(attempt)
+                    if attempt >= self.max_retries or not _has_time_for(deadline, delay):
+                        raise
+                    metrics.record_attempt(None, retrying=True)
+                    await asyncio.sleep(delay)
+                    attempt += 1
+                    continue
+
+                retrying = response.status_code in RETRY_STATUS_CODES and attempt < self.max_retries
+                delay = retry_delay(attempt, response) if retrying else 0.0
+                retrying = retrying and _has_time_for(deadline, delay)
+                metrics.record_attempt(response.status_code, retrying)
+                if not retrying:
+                    response.stream = _AsyncReleasingStream(response.stream, release)
+                    return response
+                await response.aclose()
+                await asyncio.sleep(delay)
+                attempt += 1
+        except BaseException:
+            metrics.record_failure()
+            release()
+            raise
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
+
+
+_client_lock = threading.Lock()
+_http_client: Optional[httpx.Client] = None
+_async_http_client: Optional[httpx.AsyncClient] = None
+
+
+def _limits() -> httpx.Limits:
+    return httpx.Limits(max_connections=OPENAI_MAX_CONNECTIONS, max_keepalive_connections=OPENAI_MAX_CONNECTIONS)
+
+
+def get_http_client() -> httpx.Client:
+    """프로세스 전역 동기 httpx 클라이언트 (연결 풀 공유)."""
+    global _http_client
+    with _client_lock:
+        if _http_client is None:
+            _http_client = httpx.Client(
+                transport=LimitedRetryTransport(limits=_limits()),
+                timeout=OPENAI_TIMEOUT_SECONDS,
+            )
+        return _http_client
+
+
+def get_async_http_client() -> httpx.AsyncClient:
+    """프로세스 전역 비동기 httpx 클라이언트 (연결 풀 공유)."""
+    global _async_http_client
+    with _client_lock:
+        if _async_http_client is None:
+            _async_http_client = httpx.AsyncClient(
+                transport=AsyncLimitedRetryTransport(limits=_limits()),
+                timeout=OPENAI_TIMEOUT_SECONDS,
+            )
+        return _async_http_client
+
+
+def _client_kwargs(openai_api_key: Optional[str]) -> Dict[str, Any]:
+    # API 키와 OPENAI_BASE_URL은 호출하는 스크립트가 load_dotenv()를 실행한 뒤에 읽음
+    return {
+        "openai_api_key": openai_api_key or os.getenv("OPENAI_API_KEY"),
+        "base_url": os.getenv("OPENAI_BASE_URL") or None,
+        "http_client": get_http_client(),
+        "http_async_client": get_async_http_client(),
+        "timeout": OPENAI_TIMEOUT_SECONDS,
+        "max_retries": 0,  # 재시도는 전송 계층에서 처리
+    }
+
+
+def create_chat_model(openai_api_key: Optional[str] = None, model_name: str = "gpt-3.5-turbo", **kwargs: Any) -> ChatOpenAI:
+    """
+    공유 연결 풀과 재시도/동시 실행 제한을 사용하는 ChatOpenAI를 만듭니다.
+
+    kwargs의 timeout, base_url은 공유 기본값보다 우선합니다 (model_router.py의 route별 설정).
+    """
+    return ChatOpenAI(model_name=model_name, **{**_client_kwargs(openai_api_key), **kwargs})
+
+
+def create_embeddings(openai_api_key: Optional[str] = None, **kwargs: Any) -> OpenAIEmbeddings:
+    """공유 연결 풀과 재시도/동시 실행 제한을 사용하는 OpenAIEmbeddings를 만듭니다."""
+    return OpenAIEmbeddings(**_client_kwargs(openai_api_key), **kwargs)
+
+
+def client_metrics() -> Dict[str, Any]:
+    """OpenAI 호출 통계 (요청/재시도/실패 수, 동시 실행 대기 시간, 상태 코드별 횟수)."""
+    return metrics.snapshot()
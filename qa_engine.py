@@ -0,0 +1,480 @@
+"""
+앱(app.py)의 검색 → 답변 경로를 Streamlit 없이 구성하고 실행하는 모듈입니다.
+
+ChatEngine은 검색 범위별 QA 체인과 의미 기반 답변 캐시를 묶은 답변 엔진으로,
+app.py(st.cache_resource로 캐싱)와 HTTP 답변 서버(answer_server.py)가 같은 코드로 답합니다.
+benchmark_e2e.py는 같은 경로를 로컬 대체 구현(모의 OpenAI 서버, 메모리 벡터 스토어)으로 실행합니다.
+
+SPECULATIVE_RETRIEVAL=true이면 SpeculativeRetrievalChain을 사용합니다.
+- 대화 기록이 있으면 질문 재구성(LLM 호출)과 동시에 원래 질문으로 검색을 시작하고,
+  재구성된 질문이 원래 질문과 충분히 비슷하면(임베딩 코사인 유사도) 그 결과를 그대로 쓰고,
+  아니면 재구성된 질문으로 한 번 더 검색하여 두 결과를 RRF로 합칩니다.
+- 이전 대화를 가리키는 표현이 없는 독립적인 질문은 재구성 호출을 건너뜁니다.
+"""
+
+import contextvars
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from langchain.chains import ConversationalRetrievalChain
+from langchain.chains.conversational_retrieval.base import _get_chat_history
+from langchain_core.callbacks import CallbackManagerForChainRun
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.retrievers import BaseRetriever
+
+from local_vector_index import LOCAL_INDEX_PATH, VECTOR_STORE_BACKEND, LocalIndexClient
+from model_router import create_routed_chat_model
+from reranker import RERANK_CANDIDATES, RERANK_ENABLED, RerankingRetriever, lexical_terms, pack_documents, rerank_documents
+from semantic_cache import SemanticAnswerCache
+from telemetry import timed
+from vector_store import RETRIEVAL_MODES, TunedSupabaseVectorStore, create_retriever
+
+MATCH_THRESHOLD = 0.5
+# 검색 방식: vector (벡터 검색만) 또는 hybrid (전문 검색 + 벡터 검색, hybrid_match_documents 함수 필요)
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "vector")
+# 벡터 인덱스 검색 폭 (HNSW ef_search / ivfflat probes) - 비워두면 match_documents 기본값 사용
+VECTOR_EF_SEARCH = int(os.getenv("VECTOR_EF_SEARCH", "0")) or None
+VECTOR_PROBES = int(os.getenv("VECTOR_PROBES", "0")) or None
+# 문서 버전(답변 캐시 무효화용) 조회 간격 (초)
+CORPUS_VERSION_TTL_SECONDS = float(os.getenv("CORPUS_VERSION_TTL_SECONDS", "60"))
+# 질문 재구성과 동시에 원래 질문으로 검색 (대화 기록이 있는 턴의 검색을 LLM 호출 뒤로 미루지 않음)
+SPECULATIVE_RETRIEVAL = os.getenv("SPECULATIVE_RETRIEVAL", "false").lower() in ("1", "true", "yes")
+# 재구성된 질문과 원래 질문의 임베딩 유사도가 이 값 이상이면 미리 검색한 결과를 그대로 사용
+SPECULATIVE_REUSE_SIMILARITY = float(os.getenv("SPECULATIVE_REUSE_SIMILARITY", "0.9"))
+SPECULATIVE_MAX_WORKERS = int(os.getenv("SPECULATIVE_MAX_WORKERS", "8"))
+# 이보다 짧은 질문("왜요?", "예시는?")은 이전 대화에 기대는 경우가 많으므로 항상 재구성
+STANDALONE_MIN_CHARS = int(os.getenv("STANDALONE_MIN_CHARS", "12"))
+
+# 이전 대화를 가리키는 표현 (지시어, 접속어, 생략된 주어를 보충하는 말)
+_FOLLOWUP_PATTERN = re.compile(
+    r"(^|\s)(그|이|저|위|앞)\s"
+    r"|그거|그것|그건|그게|이거|이것|이건|이게|저거|저것|거기|여기서|그곳"
+    r"|위에서|위의|앞에서|앞서|아까|방금|이전|해당|그럼|그러면|그런데|그래서|그렇다면|그리고"
+    r"|다른\s*(방법|예)|더\s*(자세히|알려)|자세히|계속|다시"
+    r"|\b(it|its|that|this|these|those|they|them|their|above|previous|earlier|else|more)\b",
+    re.IGNORECASE,
+)
+
+_speculative_executor: Optional[ThreadPoolExecutor] = None
+_speculative_executor_lock = threading.Lock()
+
+
+def is_standalone_question(question: str, min_chars: int = STANDALONE_MIN_CHARS) -> bool:
+    """이전 대화 없이도 뜻이 통하는 질문인지 간단한 규칙으로 판단합니다 (길이와 지시어/접속어 유무)."""
+    question = question.strip()
+    return len(question) >= min_chars and not _FOLLOWUP_PATTERN.search(question)
+
+
+def term_overlap(a: str, b: str) -> float:
+    """두 질문의 어휘(lexical_terms) 자카드 유사도."""
+    a_terms, b_terms = set(lexical_terms(a)), set(lexical_terms(b))
+    return len(a_terms & b_terms) / len(a_terms | b_terms) if a_terms | b_terms else 1.0
+
+
+def cosine_similarity(a: List[float], b: List[float]) -> float:
+    a_vector = np.asarray(a, dtype=np.float32)
+    b_vector = np.asarray(b, dtype=np.float32)
+    norm = float(np.linalg.norm(a_vector) * np.linalg.norm(b_vector))
+    return float(a_vector @ b_vector) / norm if norm else 0.0
+
+
+def merge_documents(ranked_lists: List[List[Document]], rrf_k: int = 60) -> List[Document]:
+    """여러 검색 결과를 RRF로 합칩니다 (같은 내용의 청크는 하나로)."""
+    scores: Dict[str, float] = {}
+    documents: Dict[str, Document] = {}
+    for docs in ranked_lists:
+        for rank, doc in enumerate(docs, start=1):
+            key = doc.page_content.strip()
+            documents.setdefault(key, doc)
+            scores[key] = scores.get(key, 0.0) + 1 / (rrf_k + rank)
+    return [documents[key] for key in sorted(scores, key=lambda key: -scores[key])]
+
+
+def get_speculative_executor() -> ThreadPoolExecutor:
+    """미리 검색에 쓰는 스레드 풀 (프로세스에서 하나를 공유)."""
+    global _speculative_executor
+    with _speculative_executor_lock:
+        if _speculative_executor is None:
+            _speculative_executor = ThreadPoolExecutor(max_workers=SPECULATIVE_MAX_WORKERS, thread_name_prefix="speculative-retrieval")
+        return _speculative_executor
+
+
+class SpeculativeRetrievalChain(ConversationalRetrievalChain):
+    """
+    질문 재구성과 검색을 겹쳐 실행하는 ConversationalRetrievalChain.
+
+    결과에는 어떤 경로로 문서를 찾았는지 retrieval_strategy가 추가됩니다.
+    - no_history: 대화 기록 없음 (재구성 없이 검색)
+    - standalone: 독립적인 질문으로 판단하여 재구성 생략
+    - reused: 재구성된 질문이 원래 질문과 비슷하여(어휘 또는 임베딩 유사도) 미리 검색한 결과 사용
+    - merged: 재구성된 질문으로 다시 검색하여 미리 검색한 결과와 합침
+    - fallback: 미리 검색이 실패하여 재구성된 질문으로만 검색
+    재정렬 검색기를 쓰면 두 검색 모두 후보만 가져오고, 재정렬과 토큰 예산 적용은 재구성된 질문으로 한 번만 합니다.
+    """
+
+    embeddings: Optional[Embeddings] = None
+    reuse_similarity: float = SPECULATIVE_REUSE_SIMILARITY
+    standalone_min_chars: int = STANDALONE_MIN_CHARS
+
+    def _call(self, inputs: Dict[str, Any], run_manager: Optional[CallbackManagerForChainRun] = None) -> Dict[str, Any]:
+        _run_manager = run_manager or CallbackManagerForChainRun.get_noop_manager()
+        question = inputs["question"]
+        get_chat_history = self.get_chat_history or _get_chat_history
+        chat_history_str = get_chat_history(inputs["chat_history"])
+
+        if not chat_history_str or is_standalone_question(question, self.standalone_min_chars):
+            strategy = "standalone" if chat_history_str else "no_history"
+            new_question = question
+            docs = self._get_docs(question, inputs, run_manager=_run_manager)
+        else:
+            new_question, docs, strategy = self._speculative_retrieve(question, chat_history_str, _run_manager)
+
+        output: Dict[str, Any] = {"retrieval_strategy": strategy}
+        if self.response_if_no_docs_found is not None and len(docs) == 0:
+            output[self.output_key] = self.response_if_no_docs_found
+        else:
+            new_inputs = inputs.copy()
+            if self.rephrase_question:
+                new_inputs["question"] = new_question
+            new_inputs["chat_history"] = chat_history_str
+            output[self.output_key] = self.combine_docs_chain.run(
+                input_documents=docs,
+                callbacks=_run_manager.get_child(),
+                **new_inputs,
+            )
+
+        if self.return_source_documents:
+            output["source_documents"] = docs
+        if self.return_generated_question:
+            output["generated_question"] = new_question
+        return output
+
+    def _speculative_retrieve(self, question: str, chat_history_str: str, run_manager: CallbackManagerForChainRun) -> Tuple[str, List[Document], str]:
+        reranker = self.retriever if isinstance(self.retriever, RerankingRetriever) else None
+        base_retriever: BaseRetriever = reranker.base_retriever if reranker else self.retriever
+        embeddings = self.embeddings
+
+        def retrieve_raw_question() -> Tuple[Optional[List[float]], List[Document]]:
+            # 질문 임베딩은 임베딩 캐시를 거치므로 이어지는 검색에서 다시 요청하지 않음
+            embedding = embeddings.embed_query(question) if embeddings is not None else None
+            return embedding, base_retriever.invoke(question, config={"callbacks": run_manager.get_child("speculative")})
+
+        # 계측 구간(timed)이 현재 턴에 기록되도록 컨텍스트를 복사하여 실행
+        future = get_speculative_executor().submit(contextvars.copy_context().run, retrieve_raw_question)
+        new_question = self.question_generator.run(
+            question=question,
+            chat_history=chat_history_str,
+            callbacks=run_manager.get_child(),
+        )
+
+        try:
+            question_embedding, speculative_docs = future.result()
+        except Exception as e:
+            print(f"미리 검색 실패 (재구성된 질문으로 검색): {e}")
+            return new_question, self._get_docs(new_question, {"question": new_question}, run_manager=run_manager), "fallback"
+
+        # 재구성된 질문이 어휘상 거의 같으면 임베딩 요청 없이 바로 재사용
+        similarity = term_overlap(question, new_question)
+        if similarity < self.reuse_similarity and embeddings is not None and question_embedding is not None:
+            similarity = cosine_similarity(question_embedding, embeddings.embed_query(new_question))
+
+        if similarity >= self.reuse_similarity:
+            strategy, candidates = "reused", speculative_docs
+        else:
+            strategy = "merged"
+            condensed_docs = base_retriever.invoke(new_question, config={"callbacks": run_manager.get_child()})
+            candidates = merge_documents([condensed_docs, speculative_docs])
+            if reranker is None:
+                candidates = candidates[:max(len(condensed_docs), len(speculative_docs))]
+
+        if reranker is not None:
+            with timed("rerank", candidates=len(candidates)):
+                ranked = rerank_documents(new_question, candidates, reranker.cross_encoder)
+                candidates = pack_documents(ranked, reranker.token_budget, reranker.max_chunks, reranker.max_chunks_per_source)
+        return new_question, self._reduce_tokens_below_limit(candidates), strategy
+
+
+def create_search_client(client: Any, backend: str = VECTOR_STORE_BACKEND, local_index_path: str = LOCAL_INDEX_PATH) -> Any:
+    """
+    검색 RPC(match_documents 등)를 처리할 클라이언트를 반환합니다.
+
+    backend가 "local"이면 로컬 인덱스 스냅샷(local_vector_index.py)에서 검색하므로 Supabase에 요청하지 않습니다.
+    """
+    if backend == "local":
+        return LocalIndexClient(local_index_path)
+    if backend != "supabase":
+        raise ValueError(f"지원하지 않는 VECTOR_STORE_BACKEND입니다: {backend}")
+    return client
+
+
+def create_shared_components(
+    client: Any,
+    embeddings: Embeddings,
+    openai_api_key: Optional[str] = None,
+    ef_search: Optional[int] = None,
+    probes: Optional[int] = None,
+) -> Tuple[TunedSupabaseVectorStore, Any, Any]:
+    """
+    모든 세션이 공유하는 벡터 스토어와 LLM 클라이언트를 만듭니다.
+
+    client는 검색 RPC를 처리할 클라이언트입니다 (Supabase 클라이언트 또는 create_search_client의 결과).
+
+    Returns:
+        (vector_store, llm, answer_llm) - llm은 질문 재구성용, answer_llm은 토큰 단위 스트리밍 답변용
+    """
+    # match_count/임계값/인덱스 검색 폭을 match_documents에 전달
+    vector_store = TunedSupabaseVectorStore(
+        client=client,
+        embedding=embeddings,
+        table_name="documents",
+        query_name="match_documents",
+        match_threshold=MATCH_THRESHOLD,
+        ef_search=ef_search,
+        probes=probes,
+    )
+    # 질문 재구성은 빠른 모델, 답변은 답변용 모델로 보냄 (model_router.py의 route 설정)
+    llm = create_routed_chat_model("condense_question", openai_api_key)
+    # 질문 재구성용 llm은 스트리밍하지 않아 화면에 노출되지 않음
+    answer_llm = create_routed_chat_model("answer", openai_api_key, streaming=True)
+    return vector_store, llm, answer_llm
+
+
+def create_qa_chain(
+    vector_store: TunedSupabaseVectorStore,
+    llm: Any,
+    answer_llm: Any,
+    section: Optional[str] = None,
+    retrieval_mode: str = "vector",
+    rerank: bool = RERANK_ENABLED,
+    cross_encoder: Optional[Any] = None,
+    speculative: bool = SPECULATIVE_RETRIEVAL,
+) -> ConversationalRetrievalChain:
+    """
+    검색 범위별 QA 체인을 만듭니다.
+
+    체인에는 메모리가 없으므로 모든 세션이 공유할 수 있고, 대화 기록은 run_qa_chain 호출 시 전달합니다.
+    speculative이면 질문 재구성과 검색을 겹쳐 실행하는 SpeculativeRetrievalChain을 만듭니다.
+    """
+    # 섹션을 선택하면 데이터베이스에서 metadata @> filter로 검색 범위를 제한
+    # 재정렬을 사용하면 후보를 넓게 가져온 뒤 관련도 순으로 토큰 예산 안에서만 프롬프트에 넣음
+    retriever = create_retriever(
+        vector_store,
+        mode=retrieval_mode if retrieval_mode in RETRIEVAL_MODES else "vector",
+        k=RERANK_CANDIDATES if rerank else 5,
+        score_threshold=MATCH_THRESHOLD,
+        filter={"sections": [section]} if section else {},
+    )
+    if rerank:
+        retriever = RerankingRetriever(base_retriever=retriever, cross_encoder=cross_encoder)
+
+    if speculative:
+        return SpeculativeRetrievalChain.from_llm(
+            llm=answer_llm,
+            condense_question_llm=llm,
+            retriever=retriever,
+            return_source_documents=True,
+            return_generated_question=True,
+            embeddings=vector_store.embeddings,
+        )
+    return ConversationalRetrievalChain.from_llm(
+        llm=answer_llm,
+        condense_question_llm=llm,
+        retriever=retriever,
+        return_source_documents=True,
+        return_generated_question=True,
+    )
+
+
+def run_qa_chain(
+    qa_chain: ConversationalRetrievalChain,
+    question: str,
+    chat_history: Optional[List[Any]] = None,
+    callbacks: Optional[List[Any]] = None,
+) -> Dict[str, Any]:
+    """
+    질문 하나에 답합니다. 결과에는 answer, source_documents, generated_question이 들어 있습니다.
+    (SpeculativeRetrievalChain이면 retrieval_strategy도 포함)
+    """
+    return qa_chain.invoke(
+        {"question": question, "chat_history": chat_history or []},
+        config={"callbacks": callbacks or []},
+    )
+
+
+class ChatEngine:
+    """
+    검색 → 답변 엔진 (모든 세션/요청이 공유, 스레드 안전).
+
+    - 검색 범위(section)와 검색 방식별 QA 체인을 처음 쓸 때 한 번만 만들어 재사용합니다.
+    - 대화 기록이 없는 질문(질문 재구성이 필요 없는 질문)은 의미 기반 답변 캐시를 먼저 조회하고,
+      검색된 문서가 있는 답변은 (재구성된) 질문 기준으로 캐시에 저장합니다.
+    - corpus_version_loader(예: app_state의 get_corpus_version)를 주면 문서가 다시 수집되었을 때 캐시를 비웁니다.
+    """
+
+    def __init__(
+        self,
+        search_client: Any,
+        embeddings: Embeddings,
+        openai_api_key: Optional[str] = None,
+        retrieval_mode: str = RETRIEVAL_MODE,
+        ef_search: Optional[int] = VECTOR_EF_SEARCH,
+        probes: Optional[int] = VECTOR_PROBES,
+        rerank: bool = RERANK_ENABLED,
+        cross_encoder: Optional[Any] = None,
+        speculative: bool = SPECULATIVE_RETRIEVAL,
+        semantic_cache: Optional[SemanticAnswerCache] = None,
+        corpus_version_loader: Optional[Any] = None,
+    ):
+        self.search_client = search_client
+        self.embeddings = embeddings
+        self.retrieval_mode = retrieval_mode if retrieval_mode in RETRIEVAL_MODES else "vector"
+        self.rerank = rerank
+        self.cross_encoder = cross_encoder
+        self.speculative = speculative
+        self.semantic_cache = semantic_cache
+        self.corpus_version_loader = corpus_version_loader
+        self.vector_store, self.llm, self.answer_llm = create_shared_components(
+            search_client, embeddings, openai_api_key, ef_search=ef_search, probes=probes
+        )
+        self._chains: Dict[Tuple[Optional[str], str], ConversationalRetrievalChain] = {}
+        self._lock = threading.Lock()
+        self._corpus_version: Optional[str] = None
+        self._corpus_version_checked = 0.0
+
+    def qa_chain(self, section: Optional[str] = None, retrieval_mode: Optional[str] = None) -> ConversationalRetrievalChain:
+        """검색 범위별 QA 체인 (처음 요청할 때 만들어 재사용)."""
+        mode = retrieval_mode if retrieval_mode in RETRIEVAL_MODES else self.retrieval_mode
+        key = (section or None, mode)
+        with self._lock:
+            if key not in self._chains:
+                self._chains[key] = create_qa_chain(
+                    self.vector_store,
+                    self.llm,
+                    self.answer_llm,
+                    section=section,
+                    retrieval_mode=mode,
+                    rerank=self.rerank,
+                    cross_encoder=self.cross_encoder,
+                    speculative=self.speculative,
+                )
+            return self._chains[key]
+
+    def list_sections(self) -> List[str]:
+        """검색 범위로 선택할 수 있는 문서 섹션 목록 (list_document_sections 함수가 없으면 빈 목록)."""
+        try:
+            response = self.search_client.rpc("list_document_sections", {}).execute()
+            return [row["section"] for row in response.data or [] if row.get("section")]
+        except Exception as e:
+            print(f"섹션 목록 조회 실패: {e}")
+            return []
+
+    def corpus_version(self) -> Optional[str]:
+        """수집 시 갱신되는 문서 버전 (CORPUS_VERSION_TTL_SECONDS 동안 캐싱)."""
+        if self.corpus_version_loader is None:
+            return None
+        now = time.monotonic()
+        if now - self._corpus_version_checked >= CORPUS_VERSION_TTL_SECONDS:
+            try:
+                self._corpus_version = self.corpus_version_loader()
+            except Exception as e:
+                # app_state 테이블이 없는 이전 스키마에서는 TTL로만 무효화
+                print(f"문서 버전 조회 실패: {e}")
+                self._corpus_version = None
+            self._corpus_version_checked = now
+        return self._corpus_version
+
+    def sync_cache_version(self) -> Optional[str]:
+        """답변 캐시를 현재 문서 버전에 맞추고 그 버전을 반환합니다 (답변 저장 시 같은 버전인지 확인용)."""
+        if self.semantic_cache is None:
+            return None
+        self.semantic_cache.sync_corpus_version(self.corpus_version())
+        return self.semantic_cache.corpus_version
+
+    def lookup_cached_answer(self, question: str, namespace: str = "") -> Tuple[Optional[Dict[str, Any]], Optional[List[float]]]:
+        """(캐시된 답변, 질문 임베딩). 임베딩은 디스크 캐시를 거치며 이어지는 검색에서도 재사용됩니다."""
+        if self.semantic_cache is None:
+            return None, None
+        try:
+            question_embedding = self.embeddings.embed_query(question)
+            return self.semantic_cache.lookup(question_embedding, namespace=namespace), question_embedding
+        except Exception as e:
+            print(f"답변 캐시 조회 오류: {e}")
+            return None, None
+
+    def store_cached_answer(
+        self,
+        question: str,
+        question_embedding: Optional[List[float]],
+        response: Dict[str, Any],
+        namespace: str = "",
+        corpus_version: Optional[str] = None,
+    ) -> None:
+        """
+        검색된 문서가 있는 답변을 (재구성된) 질문 기준으로 캐시에 저장합니다.
+
+        corpus_version(답변을 시작할 때의 문서 버전)이 캐시의 현재 버전과 다르면 저장하지 않습니다.
+        """
+        if self.semantic_cache is None or not response.get("answer") or not response.get("source_documents"):
+            return
+        try:
+            generated_question = response.get("generated_question") or question
+            if generated_question != question or question_embedding is None:
+                question_embedding = self.embeddings.embed_query(generated_question)
+            self.semantic_cache.store(
+                question_embedding,
+                generated_question,
+                response["answer"],
+                response["source_documents"],
+                namespace=namespace,
+                corpus_version=corpus_version,
+            )
+        except Exception as e:
+            print(f"답변 캐시 저장 오류: {e}")
+
+    def answer(
+        self,
+        question: str,
+        chat_history: Optional[List[Any]] = None,
+        section: Optional[str] = None,
+        retrieval_mode: Optional[str] = None,
+        callbacks: Optional[List[Any]] = None,
+        cache_namespace: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """
+        질문 하나에 답합니다.
+
+        Returns:
+            answer, source_documents, generated_question, cache_hit
+            (SpeculativeRetrievalChain이면 retrieval_strategy도 포함)
+        """
+        namespace = (section or "") if cache_namespace is None else cache_namespace
+        question_embedding = None
+        # 답변을 만드는 동안 문서가 다시 수집되면 이전 문서로 만든 답변을 캐시에 저장하지 않도록 시작 시점의 버전을 기록
+        corpus_version = self.sync_cache_version()
+        if not chat_history:
+            with timed("cache_lookup"):
+                cached, question_embedding = self.lookup_cached_answer(question, namespace)
+            if cached:
+                # 캐시 적중: 체인을 실행하지 않고 저장된 답변 사용
+                return {
+                    "answer": cached["answer"],
+                    "source_documents": cached["source_documents"],
+                    "generated_question": question,
+                    "cache_hit": True,
+                }
+
+        # 공유 체인에는 메모리가 없으므로 요청한 쪽의 대화 기록을 입력으로 전달
+        with timed("chain"):
+            response = run_qa_chain(self.qa_chain(section, retrieval_mode), question, chat_history, callbacks)
+        response = {key: value for key, value in response.items() if key not in ("question", "chat_history")}
+        response["cache_hit"] = False
+        if response.get("answer"):
+            with timed("cache_store"):
+                self.store_cached_answer(question, question_embedding, response, namespace, corpus_version)
+        return response
@@ -0,0 +1,175 @@
+"""
+넓게 검색한 뒤 재정렬(rerank)하고, 토큰 예산 안에서 답변에 넣을 청크를 고르는 검색 단계입니다.
+
+1. 기본 검색기로 후보를 넉넉히(RERANK_CANDIDATES개) 가져옵니다.
+2. 질문과 각 후보의 관련도를 다시 계산합니다.
+   - RERANK_MODEL을 지정하고 sentence-transformers가 설치되어 있으면 CPU에서 CrossEncoder 사용
+   - 그렇지 않으면 어휘 점수(글자 bigram BM25)와 검색 순위를 RRF로 합친 가벼운 점수 사용
+3. 점수 순으로 CONTEXT_TOKEN_BUDGET 토큰이 찰 때까지 청크를 담습니다.
+   같은 source에서는 최대 RERANK_MAX_CHUNKS_PER_SOURCE개만 담고, 이웃 청크(chunk_index가 연속)의 겹치는 부분은 잘라냅니다.
+"""
+
+import math
+import os
+import re
+from collections import Counter
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+from ingest_pipeline import count_tokens
+from telemetry import timed
+
+RERANK_ENABLED = os.getenv("RERANK_ENABLED", "true").lower() in ("1", "true", "yes")
+RERANK_CANDIDATES = int(os.getenv("RERANK_CANDIDATES", "30"))
+# 예: cross-encoder/mmarco-mMiniLMv2-L12-H384-v1 (다국어). 비워두면 어휘 점수 사용
+RERANK_MODEL = os.getenv("RERANK_MODEL", "")
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "2000"))
+RERANK_MAX_CHUNKS = int(os.getenv("RERANK_MAX_CHUNKS", "6"))
+RERANK_MAX_CHUNKS_PER_SOURCE = int(os.getenv("RERANK_MAX_CHUNKS_PER_SOURCE", "2"))
+
+_WORD_PATTERN = re.compile(r"[0-9A-Za-z_]+|[가-힣]+")
+
+
+def load_cross_encoder(model_name: str = RERANK_MODEL) -> Optional[Any]:
+    """CrossEncoder 모델을 불러옵니다. 모델을 지정하지 않았거나 불러올 수 없으면 None (어휘 점수 사용)."""
+    if not model_name:
+        return None
+    try:
+        from sentence_transformers import CrossEncoder
+    except ImportError:
+        print("sentence-transformers가 설치되어 있지 않아 어휘 점수로 재정렬합니다.")
+        return None
+    try:
+        return CrossEncoder(model_name, device="cpu")
+    except Exception as e:
+        print(f"재정렬 모델 '{model_name}' 로드 실패 (어휘 점수 사용): {e}")
+        return None
+
+
+def lexical_terms(text: str) -> List[str]:
+    """
+    어휘 점수용 단어를 추출합니다.
+
+    영문/숫자는 소문자 단어 그대로, 한글은 조사가 붙어도 일치하도록 글자 bigram(한 글자 단어는 그대로)으로 나눕니다.
+    """
+    terms = []
+    for word in _WORD_PATTERN.findall(text.lower()):
+        if word[0] >= "가" and len(word) > 1:
+            terms.extend(word[i:i + 2] for i in range(len(word) - 1))
+        else:
+            terms.append(word)
+    return terms
+
+
+def lexical_scores(query: str, texts: Sequence[str], k1: float = 1.2, b: float = 0.75) -> List[float]:
+    """후보 문서 안에서 IDF를 계산한 BM25 점수."""
+    query_terms = set(lexical_terms(query))
+    doc_terms = [Counter(lexical_terms(text)) for text in texts]
+    if not query_terms or not doc_terms:
+        return [0.0] * len(texts)
+
+    avg_length = sum(sum(terms.values()) for terms in doc_terms) / len(doc_terms) or 1.0
+    scores = []
+    for terms in doc_terms:
+        length = sum(terms.values())
+        score = 0.0
+        for term in query_terms:
+            frequency = terms.get(term, 0)
+            if not frequency:
+                continue
+            document_frequency = sum(1 for other in doc_terms if term in other)
+            idf = math.log(1 + (len(doc_terms) - document_frequency + 0.5) / (document_frequency + 0.5))
+            score += idf * frequency * (k1 + 1) / (frequency + k1 * (1 - b + b * length / avg_length))
+        scores.append(score)
+    return scores
+
+
+def rerank_documents(query: str, docs: List[Document], cross_encoder: Optional[Any] = None, rrf_k: int = 60) -> List[Tuple[Document, float]]:
+    """후보 문서를 관련도 순으로 정렬하여 (문서, 점수) 목록을 반환합니다."""
+    if not docs:
+        return []
+    if cross_encoder is not None:
+        scores = [float(score) for score in cross_encoder.predict([(query, doc.page_content) for doc in docs])]
+    else:
+        # 어휘 점수 순위와 검색기 순위(입력 순서)를 RRF로 합침 (어휘가 전혀 겹치지 않아도 검색 순위는 반영)
+        lexical = lexical_scores(query, [doc.page_content for doc in docs])
+        lexical_rank = {index: rank for rank, index in enumerate(sorted(range(len(docs)), key=lambda i: -lexical[i]), start=1)}
+        scores = [
+            1 / (rrf_k + index + 1) + (1 / (rrf_k + lexical_rank[index]) if lexical[index] > 0 else 0.0)
+            for index in range(len(docs))
+        ]
+    return sorted(zip(docs, scores), key=lambda pair: pair[1], reverse=True)
+
+
+def overlap_size(previous: str, following: str, max_overlap: int = 200, min_overlap: int = 20) -> int:
+    """previous의 끝부분과 following의 앞부분이 겹치는 길이 (청크 분할 시 chunk_overlap). 없으면 0."""
+    for size in range(min(max_overlap, len(previous), len(following)), min_overlap, -1):
+        if previous.endswith(following[:size]):
+            return size
+    return 0
+
+
+def pack_documents(
+    ranked: List[Tuple[Document, float]],
+    token_budget: int = CONTEXT_TOKEN_BUDGET,
+    max_chunks: int = RERANK_MAX_CHUNKS,
+    max_chunks_per_source: int = RERANK_MAX_CHUNKS_PER_SOURCE,
+) -> List[Document]:
+    """
+    점수 순으로 토큰 예산 안에서 청크를 고릅니다.
+
+    예산을 넘는 청크는 건너뛰고 다음(더 짧은) 청크를 시도하며, 첫 청크는 예산을 넘더라도 항상 포함합니다.
+    """
+    packed: List[Document] = []
+    selected_by_source: Dict[str, List[Document]] = {}
+    seen_contents = set()
+    used_tokens = 0
+    for doc, score in ranked:
+        if len(packed) >= max_chunks:
+            break
+        source = doc.metadata.get("source", "")
+        same_source = selected_by_source.setdefault(source, [])
+        content = doc.page_content.strip()
+        if len(same_source) >= max_chunks_per_source or content in seen_contents:
+            continue
+
+        # 이미 담은 같은 페이지의 이웃 청크(앞/뒤)와 겹치는 부분 제거
+        chunk_index = doc.metadata.get("chunk_index")
+        if chunk_index is not None:
+            for other in same_source:
+                if other.metadata.get("chunk_index") == chunk_index - 1:
+                    content = content[overlap_size(other.page_content, content):].lstrip()
+                elif other.metadata.get("chunk_index") == chunk_index + 1:
+                    content = content[:len(content) - overlap_size(content, other.page_content)].rstrip()
+        if not content:
+            continue
+
+        tokens = count_tokens(content)
+        if packed and used_tokens + tokens > token_budget:
+            continue
+
+        packed_doc = Document(page_content=content, metadata={**doc.metadata, "rerank_score": score})
+        packed.append(packed_doc)
+        same_source.append(packed_doc)
+        seen_contents.add(doc.page_content.strip())
+        used_tokens += tokens
+    return packed
+
+
+class RerankingRetriever(BaseRetriever):
+    """기본 검색기로 후보를 넓게 가져와 재정렬한 뒤, 토큰 예산 안에서 청크를 골라 반환하는 검색기."""
+
+    base_retriever: BaseRetriever
+    cross_encoder: Optional[Any] = None
+    token_budget: int = CONTEXT_TOKEN_BUDGET
+    max_chunks: int = RERANK_MAX_CHUNKS
+    max_chunks_per_source: int = RERANK_MAX_CHUNKS_PER_SOURCE
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        candidates = self.base_retriever.invoke(query, config={"callbacks": run_manager.get_child()})
+        with timed("rerank", candidates=len(candidates)):
+            ranked = rerank_documents(query, candidates, self.cross_encoder)
+            return pack_documents(ranked, self.token_budget, self.max_chunks, self.max_chunks_per_source)
@@ -1,12 +1,22 @@
 #!/usr/bin/env python
 """
 Supabase 데이터베이스 테이블과 함수를 삭제하고 재생성하는 스크립트입니다.
-UUID를 사용하는 새 스키마를 적용합니다.
+UUID를 사용하는 새 스키마를 적용하고, 벡터 인덱스(HNSW 또는 ivfflat)를 생성/유지합니다.
+
+사용 예:
+    python reset_supabase_schema.py                      # 전체 재설정 SQL 출력 (HNSW 인덱스 포함)
+    python reset_supabase_schema.py --index ivfflat      # ivfflat 인덱스 (lists는 현재 행 수로 계산)
+    python reset_supabase_schema.py --maintain           # 인덱스 재생성/ANALYZE SQL만 출력
+    python reset_supabase_schema.py --maintain --apply   # DATABASE_URL로 직접 실행
 """
 
+import argparse
+import math
 import os
+from typing import List, Optional
+
 from dotenv import load_dotenv
-from supabase.client import Client, create_client
+from supabase.client import create_client
 
 # .env 파일에서 환경 변수 로드
 load_dotenv()
@@ -14,18 +24,8 @@ load_dotenv()
 # 환경 변수 확인
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_ANON_KEY = os.getenv("SUPABASE_ANON_KEY")
-
-# 필수 환경 변수 체크
-if not SUPABASE_URL or not SUPABASE_ANON_KEY:
-    missing_vars = []
-    if not SUPABASE_URL:
-        missing_vars.append("SUPABASE_URL")
-    if not SUPABASE_ANON_KEY:
-        missing_vars.append("SUPABASE_ANON_KEY")
-    
-    print(f"오류: 다음 환경 변수가 설정되지 않았습니다: {', '.join(missing_vars)}")
-    print("create_env.py 스크립트로 생성된 .env 파일을 편집하여 필요한 값을 채워주세요.")
-    exit(1)
+# Postgres 직접 연결 문자열 (Supabase Dashboard -> Project Settings -> Database), --apply 사용 시 필요
+DATABASE_URL = os.getenv("DATABASE_URL")
 
 # SQL 쿼리 정의
 DROP_TABLE_QUERY = """
@@ -33,7 +33,11 @@ DROP TABLE IF EXISTS documents;
 """
 
 DROP_FUNCTION_QUERY = """
-DROP FUNCTION IF EXISTS match_documents;
+DROP FUNCTION IF EXISTS match_documents(VECTOR, FLOAT, INT);
+DROP FUNCTION IF EXISTS match_documents(VECTOR, FLOAT, INT, INT, INT);
+DROP FUNCTION IF EXISTS match_documents(VECTOR, FLOAT, INT, INT, INT, JSONB);
+DROP FUNCTION IF EXISTS hybrid_match_documents(TEXT, VECTOR, INT, INT, INT, FLOAT, FLOAT, INT, INT, JSONB);
+DROP FUNCTION IF EXISTS list_document_sections();
 """
 
 CREATE_TABLE_QUERY = """
@@ -45,11 +49,26 @@ CREATE TABLE IF NOT EXISTS documents (
 );
 """
 
+# 수집 시 갱신되는 문서 버전 등 앱 전역 상태 (documents를 재설정해도 유지되므로 DROP하지 않음)
+CREATE_APP_STATE_TABLE_QUERY = """
+CREATE TABLE IF NOT EXISTS app_state (
+  key TEXT PRIMARY KEY,
+  value JSONB,
+  updated_at TIMESTAMPTZ DEFAULT NOW()
+);
+"""
+
+# 거리 순 상위 match_count개를 먼저 고르고(ANN 인덱스 사용) 그 안에서만 임계값을 적용
+# filter(JSONB)는 metadata @> filter 조건으로 인덱스 검색 중에 적용 (pgvector 0.8+는 iterative scan 사용)
+# 빈 필터('{}')나 NULL이면 조건 없는 쿼리로 분기하여 벡터 인덱스 순서 스캔을 유지 (metadata가 NULL인 행도 포함)
 CREATE_FUNCTION_QUERY = """
 CREATE OR REPLACE FUNCTION match_documents (
   query_embedding VECTOR(1536),
   match_threshold FLOAT DEFAULT 0.5,
-  match_count INT DEFAULT 5
+  match_count INT DEFAULT 5,
+  ef_search INT DEFAULT 40,
+  probes INT DEFAULT 10,
+  filter JSONB DEFAULT '{}'
 )
 RETURNS TABLE (
   id UUID,
@@ -60,52 +79,394 @@ RETURNS TABLE (
 LANGUAGE plpgsql
 AS $$
 BEGIN
+  PERFORM set_config('hnsw.ef_search', GREATEST(ef_search, match_count)::TEXT, true);
+  PERFORM set_config('ivfflat.probes', probes::TEXT, true);
+  IF filter IS NULL OR filter = '{}'::JSONB THEN
+    RETURN QUERY
+    SELECT
+      nearest.id,
+      nearest.content,
+      nearest.metadata,
+      1 - nearest.distance AS similarity
+    FROM (
+      SELECT
+        documents.id,
+        documents.content,
+        documents.metadata,
+        documents.embedding <=> query_embedding AS distance
+      FROM documents
+      ORDER BY documents.embedding <=> query_embedding ASC
+      LIMIT match_count
+    ) AS nearest
+    WHERE 1 - nearest.distance > match_threshold
+    ORDER BY nearest.distance ASC;
+    RETURN;
+  END IF;
+
+  BEGIN
+    PERFORM set_config('hnsw.iterative_scan', 'relaxed_order', true);
+    PERFORM set_config('ivfflat.iterative_scan', 'relaxed_order', true);
+  EXCEPTION WHEN OTHERS THEN
+    NULL;
+  END;
+
+  RETURN QUERY
+  SELECT
+    nearest.id,
+    nearest.content,
+    nearest.metadata,
+    1 - nearest.distance AS similarity
+  FROM (
+    SELECT
+      documents.id,
+      documents.content,
+      documents.metadata,
+      documents.embedding <=> query_embedding AS distance
+    FROM documents
+    WHERE documents.metadata @> filter
+    ORDER BY documents.embedding <=> query_embedding ASC
+    LIMIT match_count
+  ) AS nearest
+  WHERE 1 - nearest.distance > match_threshold
+  ORDER BY nearest.distance ASC;
+END;
+$$;
+"""
+
+# 두 페이지 이상을 포함하는 URL 경로 접두사(metadata.sections)를 섹션으로 반환
+CREATE_LIST_SECTIONS_FUNCTION_QUERY = """
+CREATE OR REPLACE FUNCTION list_document_sections ()
+RETURNS TABLE (
+  section TEXT,
+  page_count BIGINT
+)
+LANGUAGE sql STABLE
+AS $$
+  SELECT
+    prefix AS section,
+    COUNT(DISTINCT documents.metadata->>'source') AS page_count
+  FROM documents,
+    jsonb_array_elements_text(
+      CASE WHEN jsonb_typeof(documents.metadata->'sections') = 'array'
+        THEN documents.metadata->'sections' ELSE '[]'::JSONB END
+    ) AS prefix
+  GROUP BY prefix
+  HAVING COUNT(DISTINCT documents.metadata->>'source') > 1
+  ORDER BY prefix;
+$$;
+"""
+
+# match_documents의 filter(metadata @> filter)에 사용하는 GIN 인덱스
+CREATE_METADATA_INDEX_QUERY = """
+CREATE INDEX IF NOT EXISTS documents_metadata_gin_idx ON documents
+  USING gin (metadata jsonb_path_ops);
+"""
+
+# 하이브리드 검색용 전문 검색(tsvector) 열과 인덱스, 한국어 부분 일치용 trigram 인덱스
+CREATE_FULL_TEXT_INDEX_QUERY = """
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+ALTER TABLE documents ADD COLUMN IF NOT EXISTS fts TSVECTOR
+  GENERATED ALWAYS AS (to_tsvector('simple', COALESCE(content, ''))) STORED;
+CREATE INDEX IF NOT EXISTS documents_fts_idx ON documents USING gin (fts);
+CREATE INDEX IF NOT EXISTS documents_content_trgm_idx ON documents USING gin (content gin_trgm_ops);
+"""
+
+# 전문 검색 순위와 벡터 검색 순위를 RRF(reciprocal rank fusion)로 합친 하이브리드 검색
+CREATE_HYBRID_FUNCTION_QUERY = """
+CREATE OR REPLACE FUNCTION hybrid_match_documents (
+  query_text TEXT,
+  query_embedding VECTOR(1536),
+  match_count INT DEFAULT 5,
+  candidate_count INT DEFAULT 30,
+  rrf_k INT DEFAULT 60,
+  full_text_weight FLOAT DEFAULT 1.0,
+  semantic_weight FLOAT DEFAULT 1.0,
+  ef_search INT DEFAULT 40,
+  probes INT DEFAULT 10,
+  filter JSONB DEFAULT '{}'
+)
+RETURNS TABLE (
+  id UUID,
+  content TEXT,
+  metadata JSONB,
+  similarity FLOAT,
+  score FLOAT
+)
+LANGUAGE plpgsql
+AS $$
+#variable_conflict use_column
+DECLARE
+  lexical_query TSQUERY := NULLIF(replace(plainto_tsquery('simple', query_text)::TEXT, '&', '|'), '')::TSQUERY;
+  semantic_ids UUID[];
+  lexical_ids UUID[];
+BEGIN
+  PERFORM set_config('hnsw.ef_search', GREATEST(ef_search, candidate_count)::TEXT, true);
+  PERFORM set_config('ivfflat.probes', probes::TEXT, true);
+  IF filter IS NULL OR filter = '{}'::JSONB THEN
+    SELECT array_agg(nearest.doc_id ORDER BY nearest.distance) INTO semantic_ids
+    FROM (
+      SELECT documents.id AS doc_id, documents.embedding <=> query_embedding AS distance
+      FROM documents
+      ORDER BY documents.embedding <=> query_embedding ASC
+      LIMIT candidate_count
+    ) AS nearest;
+    SELECT array_agg(matched.doc_id ORDER BY matched.text_rank DESC) INTO lexical_ids
+    FROM (
+      SELECT
+        documents.id AS doc_id,
+        COALESCE(ts_rank_cd(documents.fts, lexical_query), 0) + word_similarity(query_text, documents.content) AS text_rank
+      FROM documents
+      WHERE documents.fts @@ lexical_query OR query_text <% documents.content
+      ORDER BY text_rank DESC
+      LIMIT candidate_count
+    ) AS matched;
+  ELSE
+    BEGIN
+      PERFORM set_config('hnsw.iterative_scan', 'relaxed_order', true);
+      PERFORM set_config('ivfflat.iterative_scan', 'relaxed_order', true);
+    EXCEPTION WHEN OTHERS THEN
+      NULL;
+    END;
+    SELECT array_agg(nearest.doc_id ORDER BY nearest.distance) INTO semantic_ids
+    FROM (
+      SELECT documents.id AS doc_id, documents.embedding <=> query_embedding AS distance
+      FROM documents
+      WHERE documents.metadata @> filter
+      ORDER BY documents.embedding <=> query_embedding ASC
+      LIMIT candidate_count
+    ) AS nearest;
+    SELECT array_agg(matched.doc_id ORDER BY matched.text_rank DESC) INTO lexical_ids
+    FROM (
+      SELECT
+        documents.id AS doc_id,
+        COALESCE(ts_rank_cd(documents.fts, lexical_query), 0) + word_similarity(query_text, documents.content) AS text_rank
+      FROM documents
+      WHERE documents.metadata @> filter
+        AND (documents.fts @@ lexical_query OR query_text <% documents.content)
+      ORDER BY text_rank DESC
+      LIMIT candidate_count
+    ) AS matched;
+  END IF;
+
   RETURN QUERY
+  WITH semantic AS (
+    SELECT candidate.doc_id, candidate.rank_ix
+    FROM unnest(semantic_ids) WITH ORDINALITY AS candidate(doc_id, rank_ix)
+  ),
+  lexical AS (
+    SELECT candidate.doc_id, candidate.rank_ix
+    FROM unnest(lexical_ids) WITH ORDINALITY AS candidate(doc_id, rank_ix)
+  )
   SELECT
     documents.id,
     documents.content,
     documents.metadata,
-    1 - (documents.embedding <=> query_embedding) AS similarity
-  FROM documents
-  WHERE 1 - (documents.embedding <=> query_embedding) > match_threshold
-  ORDER BY documents.embedding <=> query_embedding ASC
+    1 - (documents.embedding <=> query_embedding) AS similarity,
+    COALESCE(full_text_weight / (rrf_k + lexical.rank_ix), 0.0)
+      + COALESCE(semantic_weight / (rrf_k + semantic.rank_ix), 0.0) AS score
+  FROM semantic
+  FULL OUTER JOIN lexical ON lexical.doc_id = semantic.doc_id
+  JOIN documents ON documents.id = COALESCE(semantic.doc_id, lexical.doc_id)
+  ORDER BY score DESC
   LIMIT match_count;
 END;
 $$;
 """
 
+HNSW_INDEX_NAME = "documents_embedding_hnsw_idx"
+IVFFLAT_INDEX_NAME = "documents_embedding_ivfflat_idx"
+# ivfflat 재생성 시 새 인덱스를 먼저 이 이름으로 만든 뒤 기존 인덱스와 바꿔 끼움
+IVFFLAT_BUILD_INDEX_NAME = "documents_embedding_ivfflat_new_idx"
+
+
+def ivfflat_lists_for_row_count(row_count: int) -> int:
+    """pgvector 권장값: 100만 행 이하는 rows / 1000, 그 이상은 sqrt(rows)."""
+    if row_count <= 1_000_000:
+        return max(1, row_count // 1000)
+    return int(math.sqrt(row_count))
+
+
+def build_vector_index_sql(index_type: str = "hnsw", row_count: int = 0, concurrently: bool = False) -> List[str]:
+    """
+    벡터 인덱스를 (재)생성하는 SQL 문 목록을 만듭니다.
+
+    Args:
+        index_type: "hnsw" 또는 "ivfflat"
+        row_count: 현재 행 수 (ivfflat의 lists 계산에 사용)
+        concurrently: True이면 테이블 잠금 없이 인덱스를 만듭니다 (트랜잭션 밖에서 실행해야 함)
+    """
+    option = " CONCURRENTLY" if concurrently else ""
+    if index_type == "hnsw":
+        return [
+            f"DROP INDEX{option} IF EXISTS {IVFFLAT_INDEX_NAME};",
+            f"CREATE INDEX{option} IF NOT EXISTS {HNSW_INDEX_NAME} ON documents "
+            "USING hnsw (embedding vector_cosine_ops) WITH (m = 16, ef_construction = 64);",
+            "ANALYZE documents;",
+        ]
+    if index_type == "ivfflat":
+        lists = ivfflat_lists_for_row_count(row_count)
+        # lists 값은 빌드 시점의 데이터로 군집을 나누므로, 행 수가 크게 바뀌면 다시 만들어야 함
+        # 새 인덱스를 다른 이름으로 다 만든 뒤에 기존 인덱스를 지우므로, 재생성 중에도 검색이 순차 스캔으로 떨어지지 않음
+        return [
+            # 이전에 중단된 CONCURRENTLY 빌드가 남긴 (INVALID) 인덱스 정리
+            f"DROP INDEX{option} IF EXISTS {IVFFLAT_BUILD_INDEX_NAME};",
+            f"CREATE INDEX{option} {IVFFLAT_BUILD_INDEX_NAME} ON documents "
+            f"USING ivfflat (embedding vector_cosine_ops) WITH (lists = {lists});",
+            f"DROP INDEX{option} IF EXISTS {IVFFLAT_INDEX_NAME};",
+            f"DROP INDEX{option} IF EXISTS {HNSW_INDEX_NAME};",
+            f"ALTER INDEX {IVFFLAT_BUILD_INDEX_NAME} RENAME TO {IVFFLAT_INDEX_NAME};",
+            "ANALYZE documents;",
+        ]
+    raise ValueError(f"지원하지 않는 인덱스 종류입니다: {index_type}")
+
+
+def build_index_maintenance_sql(index_type: str = "hnsw", row_count: int = 0) -> List[str]:
+    """
+    수집 후 인덱스를 유지하는 SQL 문 목록을 만듭니다.
+
+    HNSW는 삽입/삭제를 반영하므로 VACUUM ANALYZE로 삭제된 항목만 정리하고,
+    ivfflat은 현재 행 수로 lists를 다시 계산하여 인덱스를 재생성합니다 (새 인덱스를 만든 뒤 기존 인덱스와 교체).
+    """
+    if index_type == "hnsw":
+        return ["VACUUM ANALYZE documents;"]
+    return build_vector_index_sql(index_type, row_count, concurrently=True)
+
+
+def count_documents_via_supabase() -> Optional[int]:
+    """Supabase REST API로 documents 행 수를 조회합니다."""
+    supabase = create_client(SUPABASE_URL, SUPABASE_ANON_KEY)
+    return supabase.table("documents").select("id", count="exact").limit(1).execute().count
+
+
+def execute_sql(statements: List[str]) -> None:
+    """DATABASE_URL로 직접 연결하여 SQL 문을 순서대로 실행합니다 (CONCURRENTLY 사용을 위해 autocommit)."""
+    import psycopg2
+
+    conn = psycopg2.connect(DATABASE_URL)
+    conn.autocommit = True
+    try:
+        with conn.cursor() as cur:
+            for statement in statements:
+                print(f"실행 중: {statement.strip().splitlines()[0]} ...")
+                cur.execute(statement)
+    finally:
+        conn.close()
+
+
+def count_documents() -> int:
+    if DATABASE_URL:
+        import psycopg2
+
+        with psycopg2.connect(DATABASE_URL) as conn, conn.cursor() as cur:
+            cur.execute("SELECT COUNT(*) FROM documents")
+            return cur.fetchone()[0]
+    return count_documents_via_supabase() or 0
+
+
 def main():
-    print("Supabase 데이터베이스 스키마 초기화 및 재설정을 시작합니다...")
-    
+    parser = argparse.ArgumentParser(description="Supabase 스키마 재설정 및 벡터 인덱스 관리")
+    parser.add_argument("--index", choices=["hnsw", "ivfflat"], default="hnsw", help="생성할 벡터 인덱스 종류")
+    parser.add_argument("--maintain", action="store_true", help="테이블은 유지하고 인덱스 유지 SQL만 생성")
+    parser.add_argument("--apply", action="store_true", help="출력 대신 DATABASE_URL로 직접 실행")
+    args = parser.parse_args()
+
+    # 필수 환경 변수 체크
+    if args.apply and not DATABASE_URL:
+        print("오류: --apply를 사용하려면 DATABASE_URL 환경 변수가 필요합니다.")
+        exit(1)
+    if not DATABASE_URL and (not SUPABASE_URL or not SUPABASE_ANON_KEY):
+        missing_vars = []
+        if not SUPABASE_URL:
+            missing_vars.append("SUPABASE_URL")
+        if not SUPABASE_ANON_KEY:
+            missing_vars.append("SUPABASE_ANON_KEY")
+
+        print(f"오류: 다음 환경 변수가 설정되지 않았습니다: {', '.join(missing_vars)}")
+        print("create_env.py 스크립트로 생성된 .env 파일을 편집하여 필요한 값을 채워주세요.")
+        exit(1)
+
+    if args.maintain:
+        print("벡터 인덱스 유지 작업을 준비합니다...")
+    else:
+        print("Supabase 데이터베이스 스키마 초기화 및 재설정을 시작합니다...")
+
     try:
-        # Supabase 클라이언트 초기화
-        supabase = create_client(SUPABASE_URL, SUPABASE_ANON_KEY)
-        print("Supabase 연결 성공!")
-        
-        # 주의: Supabase REST API로는 SQL을 직접 실행할 수 없습니다.
-        # 아래는 실제로 실행되지 않는 코드로, 참고용으로만 제공합니다.
-        print("\n중요: 이 스크립트는 실제로 데이터베이스 작업을 수행하지 않습니다.")
+        row_count = 0
+        if args.maintain:
+            row_count = count_documents()
+            print(f"현재 documents 행 수: {row_count}")
+            if args.index == "ivfflat":
+                print(f"ivfflat lists = {ivfflat_lists_for_row_count(row_count)}")
+
+        if args.maintain:
+            index_statements = build_index_maintenance_sql(args.index, row_count)
+            statements = index_statements
+        else:
+            # ivfflat은 빌드 시점의 데이터로 군집을 나누므로 빈 테이블에는 만들지 않음 (수집 후 --maintain으로 생성)
+            index_statements = [] if args.index == "ivfflat" else build_vector_index_sql(args.index)
+            statements = [
+                DROP_FUNCTION_QUERY,
+                DROP_TABLE_QUERY,
+                CREATE_TABLE_QUERY,
+                CREATE_APP_STATE_TABLE_QUERY,
+                CREATE_FUNCTION_QUERY,
+                CREATE_LIST_SECTIONS_FUNCTION_QUERY,
+                CREATE_METADATA_INDEX_QUERY,
+                CREATE_FULL_TEXT_INDEX_QUERY,
+                CREATE_HYBRID_FUNCTION_QUERY,
+            ] + index_statements
+
+        if args.apply:
+            if not args.maintain:
+                user_confirm = input("documents 테이블의 모든 데이터가 삭제됩니다. 계속하시겠습니까? (yes/no): ")
+                if user_confirm.lower() != 'yes':
+                    print("취소되었습니다.")
+                    return
+            execute_sql(statements)
+            print("\n완료되었습니다.")
+            if not args.maintain and args.index == "ivfflat":
+                print("ivfflat 인덱스는 수집 후 `python reset_supabase_schema.py --index ivfflat --maintain --apply`로 만드세요.")
+            return
+
+        # Supabase REST API로는 SQL을 직접 실행할 수 없으므로 SQL 에디터에서 실행할 쿼리를 출력합니다.
+        print("\n중요: 이 스크립트는 --apply 없이 실제로 데이터베이스 작업을 수행하지 않습니다.")
         print("Supabase 대시보드의 SQL 에디터에서 다음 SQL 쿼리를 직접 실행해야 합니다:")
-        
-        print("\n--- 기존 테이블 및 함수 삭제 ---")
-        print(DROP_FUNCTION_QUERY)
-        print(DROP_TABLE_QUERY)
-        
-        print("\n--- 새 테이블 생성 ---")
-        print(CREATE_TABLE_QUERY)
-        
-        print("\n--- 유사도 검색 함수 생성 ---")
-        print(CREATE_FUNCTION_QUERY)
-        
-        print("\n--- 선택 사항: 인덱스 생성 ---")
-        print("-- CREATE INDEX ON documents USING ivfflat (embedding vector_cosine_ops)")
-        print("-- WITH (lists = 100);")
-        
-        print("\n위 SQL을 Supabase의 SQL 에디터에서 실행한 후, ingest_gitbook.py 스크립트를 다시 실행하세요.")
-        
+
+        if not args.maintain:
+            print("\n--- 기존 테이블 및 함수 삭제 ---")
+            print(DROP_FUNCTION_QUERY)
+            print(DROP_TABLE_QUERY)
+
+            print("\n--- 새 테이블 생성 ---")
+            print(CREATE_TABLE_QUERY)
+            print(CREATE_APP_STATE_TABLE_QUERY)
+
+            print("\n--- 유사도 검색 함수 생성 ---")
+            print(CREATE_FUNCTION_QUERY)
+
+            print("\n--- 섹션 목록 함수 및 메타데이터 인덱스 생성 ---")
+            print(CREATE_LIST_SECTIONS_FUNCTION_QUERY)
+            print(CREATE_METADATA_INDEX_QUERY)
+
+            print("\n--- 하이브리드 검색 (전문 검색 + 벡터) 인덱스 및 함수 생성 ---")
+            print(CREATE_FULL_TEXT_INDEX_QUERY)
+            print(CREATE_HYBRID_FUNCTION_QUERY)
+
+        print(f"\n--- 벡터 인덱스 ({args.index}) ---")
+        for statement in index_statements:
+            print(statement)
+        if not args.maintain and args.index == "ivfflat":
+            print("-- ivfflat 인덱스는 빈 테이블에 만들면 군집이 의미가 없으므로 여기서는 만들지 않습니다.")
+            print("-- 수집(ingest_gitbook.py) 후 `python reset_supabase_schema.py --index ivfflat --maintain`으로 생성하세요.")
+
+        if args.maintain:
+            print("\n위 SQL을 수집(ingest_gitbook.py) 후 주기적으로 실행하세요.")
+        else:
+            print("\n위 SQL을 Supabase의 SQL 에디터에서 실행한 후, ingest_gitbook.py 스크립트를 다시 실행하세요.")
+
     except Exception as e:
         print(f"오류 발생: {e}")
         return
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
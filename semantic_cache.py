@@ -0,0 +1,142 @@
+"""
+질문 임베딩의 유사도로 이전 답변을 재사용하는 의미 기반 답변 캐시입니다.
+
+같은 질문(또는 표현만 다른 질문)이 반복되면 질문 재구성 LLM 호출, 검색, 답변 LLM 호출 없이
+저장된 답변을 바로 반환합니다. 항목은 다음 경우에 무효화됩니다.
+
+- 저장 후 ttl_seconds가 지난 경우
+- 수집으로 문서 버전(corpus_version)이 바뀐 경우 (캐시 전체 삭제)
+  답변을 만드는 동안 버전이 바뀌면 이전 문서로 만든 답변은 저장하지 않습니다 (store의 corpus_version).
+- 항목 수가 max_entries를 넘는 경우 (가장 오래된 항목부터 삭제)
+
+검색 범위(섹션)가 다르면 같은 질문이라도 별도 항목으로 저장합니다.
+"""
+
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.95"))
+SEMANTIC_CACHE_TTL_SECONDS = float(os.getenv("SEMANTIC_CACHE_TTL_SECONDS", str(24 * 60 * 60)))
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "1000"))
+
+
+class SemanticAnswerCache:
+    """프로세스 안에서 모든 세션이 공유하는 질문 임베딩 → 답변 캐시 (스레드 안전)."""
+
+    def __init__(
+        self,
+        similarity_threshold: float = SEMANTIC_CACHE_THRESHOLD,
+        ttl_seconds: float = SEMANTIC_CACHE_TTL_SECONDS,
+        max_entries: int = SEMANTIC_CACHE_MAX_ENTRIES,
+    ):
+        self.similarity_threshold = similarity_threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.corpus_version: Optional[str] = None
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries: List[Dict[str, Any]] = []
+        self._vectors: Optional[np.ndarray] = None  # 정규화된 질문 임베딩 행렬 (항목 순서와 동일)
+
+    @staticmethod
+    def _normalize(embedding: List[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _rebuild_vectors(self) -> None:
+        self._vectors = np.stack([entry["vector"] for entry in self._entries]) if self._entries else None
+
+    def sync_corpus_version(self, corpus_version: Optional[str]) -> None:
+        """문서 버전이 바뀌었으면 캐시를 비웁니다."""
+        with self._lock:
+            if corpus_version != self.corpus_version:
+                if self._entries:
+                    print(f"문서 버전이 바뀌어 답변 캐시 {len(self._entries)}개 항목을 삭제합니다.")
+                self._entries = []
+                self._vectors = None
+                self.corpus_version = corpus_version
+
+    def lookup(self, embedding: List[float], namespace: str = "") -> Optional[Dict[str, Any]]:
+        """
+        가장 유사한 저장 질문의 유사도가 임계값 이상이면 해당 항목을 반환합니다.
+
+        Returns:
+            {"question", "answer", "source_documents", "similarity"} 또는 None
+        """
+        query = self._normalize(embedding)
+        with self._lock:
+            self._evict_expired()
+            if self._vectors is None:
+                self.misses += 1
+                return None
+
+            similarities = self._vectors @ query
+            for index in np.argsort(-similarities):
+                similarity = float(similarities[index])
+                if similarity < self.similarity_threshold:
+                    break
+                entry = self._entries[index]
+                if entry["namespace"] == namespace:
+                    self.hits += 1
+                    return {
+                        "question": entry["question"],
+                        "answer": entry["answer"],
+                        "source_documents": entry["source_documents"],
+                        "similarity": similarity,
+                    }
+            self.misses += 1
+            return None
+
+    def store(
+        self,
+        embedding: List[float],
+        question: str,
+        answer: str,
+        source_documents: List[Any],
+        namespace: str = "",
+        corpus_version: Optional[str] = None,
+    ) -> bool:
+        """
+        질문 임베딩과 답변을 저장합니다.
+
+        corpus_version은 답변을 만들기 시작할 때(sync_corpus_version 후) 캐시의 문서 버전이며,
+        그 사이에 다른 요청이 캐시를 새 버전으로 바꿨다면 저장하지 않고 False를 반환합니다.
+        """
+        entry = {
+            "vector": self._normalize(embedding),
+            "question": question,
+            "answer": answer,
+            "source_documents": list(source_documents),
+            "namespace": namespace,
+            "created_at": time.monotonic(),
+        }
+        with self._lock:
+            if corpus_version != self.corpus_version:
+                return False
+            self._entries.append(entry)
+            if len(self._entries) > self.max_entries:
+                self._entries = self._entries[-self.max_entries:]
+            self._rebuild_vectors()
+            return True
+
+    def _evict_expired(self) -> None:
+        """TTL이 지난 항목을 삭제합니다 (lock을 잡은 상태에서 호출)."""
+        cutoff = time.monotonic() - self.ttl_seconds
+        if self._entries and self._entries[0]["created_at"] < cutoff:
+            self._entries = [entry for entry in self._entries if entry["created_at"] >= cutoff]
+            self._rebuild_vectors()
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+            "entries": len(self._entries),
+        }
@@ -0,0 +1,175 @@
+"""
+Streamlit 앱의 콜드 스타트 시간(첫 화면까지 걸린 시간, 모듈별 import 시간, warm-up 단계별 시간)을 기록합니다.
+
+app.py는 첫 화면에 필요 없는 무거운 모듈(LangChain 체인/메모리, OpenAI, Supabase 클라이언트)을 import하지 않고 화면을 먼저 그린 뒤,
+warm-up 작업으로 모듈 import, 공유 클라이언트 생성, 문서 섹션/추천 질문 조회를 백그라운드에서 미리 실행합니다.
+첫 화면 시간과 warm-up 결과는 구조화 로그("startup", "warmup" 이벤트)와 지표(stage="startup_first_render", "startup_warmup")로 남습니다.
+
+사용 예:
+    python startup_profile.py                  # 새 프로세스에서 app.py를 한 번 실행(Streamlit AppTest)하고 리포트 출력
+    python startup_profile.py --target-ms 800   # 첫 화면 시간이 목표를 넘거나 무거운 모듈을 미리 import하면 종료 코드 1
+"""
+
+import argparse
+import importlib
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import Executor, Future
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from telemetry import log_event, registry
+
+# 첫 화면 시간 목표 (밀리초)
+STARTUP_TARGET_MS = float(os.getenv("STARTUP_TARGET_MS", "1500"))
+
+# 첫 화면을 그리기 전에 import되면 안 되는 무거운 모듈 (warm-up이 백그라운드에서 import)
+HEAVY_MODULES = ("openai", "langchain_openai", "langchain.memory", "langchain.chains", "langsmith", "supabase", "tiktoken", "numpy")
+
+
+def _elapsed_ms(start: float) -> float:
+    return round((time.perf_counter() - start) * 1000, 1)
+
+
+class StartupProfile:
+    """프로세스의 첫 화면 시간과 warm-up 결과 (모든 세션이 공유, 프로세스당 한 번 기록)."""
+
+    def __init__(self):
+        self.first_render_ms: Optional[float] = None
+        self.heavy_modules_at_first_render: List[str] = []
+        self.warmup_ms: Optional[float] = None
+        self.imports: Dict[str, float] = {}
+        self.stages: Dict[str, float] = {}
+        self.errors: Dict[str, str] = {}
+        self._warmup: Optional[Future] = None
+        self._lock = threading.Lock()
+
+    def record_first_render(self, script_started: float) -> None:
+        """이 프로세스에서 처음으로 화면을 다 그렸을 때 한 번만 기록합니다 (script_started: 그 실행의 시작 시각)."""
+        with self._lock:
+            if self.first_render_ms is not None:
+                return
+            self.first_render_ms = _elapsed_ms(script_started)
+            self.heavy_modules_at_first_render = [name for name in HEAVY_MODULES if name in sys.modules]
+        registry.observe("startup_first_render", self.first_render_ms / 1000)
+        log_event(
+            "startup",
+            first_render_ms=self.first_render_ms,
+            heavy_modules_at_first_render=self.heavy_modules_at_first_render,
+        )
+
+    def import_module(self, name: str) -> None:
+        """모듈을 import하고 걸린 시간을 기록합니다 (앞에서 이미 import된 의존 모듈의 시간은 포함되지 않음)."""
+        start = time.perf_counter()
+        try:
+            importlib.import_module(name)
+        except Exception as e:
+            self.errors[f"import {name}"] = f"{type(e).__name__}: {e}"
+        finally:
+            self.imports[name] = _elapsed_ms(start)
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """warm-up 단계의 실행 시간을 기록합니다. 실패해도 다음 단계를 계속하도록 예외는 기록만 합니다."""
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception as e:
+            self.errors[name] = f"{type(e).__name__}: {e}"
+        finally:
+            self.stages[name] = _elapsed_ms(start)
+
+    def start_warmup(self, executor: Executor, warm_up: Callable[[], None]) -> Future:
+        """warm-up 작업을 프로세스당 한 번만 백그라운드로 시작합니다."""
+        with self._lock:
+            if self._warmup is None:
+                self._warmup = executor.submit(self._run_warmup, warm_up)
+            return self._warmup
+
+    def _run_warmup(self, warm_up: Callable[[], None]) -> None:
+        start = time.perf_counter()
+        try:
+            warm_up()
+        finally:
+            self.warmup_ms = _elapsed_ms(start)
+            registry.observe("startup_warmup", self.warmup_ms / 1000)
+            log_event("warmup", warmup_ms=self.warmup_ms, imports=self.imports, stages=self.stages, errors=self.errors)
+
+    @property
+    def warmup_done(self) -> bool:
+        return self._warmup is not None and self._warmup.done()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "first_render_ms": self.first_render_ms,
+            "heavy_modules_at_first_render": self.heavy_modules_at_first_render,
+            "warmup_ms": self.warmup_ms,
+            "imports": dict(self.imports),
+            "stages": dict(self.stages),
+            "errors": dict(self.errors),
+        }
+
+
+startup_profile = StartupProfile()
+
+
+def print_report(report: Dict[str, Any], target_ms: float) -> None:
+    print(f"첫 화면: {report['first_render_ms']:,.0f} ms (목표 {target_ms:,.0f} ms, 스크립트 실행 {report['script_run_ms']:,.0f} ms)")
+    if report["heavy_modules_at_first_render"]:
+        print(f"  첫 화면 전에 import된 무거운 모듈: {', '.join(report['heavy_modules_at_first_render'])}")
+    if report["warmup_ms"] is None:
+        print("warm-up: 시간 안에 끝나지 않음")
+    else:
+        print(f"warm-up: {report['warmup_ms']:,.0f} ms")
+    print("\n모듈별 import 시간 (warm-up 순서, 먼저 import된 의존 모듈 시간은 앞 모듈에 포함):")
+    for name, ms in report["imports"].items():
+        print(f"  {name:28} {ms:>8,.0f} ms")
+    print("\nwarm-up 단계별 시간:")
+    for name, ms in report["stages"].items():
+        print(f"  {name:28} {ms:>8,.0f} ms")
+    for name, error in report["errors"].items():
+        print(f"  오류 - {name}: {error}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Streamlit 앱 콜드 스타트 시간 측정")
+    parser.add_argument("--app", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py"), help="측정할 Streamlit 앱 파일")
+    parser.add_argument("--target-ms", type=float, default=STARTUP_TARGET_MS, help="첫 화면 시간 목표 (밀리초)")
+    parser.add_argument("--warmup-timeout", type=float, default=120.0, help="warm-up 완료를 기다릴 최대 시간 (초)")
+    parser.add_argument("--json", action="store_true", help="리포트를 JSON으로 출력")
+    args = parser.parse_args()
+
+    from streamlit.testing.v1 import AppTest
+
+    # 앱이 기록하는 객체 (이 파일을 직접 실행하면 __main__과 startup_profile 모듈이 따로 로드됨)
+    from startup_profile import startup_profile as profile
+
+    app_test = AppTest.from_file(args.app, default_timeout=args.warmup_timeout)
+    start = time.perf_counter()
+    app_test.run()
+    script_run_ms = _elapsed_ms(start)
+    if app_test.exception:
+        print(f"앱 실행 중 예외: {[exception.value for exception in app_test.exception]}")
+        sys.exit(1)
+    if profile.first_render_ms is None:
+        print(f"앱이 첫 화면을 다 그리지 못했습니다 (환경 변수 확인): {[error.value for error in app_test.error]}")
+        sys.exit(1)
+
+    deadline = time.monotonic() + args.warmup_timeout
+    while not profile.warmup_done and time.monotonic() < deadline:
+        time.sleep(0.05)
+
+    report = {**profile.to_dict(), "script_run_ms": script_run_ms, "target_ms": args.target_ms}
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    else:
+        print_report(report, args.target_ms)
+    if report["first_render_ms"] > args.target_ms or report["heavy_modules_at_first_render"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+#!/usr/bin/env python
+"""
+추천 질문 풀(pool)을 미리 생성하여 저장하고 읽어오는 모듈입니다.
+
+추천 질문은 세션마다 생성하지 않고, 수집(ingest_gitbook.py) 직후 또는 이 스크립트를 주기적으로 실행하여
+한 번만 생성합니다. 생성된 질문은 Supabase 'app_state' 테이블(suggested_questions 키)과 로컬 파일에 저장되며,
+앱은 이를 프로세스 전역 캐시로 읽어 무작위로 몇 개씩 보여주므로 페이지 로드 시 OpenAI를 호출하지 않습니다.
+
+사용 예 (백그라운드 갱신 작업, 예: cron):
+    python suggested_questions.py
+"""
+
+import datetime
+import json
+import os
+import re
+from typing import Any, Dict, List, Optional
+
+from app_state import get_app_state, get_corpus_version, set_app_state
+
+SUGGESTED_QUESTIONS_KEY = "suggested_questions"
+SUGGESTED_QUESTIONS_FILE = os.getenv("SUGGESTED_QUESTIONS_FILE", "suggested_questions.json")
+SUGGESTED_QUESTION_POOL_SIZE = int(os.getenv("SUGGESTED_QUESTION_POOL_SIZE", "24"))
+
+# 관련 문서를 찾기 위한 주제어 - 문서에 적합한 일반적인 키워드
+TOPIC_KEYWORDS = [
+    "개요", "설치", "시작하기", "기능", "사용법", "FAQ",
+    "주요 기능", "가이드", "튜토리얼", "API"
+]
+
+
+def collect_topic_documents(client: Any, embeddings: Any, keywords: List[str] = TOPIC_KEYWORDS, docs_per_keyword: int = 2) -> List[str]:
+    """주제어별로 관련 문서를 검색하여 중복을 제거한 문서 내용 목록을 반환합니다."""
+    contents: List[str] = []
+    seen_contents = set()
+
+    def add_content(content: str) -> None:
+        # 같은 내용이 이미 있는지 확인 (단순화를 위해 앞부분만 체크)
+        if not content or len(content) <= 100 or content[:100] in seen_contents:
+            return
+        seen_contents.add(content[:100])
+        # 긴 문서는 앞부분만 사용
+        contents.append(content[:800] + "..." if len(content) > 800 else content)
+
+    # 주제어 임베딩은 한 번의 요청으로 생성
+    keyword_embeddings = embeddings.embed_documents(keywords)
+    for keyword, query_embedding in zip(keywords, keyword_embeddings):
+        try:
+            results = client.rpc("match_documents", {
+                "query_embedding": query_embedding,
+                "match_threshold": 0.5,
+                "match_count": docs_per_keyword,
+            }).execute()
+            for doc in results.data or []:
+                add_content(doc.get("content", ""))
+        except Exception as e:
+            print(f"키워드 '{keyword}' 검색 오류: {e}")
+
+    # 주제어로 찾지 못한 경우 문서 샘플 사용
+    if not contents:
+        results = client.from_("documents").select("content").limit(10).execute()
+        for doc in results.data or []:
+            add_content(doc.get("content", ""))
+    return contents
+
+
+def generate_questions_from_contents(contents: List[str], llm: Any, num_questions: int) -> List[str]:
+    """문서 내용을 바탕으로 LLM에 질문 생성을 요청합니다."""
+    combined_content = "\n\n---\n\n".join(contents)
+    prompt = f"""
+    다음은 문서 시스템에 저장된 실제 콘텐츠의 일부입니다:
+
+    {combined_content}
+
+    위 문서 내용을 정확히 바탕으로, 다음 조건을 충족하는 질문 {num_questions}개를 생성해주세요:
+    1. 시스템이 위 문서 내용을 기반으로 확실히 답변할 수 있는 질문만 생성하세요.
+    2. 질문은 구체적이고 명확해야 합니다.
+    3. 질문은 문서 내용에 포함된 주요 개념, 기능, 방법 등을 다루어야 합니다.
+    4. 다양한 주제를 다루도록 질문을 분산시키세요.
+
+    JSON 형식 없이 질문만 줄바꿈으로 구분하여 반환하세요.
+    """
+    response = llm.invoke(prompt)
+    # 빈 줄 제거하고 앞뒤 공백 및 번호/글머리표 제거
+    questions = [re.sub(r"^(?:[-•*]|\d+[.)])\s*", "", q.strip()) for q in response.content.strip().split("\n")]
+    return [q for q in questions if q]
+
+
+def build_question_pool(client: Any, embeddings: Any, llm: Any, pool_size: int = SUGGESTED_QUESTION_POOL_SIZE, docs_per_prompt: int = 4) -> List[str]:
+    """
+    문서 전반에서 추천 질문 풀을 생성합니다.
+
+    주제어별로 찾은 문서를 docs_per_prompt개씩 묶어 묶음마다 질문을 생성하므로,
+    풀의 질문이 특정 문서 몇 개에 치우치지 않습니다.
+    """
+    contents = collect_topic_documents(client, embeddings)
+    if not contents:
+        return []
+
+    groups = [contents[i:i + docs_per_prompt] for i in range(0, len(contents), docs_per_prompt)]
+    questions_per_group = max(1, -(-pool_size // len(groups)))  # 올림 나눗셈
+
+    pool: List[str] = []
+    for group in groups:
+        try:
+            for question in generate_questions_from_contents(group, llm, questions_per_group):
+                if question not in pool:
+                    pool.append(question)
+        except Exception as e:
+            print(f"추천 질문 생성 오류: {e}")
+    return pool[:pool_size]
+
+
+def save_question_pool(client: Any, questions: List[str], path: str = SUGGESTED_QUESTIONS_FILE) -> None:
+    """질문 풀을 app_state 테이블과 로컬 파일에 저장합니다."""
+    record: Dict[str, Any] = {
+        "questions": questions,
+        "generated_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+    }
+    try:
+        record["corpus_version"] = get_corpus_version(client)
+        set_app_state(client, SUGGESTED_QUESTIONS_KEY, record)
+    except Exception as e:
+        print(f"app_state에 추천 질문 저장 실패 (로컬 파일만 사용): {e}")
+
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(record, f, ensure_ascii=False, indent=2)
+
+
+def load_question_pool(client: Optional[Any] = None, path: str = SUGGESTED_QUESTIONS_FILE) -> List[str]:
+    """저장된 질문 풀을 읽습니다 (app_state 테이블 우선, 없으면 로컬 파일). 없으면 빈 목록."""
+    if client is not None:
+        try:
+            record = get_app_state(client, SUGGESTED_QUESTIONS_KEY)
+            if record and record.get("questions"):
+                return list(record["questions"])
+        except Exception as e:
+            print(f"app_state에서 추천 질문 조회 실패: {e}")
+
+    if os.path.exists(path):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return list(json.load(f).get("questions", []))
+        except Exception as e:
+            print(f"추천 질문 파일 읽기 실패: {e}")
+    return []
+
+
+def refresh_question_pool(client: Any, embeddings: Any, llm: Any) -> List[str]:
+    """질문 풀을 다시 생성하여 저장합니다. 생성에 실패하면 기존 풀을 유지합니다."""
+    questions = build_question_pool(client, embeddings, llm)
+    if questions:
+        save_question_pool(client, questions)
+        print(f"추천 질문 {len(questions)}개를 저장했습니다.")
+    else:
+        print("추천 질문을 생성하지 못해 기존 질문 풀을 유지합니다.")
+    return questions
+
+
+def main():
+    from dotenv import load_dotenv
+    from supabase.client import create_client
+
+    from embedding_cache import create_cached_embeddings
+    from model_router import create_routed_chat_model
+
+    load_dotenv()
+    openai_api_key = os.getenv("OPENAI_API_KEY")
+    client = create_client(os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_ANON_KEY"))
+    llm = create_routed_chat_model("question_pool", openai_api_key)
+    for question in refresh_question_pool(client, create_cached_embeddings(openai_api_key), llm):
+        print(f"- {question}")
+
+
+if __name__ == "__main__":
+    main()
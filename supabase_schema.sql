@@ -9,11 +9,21 @@ CREATE TABLE IF NOT EXISTS documents (
   embedding VECTOR(1536) -- OpenAI text-embedding-ada-002 모델의 차원 수
 );
 
--- 2. 유사도 검색 함수 생성 (매개변수 순서 수정)
+-- 2. 유사도 검색 함수 생성
+-- 거리 순으로 상위 match_count개를 먼저 고른 뒤(ANN 인덱스 사용) 그 안에서만 임계값을 적용합니다.
+-- WHERE 절에서 거리를 계산하면 인덱스를 사용할 수 없어 전체 행을 순차 스캔하게 됩니다.
+-- ef_search(HNSW)/probes(ivfflat)는 검색 폭으로, 클수록 정확하지만 느립니다 (이 함수 호출 동안만 적용).
+-- filter는 metadata에 포함되어야 하는 JSONB (예: '{"sections": ["guide"]}')로, 인덱스 검색 중에 적용됩니다.
+DROP FUNCTION IF EXISTS match_documents(VECTOR, FLOAT, INT);
+DROP FUNCTION IF EXISTS match_documents(VECTOR, FLOAT, INT, INT, INT);
+
 CREATE OR REPLACE FUNCTION match_documents (
   query_embedding VECTOR(1536),
   match_threshold FLOAT DEFAULT 0.5,
-  match_count INT DEFAULT 5
+  match_count INT DEFAULT 5,
+  ef_search INT DEFAULT 40,
+  probes INT DEFAULT 10,
+  filter JSONB DEFAULT '{}'
 )
 RETURNS TABLE (
   id UUID,
@@ -24,22 +34,220 @@ RETURNS TABLE (
 LANGUAGE plpgsql
 AS $$
 BEGIN
+  PERFORM set_config('hnsw.ef_search', GREATEST(ef_search, match_count)::TEXT, true);
+  PERFORM set_config('ivfflat.probes', probes::TEXT, true);
+  IF filter IS NULL OR filter = '{}'::JSONB THEN
+    -- 필터가 없으면 metadata 조건 없이 벡터 인덱스 순서대로 검색
+    -- (조건이 있으면 GIN 인덱스나 순차 스캔 계획이 선택될 수 있고, metadata가 NULL인 행이 빠짐)
+    RETURN QUERY
+    SELECT
+      nearest.id,
+      nearest.content,
+      nearest.metadata,
+      1 - nearest.distance AS similarity -- 코사인 유사도 (1 - 코사인 거리)
+    FROM (
+      SELECT
+        documents.id,
+        documents.content,
+        documents.metadata,
+        documents.embedding <=> query_embedding AS distance
+      FROM documents
+      ORDER BY documents.embedding <=> query_embedding ASC -- 거리가 짧을수록 유사하므로 ASC
+      LIMIT match_count
+    ) AS nearest
+    WHERE 1 - nearest.distance > match_threshold
+    ORDER BY nearest.distance ASC;
+    RETURN;
+  END IF;
+
+  -- 필터 조건에 맞는 행이 match_count개 모일 때까지 인덱스 검색을 계속 (pgvector 0.8+, 이전 버전은 무시)
+  BEGIN
+    PERFORM set_config('hnsw.iterative_scan', 'relaxed_order', true);
+    PERFORM set_config('ivfflat.iterative_scan', 'relaxed_order', true);
+  EXCEPTION WHEN OTHERS THEN
+    NULL;
+  END;
+
+  RETURN QUERY
+  SELECT
+    nearest.id,
+    nearest.content,
+    nearest.metadata,
+    1 - nearest.distance AS similarity
+  FROM (
+    SELECT
+      documents.id,
+      documents.content,
+      documents.metadata,
+      documents.embedding <=> query_embedding AS distance
+    FROM documents
+    WHERE documents.metadata @> filter
+    ORDER BY documents.embedding <=> query_embedding ASC
+    LIMIT match_count
+  ) AS nearest
+  WHERE 1 - nearest.distance > match_threshold
+  ORDER BY nearest.distance ASC;
+END;
+$$;
+
+-- 3. 벡터 인덱스 생성 (match_documents가 순차 스캔 대신 사용)
+-- HNSW 인덱스 (기본값, 데이터가 바뀌어도 재생성이 필요 없음)
+CREATE INDEX IF NOT EXISTS documents_embedding_hnsw_idx ON documents
+  USING hnsw (embedding vector_cosine_ops) WITH (m = 16, ef_construction = 64);
+
+-- 또는 ivfflat 인덱스 (빌드가 빠르지만 lists 값을 행 수에 맞게 정하고, 데이터가 크게 늘면 재생성 필요)
+-- 수집 후 `python reset_supabase_schema.py --index ivfflat --maintain`이 현재 행 수로 lists 값을 계산해 만들어 줍니다.
+-- CREATE INDEX IF NOT EXISTS documents_embedding_ivfflat_idx ON documents
+--   USING ivfflat (embedding vector_cosine_ops) WITH (lists = 100);
+
+-- 4. 메타데이터 GIN 인덱스 (match_documents의 filter 조건 metadata @> filter에 사용)
+CREATE INDEX IF NOT EXISTS documents_metadata_gin_idx ON documents
+  USING gin (metadata jsonb_path_ops);
+
+ANALYZE documents;
+
+-- 5. 섹션 목록 함수 (사이드바 검색 범위 선택용)
+-- metadata.sections는 페이지 URL 경로의 접두사 배열입니다 (예: ["guide", "guide/install"]).
+-- 두 페이지 이상을 포함하는 접두사만 섹션으로 반환합니다.
+CREATE OR REPLACE FUNCTION list_document_sections ()
+RETURNS TABLE (
+  section TEXT,
+  page_count BIGINT
+)
+LANGUAGE sql STABLE
+AS $$
+  SELECT
+    prefix AS section,
+    COUNT(DISTINCT documents.metadata->>'source') AS page_count
+  FROM documents,
+    jsonb_array_elements_text(
+      CASE WHEN jsonb_typeof(documents.metadata->'sections') = 'array'
+        THEN documents.metadata->'sections' ELSE '[]'::JSONB END
+    ) AS prefix
+  GROUP BY prefix
+  HAVING COUNT(DISTINCT documents.metadata->>'source') > 1
+  ORDER BY prefix;
+$$;
+
+-- 6. 앱 상태 테이블 (키-값)
+-- corpus_version: 수집으로 documents 내용이 바뀔 때마다 갱신되며, 앱은 이 값이 바뀌면 답변 캐시를 비웁니다.
+CREATE TABLE IF NOT EXISTS app_state (
+  key TEXT PRIMARY KEY,
+  value JSONB,
+  updated_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+-- 7. 하이브리드 검색 (전문 검색 + 벡터 검색)
+-- 벡터 검색만으로는 API 이름, 오류 코드, 한국어 키워드처럼 정확히 일치해야 하는 질의를 놓치기 쉽습니다.
+-- content의 tsvector(단어 일치)와 trigram(부분 일치) 검색 순위를 벡터 검색 순위와 RRF로 합칩니다.
+-- 'simple' 설정은 형태소 분석을 하지 않으므로, 조사가 붙은 한국어 단어는 trigram 유사도로 보완합니다.
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+ALTER TABLE documents ADD COLUMN IF NOT EXISTS fts TSVECTOR
+  GENERATED ALWAYS AS (to_tsvector('simple', COALESCE(content, ''))) STORED;
+CREATE INDEX IF NOT EXISTS documents_fts_idx ON documents USING gin (fts);
+CREATE INDEX IF NOT EXISTS documents_content_trgm_idx ON documents USING gin (content gin_trgm_ops);
+
+CREATE OR REPLACE FUNCTION hybrid_match_documents (
+  query_text TEXT,
+  query_embedding VECTOR(1536),
+  match_count INT DEFAULT 5,
+  candidate_count INT DEFAULT 30,
+  rrf_k INT DEFAULT 60,
+  full_text_weight FLOAT DEFAULT 1.0,
+  semantic_weight FLOAT DEFAULT 1.0,
+  ef_search INT DEFAULT 40,
+  probes INT DEFAULT 10,
+  filter JSONB DEFAULT '{}'
+)
+RETURNS TABLE (
+  id UUID,
+  content TEXT,
+  metadata JSONB,
+  similarity FLOAT,
+  score FLOAT
+)
+LANGUAGE plpgsql
+AS $$
+#variable_conflict use_column
+DECLARE
+  -- 질문의 단어 중 하나라도 포함하면 일치 (plainto_tsquery의 AND(&)를 OR(|)로 바꿈)
+  lexical_query TSQUERY := NULLIF(replace(plainto_tsquery('simple', query_text)::TEXT, '&', '|'), '')::TSQUERY;
+  semantic_ids UUID[];
+  lexical_ids UUID[];
+BEGIN
+  PERFORM set_config('hnsw.ef_search', GREATEST(ef_search, candidate_count)::TEXT, true);
+  PERFORM set_config('ivfflat.probes', probes::TEXT, true);
+  IF filter IS NULL OR filter = '{}'::JSONB THEN
+    -- 필터가 없으면 metadata 조건 없이 검색 (벡터 인덱스 순서 스캔 유지, metadata가 NULL인 행도 포함)
+    -- 벡터 검색 후보 (match_documents와 같은 방식, 임계값 없이 candidate_count개)
+    SELECT array_agg(nearest.doc_id ORDER BY nearest.distance) INTO semantic_ids
+    FROM (
+      SELECT documents.id AS doc_id, documents.embedding <=> query_embedding AS distance
+      FROM documents
+      ORDER BY documents.embedding <=> query_embedding ASC
+      LIMIT candidate_count
+    ) AS nearest;
+    -- 전문 검색 후보: 단어 일치(tsvector) 또는 부분 문자열 유사도(trigram, 조사가 붙은 한국어 단어용)
+    SELECT array_agg(matched.doc_id ORDER BY matched.text_rank DESC) INTO lexical_ids
+    FROM (
+      SELECT
+        documents.id AS doc_id,
+        COALESCE(ts_rank_cd(documents.fts, lexical_query), 0) + word_similarity(query_text, documents.content) AS text_rank
+      FROM documents
+      WHERE documents.fts @@ lexical_query OR query_text <% documents.content
+      ORDER BY text_rank DESC
+      LIMIT candidate_count
+    ) AS matched;
+  ELSE
+    BEGIN
+      PERFORM set_config('hnsw.iterative_scan', 'relaxed_order', true);
+      PERFORM set_config('ivfflat.iterative_scan', 'relaxed_order', true);
+    EXCEPTION WHEN OTHERS THEN
+      NULL;
+    END;
+    SELECT array_agg(nearest.doc_id ORDER BY nearest.distance) INTO semantic_ids
+    FROM (
+      SELECT documents.id AS doc_id, documents.embedding <=> query_embedding AS distance
+      FROM documents
+      WHERE documents.metadata @> filter
+      ORDER BY documents.embedding <=> query_embedding ASC
+      LIMIT candidate_count
+    ) AS nearest;
+    SELECT array_agg(matched.doc_id ORDER BY matched.text_rank DESC) INTO lexical_ids
+    FROM (
+      SELECT
+        documents.id AS doc_id,
+        COALESCE(ts_rank_cd(documents.fts, lexical_query), 0) + word_similarity(query_text, documents.content) AS text_rank
+      FROM documents
+      WHERE documents.metadata @> filter
+        AND (documents.fts @@ lexical_query OR query_text <% documents.content)
+      ORDER BY text_rank DESC
+      LIMIT candidate_count
+    ) AS matched;
+  END IF;
+
   RETURN QUERY
+  -- 후보 배열의 순서가 각 목록의 순위
+  WITH semantic AS (
+    SELECT candidate.doc_id, candidate.rank_ix
+    FROM unnest(semantic_ids) WITH ORDINALITY AS candidate(doc_id, rank_ix)
+  ),
+  lexical AS (
+    SELECT candidate.doc_id, candidate.rank_ix
+    FROM unnest(lexical_ids) WITH ORDINALITY AS candidate(doc_id, rank_ix)
+  )
+  -- RRF: 각 목록의 순위 r에 대해 weight / (rrf_k + r)를 더함 (한쪽 목록에만 있으면 그쪽 점수만)
   SELECT
     documents.id,
     documents.content,
     documents.metadata,
-    1 - (documents.embedding <=> query_embedding) AS similarity -- 코사인 유사도 (1 - 코사인 거리)
-  FROM documents
-  WHERE 1 - (documents.embedding <=> query_embedding) > match_threshold
-  ORDER BY documents.embedding <=> query_embedding ASC -- 거리가 짧을수록 유사하므로 ASC
+    1 - (documents.embedding <=> query_embedding) AS similarity,
+    COALESCE(full_text_weight / (rrf_k + lexical.rank_ix), 0.0)
+      + COALESCE(semantic_weight / (rrf_k + semantic.rank_ix), 0.0) AS score
+  FROM semantic
+  FULL OUTER JOIN lexical ON lexical.doc_id = semantic.doc_id
+  JOIN documents ON documents.id = COALESCE(semantic.doc_id, lexical.doc_id)
+  ORDER BY score DESC
   LIMIT match_count;
 END;
 $$;
-
--- 인덱스 생성 (선택 사항이지만 대량 데이터 검색 성능 향상에 도움)
--- CREATE INDEX IF NOT EXISTS ON documents USING ivfflat (embedding vector_cosine_ops)
--- WITH (lists = 100); -- lists 값은 데이터 크기에 따라 조정
-
--- 또는 HNSW 인덱스 (더 정확하고 빠를 수 있지만 빌드 시간이 김)
--- CREATE INDEX IF NOT EXISTS ON documents USING hnsw (embedding vector_cosine_ops);
\ No newline at end of file
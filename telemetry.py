@@ -0,0 +1,324 @@
+"""
+대화 한 턴의 단계별 소요 시간과 토큰 수를 기록하는 계측 모듈입니다.
+
+- start_turn()으로 턴을 시작하면, 그 안에서 실행되는 timed(stage) 구간이 턴의 span으로 기록됩니다.
+  (contextvars 사용, 턴 밖에서 실행된 구간은 span 하나짜리 이벤트로 따로 기록)
+- LangChain 콜백 StageTimingHandler는 LLM 호출(태그별: condense_question/answer)과 검색기 실행 시간을 기록합니다.
+- 턴이 끝나면 구조화 로그(JSON 한 줄)를 남기고 Prometheus 형식 지표를 갱신합니다.
+  - TELEMETRY_LOG_FILE: 로그를 JSONL 파일에도 추가
+  - TELEMETRY_METRICS_FILE: 지표를 텍스트 파일로 저장 (node_exporter textfile collector 등에서 수집)
+  - TELEMETRY_METRICS_PORT: 지정하면 http://<host>:<port>/metrics 로 지표 제공
+"""
+
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, Optional
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+if TYPE_CHECKING:
+    # langchain_core.messages는 import가 느리므로(langsmith) 타입 검사에서만 import (앱 첫 화면을 늦추지 않도록)
+    from langchain_core.messages import BaseMessage
+
+TELEMETRY_LOG_FILE = os.getenv("TELEMETRY_LOG_FILE", "")
+TELEMETRY_METRICS_FILE = os.getenv("TELEMETRY_METRICS_FILE", "")
+TELEMETRY_METRICS_PORT = int(os.getenv("TELEMETRY_METRICS_PORT", "0"))
+
+# 지연 시간 히스토그램 구간 (초)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+logger = logging.getLogger("telemetry")
+if not logger.handlers:
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(_handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+
+class TurnTrace:
+    """한 턴의 span(단계, 시작 오프셋, 소요 시간)과 토큰 수."""
+
+    def __init__(self, **attrs: Any):
+        self.turn_id = uuid.uuid4().hex[:12]
+        self.attrs = attrs
+        self.started = time.perf_counter()
+        self.total_ms: Optional[float] = None
+        self.spans: List[Dict[str, Any]] = []
+        self.tokens: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def add_span(self, stage: str, start: float, end: float, **attrs: Any) -> None:
+        span = {
+            "stage": stage,
+            "start_ms": round((start - self.started) * 1000, 1),
+            "duration_ms": round((end - start) * 1000, 1),
+        }
+        span.update(attrs)
+        with self._lock:
+            self.spans.append(span)
+
+    def add_tokens(self, label: str, count: int) -> None:
+        with self._lock:
+            self.tokens[label] = self.tokens.get(label, 0) + count
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "event": "turn",
+                "turn_id": self.turn_id,
+                **self.attrs,
+                "total_ms": self.total_ms,
+                "spans": sorted(self.spans, key=lambda span: span["start_ms"]),
+                "tokens": dict(self.tokens),
+            }
+
+
+_current_turn: contextvars.ContextVar = contextvars.ContextVar("current_turn", default=None)
+
+
+class MetricsRegistry:
+    """단계별 지연 시간 히스토그램과 토큰/턴 카운터 (Prometheus 텍스트 형식으로 출력)."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._histograms: Dict[str, Dict[str, Any]] = {}
+        self._tokens: Dict[str, int] = {}
+        self._turns: Dict[str, int] = {}
+
+    def observe(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            histogram = self._histograms.setdefault(stage, {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0})
+            for index, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    histogram["counts"][index] += 1
+            histogram["sum"] += seconds
+            histogram["count"] += 1
+
+    def add_tokens(self, label: str, count: int) -> None:
+        with self._lock:
+            self._tokens[label] = self._tokens.get(label, 0) + count
+
+    def count_turn(self, outcome: str) -> None:
+        with self._lock:
+            self._turns[outcome] = self._turns.get(outcome, 0) + 1
+
+    def render(self) -> str:
+        lines = [
+            "# HELP chatbot_stage_duration_seconds Duration of each chat turn stage.",
+            "# TYPE chatbot_stage_duration_seconds histogram",
+        ]
+        with self._lock:
+            for stage, histogram in sorted(self._histograms.items()):
+                for bound, count in zip(self.buckets, histogram["counts"]):
+                    lines.append(f'chatbot_stage_duration_seconds_bucket{{stage="{stage}",le="{bound}"}} {count}')
+                lines.append(f'chatbot_stage_duration_seconds_bucket{{stage="{stage}",le="+Inf"}} {histogram["count"]}')
+                lines.append(f'chatbot_stage_duration_seconds_sum{{stage="{stage}"}} {histogram["sum"]:.6f}')
+                lines.append(f'chatbot_stage_duration_seconds_count{{stage="{stage}"}} {histogram["count"]}')
+            lines += ["# HELP chatbot_tokens_total Tokens used by chat turns.", "# TYPE chatbot_tokens_total counter"]
+            lines += [f'chatbot_tokens_total{{kind="{label}"}} {count}' for label, count in sorted(self._tokens.items())]
+            lines += ["# HELP chatbot_turns_total Completed chat turns.", "# TYPE chatbot_turns_total counter"]
+            lines += [f'chatbot_turns_total{{outcome="{outcome}"}} {count}' for outcome, count in sorted(self._turns.items())]
+
+        try:
+            from openai_clients import client_metrics
+
+            openai_metrics = client_metrics()
+            lines += [
+                "# TYPE chatbot_openai_requests_total counter",
+                f"chatbot_openai_requests_total {openai_metrics['requests']}",
+                "# TYPE chatbot_openai_retries_total counter",
+                f"chatbot_openai_retries_total {openai_metrics['retries']}",
+                "# TYPE chatbot_openai_in_flight gauge",
+                f"chatbot_openai_in_flight {openai_metrics['in_flight']}",
+                "# TYPE chatbot_openai_queue_wait_max_seconds gauge",
+                f"chatbot_openai_queue_wait_max_seconds {openai_metrics['queue_wait_max_ms'] / 1000:.4f}",
+            ]
+        except Exception:
+            pass
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+
+def _emit(record: Dict[str, Any]) -> None:
+    line = json.dumps(record, ensure_ascii=False, default=str)
+    logger.info(line)
+    if TELEMETRY_LOG_FILE:
+        try:
+            with open(TELEMETRY_LOG_FILE, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+        except OSError as e:
+            logger.warning(f"계측 로그 파일 기록 실패: {e}")
+
+
+def log_event(event: str, **fields: Any) -> None:
+    """턴과 관계없는 이벤트(예: 앱 시작, warm-up 완료)를 구조화 로그로 남깁니다."""
+    _emit({"event": event, **fields})
+
+
+def write_metrics_file(path: str = TELEMETRY_METRICS_FILE) -> None:
+    """지표를 파일에 원자적으로 저장합니다 (path가 비어 있으면 아무것도 하지 않음)."""
+    if not path:
+        return
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        f.write(registry.render())
+    os.replace(temp_path, path)
+
+
+def current_turn() -> Optional[TurnTrace]:
+    return _current_turn.get()
+
+
+@contextmanager
+def start_turn(**attrs: Any) -> Iterator[TurnTrace]:
+    """턴 계측을 시작합니다. 블록이 끝나면 로그와 지표를 기록합니다."""
+    trace = TurnTrace(**attrs)
+    token = _current_turn.set(trace)
+    outcome = "ok"
+    try:
+        yield trace
+    except BaseException:
+        outcome = "error"
+        raise
+    finally:
+        _current_turn.reset(token)
+        trace.total_ms = round((time.perf_counter() - trace.started) * 1000, 1)
+        outcome = trace.attrs.get("outcome", outcome)
+        trace.attrs["outcome"] = outcome
+        registry.observe("turn", trace.total_ms / 1000)
+        registry.count_turn(outcome)
+        _emit(trace.to_dict())
+        try:
+            write_metrics_file()
+        except OSError as e:
+            logger.warning(f"지표 파일 저장 실패: {e}")
+
+
+def record_span(stage: str, start: float, end: float, trace: Optional[TurnTrace] = None, **attrs: Any) -> None:
+    """구간을 현재 턴(또는 지정한 턴)에 기록하고 히스토그램에 반영합니다. 턴이 없으면 개별 이벤트로 기록."""
+    registry.observe(stage, end - start)
+    trace = trace or current_turn()
+    if trace is not None:
+        trace.add_span(stage, start, end, **attrs)
+    else:
+        _emit({"event": "span", "stage": stage, "duration_ms": round((end - start) * 1000, 1), **attrs})
+
+
+def record_tokens(label: str, count: int, trace: Optional[TurnTrace] = None) -> None:
+    registry.add_tokens(label, count)
+    trace = trace or current_turn()
+    if trace is not None:
+        trace.add_tokens(label, count)
+
+
+@contextmanager
+def timed(stage: str, **attrs: Any) -> Iterator[None]:
+    """블록 실행 시간을 stage 이름으로 기록합니다."""
+    start = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        attrs["error"] = True
+        raise
+    finally:
+        record_span(stage, start, time.perf_counter(), **attrs)
+
+
+class StageTimingHandler(BaseCallbackHandler):
+    """
+    LangChain 콜백으로 LLM 호출과 검색기 실행 시간을 턴에 기록합니다.
+
+    LLM 호출은 태그(예: "condense_question", "answer")를 단계 이름으로 사용하고,
+    답변 LLM은 첫 토큰까지의 시간(first_token_ms)도 기록합니다.
+    """
+
+    def __init__(self, trace: Optional[TurnTrace] = None, tags: Optional[List[str]] = None):
+        self.trace = trace or current_turn()
+        self.tags = tags or ["condense_question", "answer"]
+        self._runs: Dict[UUID, Dict[str, Any]] = {}
+
+    def _start(self, run_id: UUID, stage: str) -> None:
+        self._runs[run_id] = {"stage": stage, "start": time.perf_counter()}
+
+    def _end(self, run_id: UUID, **attrs: Any) -> None:
+        run = self._runs.pop(run_id, None)
+        if run is None:
+            return
+        if "first_token" in run:
+            attrs["first_token_ms"] = round((run["first_token"] - run["start"]) * 1000, 1)
+        record_span(run["stage"], run["start"], time.perf_counter(), trace=self.trace, **attrs)
+
+    def on_chat_model_start(
+        self,
+        serialized: Dict[str, Any],
+        messages: List[List["BaseMessage"]],
+        *,
+        run_id: UUID,
+        tags: Optional[List[str]] = None,
+        **kwargs: Any,
+    ) -> None:
+        stage = next((tag for tag in self.tags if tag in (tags or [])), "llm")
+        self._start(run_id, stage)
+
+    def on_llm_new_token(self, token: str, *, run_id: UUID, **kwargs: Any) -> None:
+        run = self._runs.get(run_id)
+        if run is not None and "first_token" not in run:
+            run["first_token"] = time.perf_counter()
+
+    def on_llm_end(self, response: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        self._end(run_id)
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._end(run_id, error=True)
+
+    def on_retriever_start(self, serialized: Dict[str, Any], query: str, *, run_id: UUID, parent_run_id: Optional[UUID] = None, **kwargs: Any) -> None:
+        # 재정렬 검색기 안의 기본 검색기처럼 중첩된 검색기는 바깥 검색기 시간에 포함되므로 따로 기록하지 않음
+        # (미리 검색은 다른 스레드에서 실행되므로 복사본을 확인)
+        if not any(run["stage"] == "retrieve" for run in list(self._runs.values())):
+            self._start(run_id, "retrieve")
+
+    def on_retriever_end(self, documents: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        self._end(run_id, documents=len(documents))
+
+    def on_retriever_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._end(run_id, error=True)
+
+
+def start_metrics_server(port: int = TELEMETRY_METRICS_PORT) -> Optional[ThreadingHTTPServer]:
+    """백그라운드 스레드에서 /metrics 엔드포인트를 시작합니다 (port가 0이면 시작하지 않음)."""
+    if not port:
+        return None
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_response(404)
+                self.end_headers()
+                return
+            data = registry.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("0.0.0.0", port), MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"지표 엔드포인트: http://0.0.0.0:{port}/metrics")
+    return server
@@ -0,0 +1,64 @@
+"""
+chat_store.ChatStore의 추가 저장/다시 쓰기와 이전 형식(chat_history.json) 가져오기를 확인합니다.
+    python -m pytest tests
+"""
+
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from chat_store import ChatStore  # noqa: E402
+
+GREETING = {"role": "assistant", "content": "안녕하세요! 무엇이든 물어보세요."}
+QUESTION = {"role": "user", "content": "설치 방법은?"}
+ANSWER = {"role": "assistant", "content": "설치 가이드를 참고하세요.", "sources": ["https://docs.example.com/install"]}
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ChatStore(str(tmp_path / "chat.sqlite3"))
+
+
+def test_save_appends_only_new_messages(store):
+    assert store.save_conversation("c1", "첫 대화", [GREETING]) == 1
+    assert store.save_conversation("c1", "설치 방법은?", [GREETING, QUESTION, ANSWER]) == 2
+    assert store.save_conversation("c1", "설치 방법은?", [GREETING, QUESTION, ANSWER]) == 0
+    assert store.load_messages("c1") == [GREETING, QUESTION, ANSWER]  # extra 키(sources)도 복원
+    assert store.list_conversations() == [("설치 방법은?", "c1")]
+
+
+def test_save_rewrites_when_conversation_got_shorter(store):
+    store.save_conversation("c1", "대화", [GREETING, QUESTION, ANSWER])
+    edited = [GREETING, {"role": "user", "content": "다른 질문"}]
+    assert store.save_conversation("c1", "대화", edited) == 2
+    assert store.load_messages("c1") == edited
+
+
+def test_delete_and_clear(store):
+    store.save_conversation("c1", "하나", [GREETING])
+    store.save_conversation("c2", "둘", [GREETING])
+    store.delete_conversation("c1")
+    assert store.list_conversations() == [("둘", "c2")]
+    assert store.load_messages("c1") == []
+    store.clear()
+    assert store.list_conversations() == []
+
+
+def test_migrate_legacy_json_file(store, tmp_path):
+    legacy_path = tmp_path / "chat_history.json"
+    legacy_path.write_text(json.dumps({
+        "chat_history": [["설치 방법은?", "chat_20250513091920"], ["빈 대화", "chat_20250513092324"]],
+        "chat_chat_20250513091920": [GREETING, QUESTION, ANSWER],
+        "chat_chat_20250513092324": [],
+    }, ensure_ascii=False), encoding="utf-8")
+
+    assert store.migrate_json_file(str(legacy_path)) == 1
+    assert store.list_conversations() == [("설치 방법은?", "chat_20250513091920")]
+    assert store.load_messages("chat_20250513091920") == [GREETING, QUESTION, ANSWER]
+    # 가져온 파일은 이름을 바꿔 다시 가져오지 않음
+    assert not legacy_path.exists() and (tmp_path / "chat_history.json.migrated").exists()
+    assert store.migrate_json_file(str(legacy_path)) == 0
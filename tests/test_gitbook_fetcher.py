@@ -0,0 +1,58 @@
+"""
+gitbook_fetcher.fetch_page의 재시도 대기 시간(Retry-After 해석과 상한)을 확인합니다.
+    python -m pytest tests
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import gitbook_fetcher  # noqa: E402
+from gitbook_fetcher import RETRY_MAX_DELAY, fetch_page  # noqa: E402
+
+PAGE = b'<html><body><article class="page-body"><h1>Install</h1><p>Run the installer and follow the steps.</p></article></body></html>'
+
+
+class FakeResponse:
+    def __init__(self, status_code, headers=None, content=b""):
+        self.status_code = status_code
+        self.headers = headers or {}
+        self.content = content
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise RuntimeError(f"HTTP {self.status_code}")
+
+
+class FakeSession:
+    """정해 둔 응답을 순서대로 반환하는 세션."""
+
+    def __init__(self, responses):
+        self.responses = list(responses)
+
+    def get(self, url, headers=None, timeout=None):
+        return self.responses.pop(0)
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    recorded = []
+    monkeypatch.setattr(gitbook_fetcher.time, "sleep", recorded.append)
+    return recorded
+
+
+@pytest.mark.parametrize("retry_after, expected_delay", [("0", 0.0), ("3", 3.0), ("86400", RETRY_MAX_DELAY)])
+def test_retry_after_is_honoured_and_capped(sleeps, retry_after, expected_delay):
+    session = FakeSession([FakeResponse(429, {"Retry-After": retry_after}), FakeResponse(200, content=PAGE)])
+    doc = fetch_page("https://docs.example.com/install", session=session)
+    assert doc is not None and "installer" in doc.page_content
+    assert sleeps == [expected_delay]
+
+
+def test_missing_retry_after_uses_backoff(sleeps):
+    session = FakeSession([FakeResponse(503), FakeResponse(200, content=PAGE)])
+    assert fetch_page("https://docs.example.com/install", session=session, backoff_base=0.5) is not None
+    assert len(sleeps) == 1 and 0.5 <= sleeps[0] <= 1.0
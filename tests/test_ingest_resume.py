@@ -0,0 +1,144 @@
+"""
+증분 수집이 중간에 실패한 뒤 다시 실행했을 때 바뀐 페이지가 끝까지 반영되는지 확인합니다.
+
+GitBook/OpenAI/Supabase 대신 메모리 구현(in_memory_supabase.py)과 가짜 임베딩을 사용합니다.
+    python -m pytest tests
+"""
+
+import os
+import sys
+from typing import List
+
+import pytest
+from langchain_core.documents import Document
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ingest_gitbook  # noqa: E402
+import ingest_pipeline  # noqa: E402
+from app_state import get_corpus_version  # noqa: E402
+from in_memory_supabase import InMemorySupabaseClient  # noqa: E402
+from ingest_pipeline import IngestCheckpoint  # noqa: E402
+
+BASE_URL = "https://docs.example.com/"
+PAGE_URL = BASE_URL + "guide/install"
+
+
+class FakeEmbeddings:
+    """fail_marker가 들어 있는 청크를 임베딩하면 실패하는 가짜 임베딩."""
+
+    def __init__(self):
+        self.fail_marker = None
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if self.fail_marker and any(self.fail_marker in text for text in texts):
+            raise RuntimeError("embedding service unavailable")
+        return [[float(len(text)), 1.0, 0.0] for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+
+def make_page(paragraphs: List[str]) -> str:
+    return "\n\n".join(paragraphs)
+
+
+@pytest.fixture
+def site(monkeypatch):
+    """사이트맵 항목과 페이지 내용을 테스트에서 바꿀 수 있는 가짜 GitBook."""
+    pages = {}
+
+    def fake_sitemap(sitemap_url):
+        return [{"loc": url, "lastmod": page["lastmod"]} for url, page in pages.items()]
+
+    def fake_loaded_documents(page_urls, *args):
+        stats = args[-1]
+        for url in page_urls:
+            stats["loaded"] += 1
+            yield Document(page_content=pages[url]["content"], metadata={"source": url})
+
+    monkeypatch.setattr(ingest_gitbook, "get_sitemap_entries", fake_sitemap)
+    monkeypatch.setattr(ingest_gitbook, "iter_loaded_documents", fake_loaded_documents)
+    monkeypatch.setattr(ingest_pipeline.time, "sleep", lambda seconds: None)  # 재시도 대기 생략
+    return pages
+
+
+def run_ingest(client, embeddings, tmp_path):
+    return ingest_gitbook.ingest_documents(
+        gitbook_base_url=BASE_URL,
+        sitemap_xml_url=BASE_URL + "sitemap-pages.xml",
+        incremental=True,
+        chunk_size=60,
+        chunk_overlap=0,
+        embedding_batch_tokens=1,  # 청크마다 따로 임베딩 (일부 배치만 실패하도록)
+        refresh_suggested_questions=False,
+        client=client,
+        embeddings=embeddings,
+        checkpoint=IngestCheckpoint(str(tmp_path / "checkpoint.jsonl")),
+        local_index_path=None,
+    )
+
+
+def stored_contents(client) -> List[str]:
+    rows = client.table("documents").select("content, metadata").execute().data
+    return [row["content"] for row in sorted(rows, key=lambda row: row["metadata"]["chunk_index"])]
+
+
+def paragraphs(prefix: str, count: int) -> List[str]:
+    return [f"{prefix} paragraph {i} explains one installation step." for i in range(count)]
+
+
+def test_changed_page_is_reingested_after_failed_upload(site, tmp_path):
+    client, embeddings = InMemorySupabaseClient(), FakeEmbeddings()
+    original = paragraphs("Original", 8)
+    site[PAGE_URL] = {"lastmod": "2025-01-01", "content": make_page(original)}
+    run_ingest(client, embeddings, tmp_path)
+    assert stored_contents(client) == original
+
+    # 문단 두 개가 바뀌었는데 새 청크의 임베딩이 실패: 기존 행은 그대로 남아야 함
+    changed = original[:3] + ["Changed paragraph 3 explains a new step.", "Changed paragraph 4 explains a new step."] + original[5:]
+    site[PAGE_URL] = {"lastmod": "2025-01-02", "content": make_page(changed)}
+    embeddings.fail_marker = "Changed"
+    stats = run_ingest(client, embeddings, tmp_path)
+    assert stats["failed"] == 2
+    assert stats["reused_chunks"] == 0 and stats["stale_chunks"] == 0
+    assert stored_contents(client) == original
+
+    # 다시 실행하면 같은 lastmod라도 페이지를 다시 처리하여 바뀐 내용이 반영됨
+    embeddings.fail_marker = None
+    stats = run_ingest(client, embeddings, tmp_path)
+    assert stats["uploaded"] == 2 and stats["reused_chunks"] == 6 and stats["stale_chunks"] == 2
+    assert stored_contents(client) == changed
+
+    stats = run_ingest(client, embeddings, tmp_path)
+    assert stats["loaded"] == 0
+
+
+def test_partially_uploaded_new_page_is_completed_on_next_run(site, tmp_path):
+    client, embeddings = InMemorySupabaseClient(), FakeEmbeddings()
+    content = paragraphs("Fresh", 6)
+    site[PAGE_URL] = {"lastmod": "2025-01-01", "content": make_page(content)}
+    embeddings.fail_marker = "Fresh paragraph 4"
+    stats = run_ingest(client, embeddings, tmp_path)
+    assert stats["uploaded"] == 5 and stats["failed"] == 1
+
+    # 행 수가 페이지 청크 수보다 적으므로 lastmod가 같아도 다시 처리하고, 올라간 청크는 재사용
+    embeddings.fail_marker = None
+    stats = run_ingest(client, embeddings, tmp_path)
+    assert stats["uploaded"] == 1 and stats["reused_chunks"] == 5
+    assert stored_contents(client) == content
+
+
+def test_metadata_only_update_publishes_corpus_change(site, tmp_path):
+    client, embeddings = InMemorySupabaseClient(), FakeEmbeddings()
+    site[PAGE_URL] = {"lastmod": "2025-01-01", "content": make_page(paragraphs("Stable", 3))}
+    run_ingest(client, embeddings, tmp_path)
+    version = get_corpus_version(client)
+
+    # 섹션 메타데이터가 없는 이전 형식의 행: 내용은 같지만 메타데이터 보강이 검색 필터 결과를 바꿈
+    for row in client.table("documents").select("id, metadata").execute().data:
+        metadata = {key: value for key, value in row["metadata"].items() if key not in ("section", "sections")}
+        client.table("documents").update({"metadata": metadata}).eq("id", row["id"]).execute()
+    stats = run_ingest(client, embeddings, tmp_path)
+    assert stats["uploaded"] == 0 and stats["reused_chunks"] == 3
+    assert get_corpus_version(client) != version
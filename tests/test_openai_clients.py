@@ -0,0 +1,108 @@
+"""
+openai_clients.py 전송 계층의 재시도가 요청 전체 상한(DEADLINE_HEADER)을 넘지 않는지 확인합니다.
+
+실제 네트워크 대신 응답을 정해 둔 가짜 전송 계층을 사용합니다.
+    python -m pytest tests
+"""
+
+import asyncio
+import os
+import sys
+import time
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from openai_clients import DEADLINE_HEADER, AsyncLimitedRetryTransport, LimitedRetryTransport  # noqa: E402
+
+
+class ScriptedTransport(httpx.BaseTransport):
+    """항상 같은 상태 코드/헤더로 응답하고 받은 요청을 기록하는 전송 계층."""
+
+    def __init__(self, status_code: int, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+        self.requests = []
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append((dict(request.headers), dict(request.extensions.get("timeout", {}))))
+        return httpx.Response(self.status_code, headers=self.headers, content=b"{}")
+
+
+class AsyncScriptedTransport(httpx.AsyncBaseTransport):
+    def __init__(self, status_code: int, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+        self.requests = 0
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        self.requests += 1
+        return httpx.Response(self.status_code, headers=self.headers, content=b"{}")
+
+
+def make_client(inner: httpx.BaseTransport, max_retries: int = 3, max_concurrency: int = 8) -> httpx.Client:
+    transport = LimitedRetryTransport(max_concurrency=max_concurrency, max_retries=max_retries)
+    transport._transport = inner
+    return httpx.Client(transport=transport, timeout=30.0)
+
+
+def test_retry_after_longer_than_deadline_is_not_waited():
+    inner = ScriptedTransport(429, {"retry-after": "5"})
+    with make_client(inner) as client:
+        start = time.perf_counter()
+        response = client.get("http://llm.test/v1/chat", headers={DEADLINE_HEADER: "1"})
+        elapsed = time.perf_counter() - start
+    assert response.status_code == 429
+    assert len(inner.requests) == 1
+    assert elapsed < 1.0
+
+
+def test_deadline_header_is_stripped_and_caps_attempt_timeout():
+    inner = ScriptedTransport(200)
+    with make_client(inner) as client:
+        client.get("http://llm.test/v1/chat", headers={DEADLINE_HEADER: "2"})
+    headers, timeout = inner.requests[0]
+    assert DEADLINE_HEADER not in headers
+    assert all(value <= 2.0 for value in timeout.values())
+
+
+def test_retries_within_deadline():
+    inner = ScriptedTransport(503, {"retry-after": "0"})
+    with make_client(inner, max_retries=2) as client:
+        response = client.get("http://llm.test/v1/chat", headers={DEADLINE_HEADER: "5"})
+    assert response.status_code == 503
+    assert len(inner.requests) == 3
+
+
+def test_queue_wait_counts_toward_deadline():
+    inner = ScriptedTransport(200)
+    transport = LimitedRetryTransport(max_concurrency=1)
+    transport._transport = inner
+    transport._semaphore.acquire()  # 다른 요청이 슬롯을 차지하고 있는 상태
+    with httpx.Client(transport=transport, timeout=30.0) as client:
+        start = time.perf_counter()
+        try:
+            client.get("http://llm.test/v1/chat", headers={DEADLINE_HEADER: "0.2"})
+        except httpx.PoolTimeout:
+            pass
+        else:
+            raise AssertionError("PoolTimeout expected")
+    assert time.perf_counter() - start < 1.0
+    assert inner.requests == []
+
+
+def test_async_retry_after_longer_than_deadline_is_not_waited():
+    inner = AsyncScriptedTransport(429, {"retry-after": "5"})
+    transport = AsyncLimitedRetryTransport()
+    transport._transport = inner
+
+    async def call():
+        async with httpx.AsyncClient(transport=transport, timeout=30.0) as client:
+            return await client.get("http://llm.test/v1/chat", headers={DEADLINE_HEADER: "1"})
+
+    start = time.perf_counter()
+    response = asyncio.run(call())
+    assert response.status_code == 429
+    assert inner.requests == 1
+    assert time.perf_counter() - start < 1.0
@@ -0,0 +1,77 @@
+"""
+semantic_cache.SemanticAnswerCache의 유사도 임계값, 검색 범위(namespace), TTL, 문서 버전 무효화를 확인합니다.
+    python -m pytest tests
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import semantic_cache  # noqa: E402
+from semantic_cache import SemanticAnswerCache  # noqa: E402
+
+QUESTION = [1.0, 0.0, 0.0]
+SIMILAR = [0.99, 0.1, 0.0]  # 코사인 유사도 약 0.995
+DIFFERENT = [0.0, 1.0, 0.0]
+
+
+def store(cache, embedding=QUESTION, namespace="", corpus_version=None):
+    return cache.store(embedding, "설치 방법은?", "답변", ["doc"], namespace=namespace, corpus_version=corpus_version)
+
+
+def test_lookup_respects_similarity_threshold():
+    cache = SemanticAnswerCache(similarity_threshold=0.95)
+    store(cache)
+    hit = cache.lookup(SIMILAR)
+    assert hit["answer"] == "답변" and hit["similarity"] > 0.95
+    assert cache.lookup(DIFFERENT) is None
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+
+def test_namespaces_are_separate():
+    cache = SemanticAnswerCache()
+    store(cache, namespace="guide")
+    assert cache.lookup(QUESTION, namespace="api") is None
+    assert cache.lookup(QUESTION, namespace="guide") is not None
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(semantic_cache.time, "monotonic", lambda: now[0])
+    cache = SemanticAnswerCache(ttl_seconds=60)
+    store(cache)
+    now[0] += 59
+    assert cache.lookup(QUESTION) is not None
+    now[0] += 2
+    assert cache.lookup(QUESTION) is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_max_entries_drops_oldest():
+    cache = SemanticAnswerCache(max_entries=1)
+    store(cache, embedding=DIFFERENT)
+    store(cache, embedding=QUESTION)
+    assert cache.lookup(DIFFERENT) is None
+    assert cache.lookup(QUESTION) is not None
+
+
+def test_corpus_version_change_clears_entries():
+    cache = SemanticAnswerCache()
+    cache.sync_corpus_version("v1")
+    assert store(cache, corpus_version="v1")
+    cache.sync_corpus_version("v1")
+    assert cache.lookup(QUESTION) is not None
+    cache.sync_corpus_version("v2")
+    assert cache.lookup(QUESTION) is None
+
+
+def test_answer_built_before_version_change_is_not_stored():
+    cache = SemanticAnswerCache()
+    cache.sync_corpus_version("v1")
+    started_version = cache.corpus_version
+    # 답변을 만드는 동안 다른 요청이 새 문서 버전으로 캐시를 비움
+    cache.sync_corpus_version("v2")
+    assert not store(cache, corpus_version=started_version)
+    assert cache.lookup(QUESTION) is None
+    assert cache.stats()["entries"] == 0
@@ -0,0 +1,201 @@
+"""
+match_documents RPC에 검색 파라미터를 전달하는 SupabaseVectorStore 확장입니다.
+
+기본 SupabaseVectorStore는 query_embedding만 전달하고 개수 제한과 유사도 임계값을
+클라이언트에서 처리합니다. 여기서는 match_count, match_threshold와 ANN 인덱스 검색 폭
+(HNSW ef_search / ivfflat probes)을 함수 인자로 넘겨 데이터베이스에서 처리하도록 합니다.
+
+HybridSupabaseRetriever는 hybrid_match_documents RPC로 전문 검색(tsvector/trigram)과
+벡터 검색 순위를 RRF(reciprocal rank fusion)로 합친 결과를 반환합니다.
+"""
+
+from typing import Any, Dict, List, Optional, Tuple
+
+from langchain_community.vectorstores.supabase import SupabaseVectorStore
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.retrievers import BaseRetriever
+from pydantic import Field
+
+from telemetry import timed
+
+RETRIEVAL_MODES = ("vector", "hybrid")
+
+
+class TunedSupabaseVectorStore(SupabaseVectorStore):
+    """
+    match_documents(query_embedding, match_threshold, match_count, ef_search, probes)를 호출하는 벡터 스토어.
+
+    ef_search/probes는 None이면 전달하지 않으므로, 인자가 3개인 이전 match_documents 함수와도 호환됩니다.
+    검색 호출마다 search_kwargs로 ef_search/probes를 덮어쓸 수 있습니다.
+    filter(예: {"sections": ["guide"]})는 비어 있지 않을 때만 전달되어 데이터베이스에서 metadata @> filter로 적용됩니다.
+    """
+
+    def __init__(
+        self,
+        client: Any,
+        embedding: Embeddings,
+        table_name: str = "documents",
+        query_name: str = "match_documents",
+        match_threshold: float = 0.5,
+        ef_search: Optional[int] = None,
+        probes: Optional[int] = None,
+        **kwargs: Any,
+    ) -> None:
+        super().__init__(client=client, embedding=embedding, table_name=table_name, query_name=query_name, **kwargs)
+        self.match_threshold = match_threshold
+        self.ef_search = ef_search
+        self.probes = probes
+
+    def match_params(
+        self,
+        query: List[float],
+        k: int,
+        score_threshold: Optional[float] = None,
+        ef_search: Optional[int] = None,
+        probes: Optional[int] = None,
+    ) -> Dict[str, Any]:
+        """match_documents RPC 인자를 만듭니다."""
+        params: Dict[str, Any] = {
+            "query_embedding": query,
+            "match_count": k,
+            "match_threshold": self.match_threshold if score_threshold is None else score_threshold,
+        }
+        ef_search = ef_search or self.ef_search
+        if ef_search:
+            params["ef_search"] = max(ef_search, k)  # ef_search가 k보다 작으면 k개를 채우지 못함
+        probes = probes or self.probes
+        if probes:
+            params["probes"] = probes
+        return params
+
+    def similarity_search(
+        self,
+        query: str,
+        k: int = 4,
+        filter: Optional[Dict[str, Any]] = None,
+        **kwargs: Any,
+    ) -> List[Document]:
+        with timed("embed_query"):
+            vector = self._embedding.embed_query(query)
+        return self.similarity_search_by_vector(vector, k=k, filter=filter, **kwargs)
+
+    def similarity_search_by_vector_with_relevance_scores(
+        self,
+        query: List[float],
+        k: int,
+        filter: Optional[Dict[str, Any]] = None,
+        postgrest_filter: Optional[str] = None,
+        score_threshold: Optional[float] = None,
+        ef_search: Optional[int] = None,
+        probes: Optional[int] = None,
+        **kwargs: Any,
+    ) -> List[Tuple[Document, float]]:
+        params = self.match_params(query, k, score_threshold, ef_search, probes)
+        if filter:
+            params["filter"] = filter
+
+        query_builder = self._client.rpc(self.query_name, params)
+        if postgrest_filter:
+            query_builder.params = query_builder.params.set("and", f"({postgrest_filter})")
+        with timed(self.query_name):
+            res = query_builder.execute()
+
+        return [
+            (
+                Document(metadata=row.get("metadata", {}), page_content=row.get("content", "")),
+                row.get("similarity", 0.0),
+            )
+            for row in res.data
+            if row.get("content")
+        ]
+
+    def hybrid_search_with_scores(
+        self,
+        query: str,
+        k: int = 5,
+        filter: Optional[Dict[str, Any]] = None,
+        candidate_count: int = 30,
+        rrf_k: int = 60,
+        full_text_weight: float = 1.0,
+        semantic_weight: float = 1.0,
+        query_name: str = "hybrid_match_documents",
+    ) -> List[Tuple[Document, float]]:
+        """
+        전문 검색과 벡터 검색을 함께 수행하고 (문서, RRF 점수) 목록을 반환합니다.
+
+        각 검색에서 candidate_count개씩 후보를 고른 뒤 순위를 합치므로, 한쪽 검색에만 걸린 문서도 결과에 포함됩니다.
+        코사인 유사도는 문서 metadata의 "similarity"에 담깁니다.
+        """
+        with timed("embed_query"):
+            query_embedding = self._embedding.embed_query(query)
+        params: Dict[str, Any] = {
+            "query_text": query,
+            "query_embedding": query_embedding,
+            "match_count": k,
+            "candidate_count": max(candidate_count, k),
+            "rrf_k": rrf_k,
+            "full_text_weight": full_text_weight,
+            "semantic_weight": semantic_weight,
+        }
+        if self.ef_search:
+            params["ef_search"] = self.ef_search
+        if self.probes:
+            params["probes"] = self.probes
+        if filter:
+            params["filter"] = filter
+
+        with timed(query_name):
+            res = self._client.rpc(query_name, params).execute()
+        return [
+            (
+                Document(
+                    metadata={**(row.get("metadata") or {}), "similarity": row.get("similarity")},
+                    page_content=row.get("content", ""),
+                ),
+                row.get("score", 0.0),
+            )
+            for row in res.data
+            if row.get("content")
+        ]
+
+
+class HybridSupabaseRetriever(BaseRetriever):
+    """hybrid_match_documents RPC(전문 검색 + 벡터 검색, RRF)로 문서를 찾는 검색기."""
+
+    vector_store: Any
+    k: int = 5
+    candidate_count: int = 30
+    full_text_weight: float = 1.0
+    semantic_weight: float = 1.0
+    filter: Dict[str, Any] = Field(default_factory=dict)
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        results = self.vector_store.hybrid_search_with_scores(
+            query,
+            k=self.k,
+            filter=self.filter,
+            candidate_count=self.candidate_count,
+            full_text_weight=self.full_text_weight,
+            semantic_weight=self.semantic_weight,
+        )
+        return [doc for doc, _ in results]
+
+
+def create_retriever(
+    vector_store: TunedSupabaseVectorStore,
+    mode: str = "vector",
+    k: int = 5,
+    score_threshold: float = 0.5,
+    filter: Optional[Dict[str, Any]] = None,
+) -> BaseRetriever:
+    """검색 방식("vector" 또는 "hybrid")에 맞는 검색기를 만듭니다."""
+    if mode == "hybrid":
+        return HybridSupabaseRetriever(vector_store=vector_store, k=k, filter=filter or {})
+    if mode != "vector":
+        raise ValueError(f"지원하지 않는 검색 방식입니다: {mode}")
+    return vector_store.as_retriever(
+        search_type="similarity",
+        search_kwargs={"k": k, "score_threshold": score_threshold, "filter": filter or {}},
+    )